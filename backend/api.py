@@ -1,33 +1,156 @@
-from flask import Flask, request, jsonify
+from flask import (
+    Flask,
+    Response,
+    request,
+    jsonify,
+    make_response,
+    stream_with_context,
+)
 from flask_cors import CORS
+import functools
+import json
 import sys
 import os
+import threading
+import time
 
 parent_dir = os.path.join(os.path.dirname(__file__), "..")
 src_dir = os.path.join(parent_dir, "src")
 sys.path.insert(0, parent_dir)
 sys.path.insert(0, src_dir)
 
+from src.admission import Overloaded, from_env as admission_from_env
 from src.chatbot import Chatbot
+from src.deadline import ParseCancelled, get_cancellation_stats
+from src.llm_ledger import UsageLedger, usage_prometheus
+from src.llm_provider import get_usage
+from src.metrics import breakdown_ms, collect, render_prometheus, span
 from src.LLM_based_qa import LLMBasedQA
+from src import tracing
+from src.session_store import RecipeCache, session_store_from_env
+from src.shared_recipe_cache import shared_recipe_cache_from_env
 
 app = Flask(__name__)
 CORS(app)
 
-sessions = {}
+# session records and parsed recipes (SESSION_STORE, see session_store.py): any
+# process sharing the store can serve any session
+store = session_store_from_env()
 
+# serialized recipes shared by the processes of this host (SHARED_RECIPE_CACHE,
+# see shared_recipe_cache.py), or None
+shared_recipes = shared_recipe_cache_from_env()
 
-def make_classical_bot(url):
+# recipes rebuilt or unpickled in this process, shared by the bots of their
+# sessions. Each process holds its own copy of these, so with the shared cache
+# only the most recent few are kept and the others are unpickled on demand
+recipes = RecipeCache(
+    int(os.getenv("RECIPE_CACHE_SIZE", "64" if shared_recipes is None else "8"))
+)
+
+# bots of this process by session id: (bot, recipe_key, record version)
+bots = {}
+bots_lock = threading.Lock()
+
+# bots still parsing their recipe, by session id; a newer initialize of the
+# same session (or /api/cancel) cancels them
+parse_jobs = {}
+parse_lock = threading.Lock()
+
+# number of the latest initialize (or cancel) of each session: an initialize
+# that was superseded meanwhile doesn't save its bot
+init_generations = {}
+
+# concurrency limits and wait queues: one lane per initialize mode, and a chat
+# lane that goes ahead of queued initializations
+admission = admission_from_env()
+
+
+def _overloaded(e):
+    response = jsonify({"error": str(e), "retry_after": e.retry_after})
+    response.headers["Retry-After"] = str(e.retry_after)
+    return response, 429
+
+
+def _traced(view):
+    """
+    Traces the request if it is sampled (TRACE_SAMPLE_RATE) or its body has
+    "trace": true and TRACE_ALLOW_FORCE is set; the response of a traced
+    request has an X-Trace-Id header. The session id is only recorded hashed
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        data = request.get_json(force=True, silent=True) or {}
+        with tracing.trace(
+            f"{request.method} {request.path}",
+            force=tracing.ALLOW_FORCE and bool(data.get("trace")),
+            session=tracing.session_tag(data.get("session_id")),
+            mode=data.get("mode"),
+            url=data.get("url"),
+        ) as current:
+            response = make_response(view(*args, **kwargs))
+        if current is not None:
+            response.headers["X-Trace-Id"] = current.trace_id
+        return response
+
+    return wrapper
+
+
+def _cancel_parse(sid):
+    with parse_lock:
+        bot = parse_jobs.pop(sid, None)
+    if bot is not None:
+        bot.cancel()
+    return bot is not None
+
+
+def _supersede(sid):
+    """
+    Marks the session's in-flight initialization, if any, as superseded: it
+    won't save its bot. Returns the generation number of the caller's one
+    """
+    with parse_lock:
+        generation = init_generations.get(sid, 0) + 1
+        init_generations[sid] = generation
+    return generation
+
+
+def _parse(bot, url, sid, time_budget=None):
+    """
+    Runs bot.process_url as the session's parse job, cancelling the one it replaces.
+    Raises ParseCancelled if this job is cancelled or replaced in turn.
+    """
+    with parse_lock:
+        old = parse_jobs.get(sid)
+        parse_jobs[sid] = bot
+    if old is not None:
+        old.cancel()
+
+    try:
+        success = bot.process_url(url, time_budget)
+    finally:
+        with parse_lock:
+            current = parse_jobs.get(sid) is bot
+            if current:
+                del parse_jobs[sid]
+
+    if not current or bot.cancelled():
+        raise ParseCancelled("Initialization was cancelled")
+    return success
+
+
+def make_classical_bot(url, sid="default"):
     bot = Chatbot(backend=True, mode="classical")
-    success = bot.process_url(url)
+    success = _parse(bot, url, sid)
     if not success:
         raise RuntimeError("Failed to process recipe URL in classical mode")
     return bot
 
 
-def make_hybrid_bot(url):
-    bot = Chatbot(backend=True, mode="hybrid")
-    success = bot.process_url(url)
+def make_hybrid_bot(url, progressive=False, time_budget=None, sid="default"):
+    bot = Chatbot(backend=True, mode="hybrid", progressive=progressive)
+    success = _parse(bot, url, sid, time_budget)
     if not success:
         raise RuntimeError("Failed to process recipe URL in hybrid mode")
     return bot
@@ -37,12 +160,170 @@ def make_llm_bot(url):
     return LLMBasedQA(url)
 
 
+def _shared_recipe(key):
+    """
+    The recipe stored under key as this process shares it between bots (the
+    export plus the tables built from it), or None if the store doesn't have it.
+    A recipe this process hasn't rebuilt yet is read from the host's shared
+    cache if another process put it there, else rebuilt from the store
+    """
+
+    def build():
+        if shared_recipes is not None:
+            recipe = shared_recipes.get(key)
+            if recipe is not None:
+                return recipe
+        recipe = store.get_recipe(key)
+        if recipe is None:
+            return None
+        if not key.startswith("llm:"):
+            bot = Chatbot(backend=True, mode="classical", prefetch=False)
+            bot.load_recipe(recipe)
+            recipe = bot.shared_state()
+        if shared_recipes is not None:
+            shared_recipes.put(key, recipe)
+        return recipe
+
+    return recipes.get(key, build)
+
+
+def _publish_recipe(key, bot):
+    recipe = bot.export_recipe()
+    store.put_recipe(key, recipe)
+    if isinstance(bot, Chatbot):
+        recipe = bot.shared_state()
+    recipes.put(key, recipe)
+    if shared_recipes is not None:
+        shared_recipes.put(key, recipe)
+
+
+def _bot_from_recipe(mode, recipe, progressive=False):
+    if mode == "llm":
+        return LLMBasedQA.from_recipe(recipe)
+    bot = Chatbot(backend=True, mode=mode, progressive=progressive)
+    bot.load_recipe(recipe)
+    return bot
+
+
+def _initialize_bot(url, sid, mode, progressive, time_budget):
+    """
+    Builds the session's bot from the shared recipe if the store has it, else
+    parses the recipe and publishes it. The caller has already cancelled the
+    session's previous initialization.
+    Returns (bot, recipe_key, cached)
+    """
+
+    key = f"{mode}:{url}"
+    recipe = _shared_recipe(key)
+    if recipe is None and mode == "hybrid" and progressive:
+        # the upgrades can start from a classical parse
+        recipe = _shared_recipe(f"classical:{url}")
+        if recipe is not None:
+            return _bot_from_recipe(mode, recipe, True), f"classical:{url}", True
+    if recipe is not None:
+        return _bot_from_recipe(mode, recipe), key, True
+
+    with admission.admit("init_" + mode):
+        if mode == "classical":
+            bot = make_classical_bot(url, sid)
+        elif mode == "llm":
+            bot = make_llm_bot(url)
+        else:
+            bot = make_hybrid_bot(url, progressive, time_budget, sid)
+
+    if mode == "hybrid" and bot.progressive:
+        key = f"classical:{url}"
+        store.put_recipe(key, bot.classical_recipe)
+    elif mode == "hybrid" and bot.deadline.report()["degraded"]:
+        # parts were parsed classically for lack of time: not for sharing
+        key = f"hybrid:{url}#{sid}"
+        store.put_recipe(key, bot.export_recipe())
+    else:
+        _publish_recipe(key, bot)
+    return bot, key, False
+
+
+def _save_session(sid, record, bot):
+    """
+    Writes the session's state to the store; a progressive session switches to
+    the hybrid recipe once all of its upgrades are in
+    """
+
+    recipe_key = record["recipe_key"]
+    if record["mode"] == "hybrid" and recipe_key.startswith("classical:"):
+        status = bot.upgrade_status()
+        if status["upgraded"] and not (status["pending"] or status["failed"]):
+            recipe_key = "hybrid:" + recipe_key[len("classical:") :]
+            _publish_recipe(recipe_key, bot)
+
+    record.update(bot.session_state())
+    record["recipe_key"] = recipe_key
+    record["version"] = record.get("version", 0) + 1
+    store.put(sid, record)
+    with bots_lock:
+        bots[sid] = (bot, recipe_key, record["version"])
+
+
+def _load_session(sid):
+    """
+    Returns the session's record and a bot in its state, rebuilt from the shared
+    recipe if this process doesn't have it yet; (None, None) for no session
+    """
+
+    record = store.get(sid)
+    with bots_lock:
+        local = bots.get(sid)
+        if record is None:
+            bots.pop(sid, None)
+    if record is None:
+        return None, None
+
+    if local is not None and local[1] == record["recipe_key"]:
+        bot = local[0]
+        if local[2] != record["version"]:
+            # another process served the session since
+            bot.restore_session_state(record)
+        return record, bot
+
+    # only progressive sessions use a classical recipe in hybrid mode: they move
+    # to the hybrid one once it is stored, else upgrade again in this process
+    recipe = None
+    progressive = record["mode"] == "hybrid" and record["recipe_key"].startswith(
+        "classical:"
+    )
+    if progressive:
+        hybrid_key = "hybrid:" + record["recipe_key"][len("classical:") :]
+        recipe = _shared_recipe(hybrid_key)
+        if recipe is not None:
+            record["recipe_key"], progressive = hybrid_key, False
+    if recipe is None:
+        recipe = _shared_recipe(record["recipe_key"])
+    if recipe is None:
+        return None, None
+    bot = _bot_from_recipe(record["mode"], recipe, progressive)
+    bot.restore_session_state(record)
+    with bots_lock:
+        bots[sid] = (bot, record["recipe_key"], record["version"])
+    return record, bot
+
+
+def _close_local_bot(sid):
+    with bots_lock:
+        local = bots.pop(sid, None)
+    if local is not None and hasattr(local[0], "cancel"):
+        local[0].cancel()
+
+
 @app.route("/api/initialize", methods=["POST"])
+@_traced
 def initialize():
     data = request.json
     url = data.get("url")
     sid = data.get("session_id", "default")
     mode = data.get("mode", "classical")
+    progressive = bool(data.get("progressive", False))
+    time_budget = data.get("time_budget")
+    timing = bool(data.get("timing", False))
 
     if not url:
         return jsonify({"error": "URL is required"}), 400
@@ -50,25 +331,117 @@ def initialize():
     if mode not in ["classical", "llm", "hybrid"]:
         return jsonify({"error": "Invalid mode"}), 400
 
+    if time_budget is not None:
+        if not isinstance(time_budget, (int, float)) or time_budget <= 0:
+            return jsonify({"error": "time_budget must be a positive number"}), 400
+
+    usage = UsageLedger()
+    generation = _supersede(sid)
+    _cancel_parse(sid)
     try:
-        if mode == "classical":
-            bot = make_classical_bot(url)
-            title = bot.title.get("title", "Unknown Recipe")
-        elif mode == "llm":
-            bot = make_llm_bot(url)
-            title = bot.title.get("title", "Unknown Recipe")
-        else:
-            bot = make_hybrid_bot(url)
+        with collect() as breakdown, span("initialize"), usage.active():
+            bot, recipe_key, cached = _initialize_bot(
+                url, sid, mode, progressive, time_budget
+            )
             title = bot.title.get("title", "Unknown Recipe")
 
-        sessions[sid] = {"mode": mode, "bot": bot}
+            with parse_lock:
+                superseded = init_generations.get(sid) != generation
+                if not superseded:
+                    _close_local_bot(sid)
+                    _save_session(sid, {"mode": mode, "recipe_key": recipe_key}, bot)
+            if superseded:
+                if hasattr(bot, "cancel"):
+                    bot.cancel()
+                raise ParseCancelled("Initialization was replaced")
 
-        return jsonify({"success": True, "title": title, "mode": mode})
+        result = {
+            "success": True,
+            "title": title,
+            "mode": mode,
+            "cached": cached,
+            "llm_usage": usage.totals(),
+        }
+        if mode == "hybrid":
+            result["upgrades"] = bot.upgrade_status()
+            result.update(bot.deadline.report())
+        if timing:
+            result["timing"] = breakdown_ms(breakdown)
+        return jsonify(result)
+    except Overloaded as e:
+        return _overloaded(e)
+    except ParseCancelled as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@app.route("/api/cancel", methods=["POST"])
+def cancel():
+    """
+    Stops the session's in-flight initialization and closes the session; the
+    frontend sends it when the tab is closed. The body is parsed as JSON whatever
+    its content type, so it can come from navigator.sendBeacon.
+    """
+    data = request.get_json(force=True, silent=True) or {}
+    sid = data.get("session_id", "default")
+
+    _supersede(sid)
+    parse_cancelled = _cancel_parse(sid)
+    _close_local_bot(sid)
+    session_closed = store.delete(sid)
+
+    return jsonify(
+        {"parse_cancelled": parse_cancelled, "session_closed": session_closed}
+    )
+
+
+@app.route("/api/stats", methods=["GET"])
+def stats():
+    return jsonify(
+        {
+            "admission": admission.snapshot(),
+            "cancellations": get_cancellation_stats(),
+            "llm_usage": get_usage(),
+            "shared_recipes": shared_recipes and shared_recipes.snapshot(),
+        }
+    )
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """
+    Stage latency histograms and LLM usage counters of this process, in the
+    Prometheus text format
+    """
+    return Response(
+        render_prometheus() + usage_prometheus(get_usage()),
+        mimetype="text/plain; version=0.0.4",
+    )
+
+
+@app.route("/api/traces", methods=["GET"])
+def traces():
+    """The traces this process kept, newest first."""
+    return jsonify({"traces": tracing.recent()})
+
+
+@app.route("/api/traces/<trace_id>", methods=["GET"])
+def trace(trace_id):
+    """
+    One kept trace, in the Chrome trace event format (save it and open it in
+    chrome://tracing or Perfetto), or as nested spans with ?format=json
+    """
+    current = tracing.get_trace(trace_id)
+    if current is None:
+        return jsonify({"error": "Unknown trace"}), 404
+    if request.args.get("format") == "json":
+        return jsonify(current.to_dict())
+    return jsonify(current.to_chrome())
+
+
 @app.route("/api/chat", methods=["POST"])
+@_traced
 def chat():
     data = request.json
     question = data.get("question")
@@ -77,31 +450,41 @@ def chat():
     if not question:
         return jsonify({"error": "Question is required"}), 400
 
-    if sid not in sessions:
-        return jsonify({"error": "Chatbot not initialized"}), 400
-
-    session = sessions[sid]
-    mode = session["mode"]
-    bot = session["bot"]
+    try:
+        slot = admission.acquire("chat")
+    except Overloaded as e:
+        return _overloaded(e)
 
+    usage = UsageLedger()
     try:
+        record, bot = _load_session(sid)
+        if record is None:
+            return jsonify({"error": "Chatbot not initialized"}), 400
+        mode = record["mode"]
+
         if mode in ["classical", "hybrid"]:
-            response = bot.respond(question)
+            with usage.active():
+                response = bot.respond(question)
             if not response:
                 response = "No response."
+            _save_session(sid, record, bot)
 
-            return jsonify(
-                {
-                    "response": response,
-                    "current_step": bot.current_step,
-                    "total_steps": len(bot.steps),
-                    "mode": mode,
-                }
-            )
+            result = {
+                "response": response,
+                "current_step": bot.current_step,
+                "total_steps": len(bot.steps),
+                "mode": mode,
+                "llm_usage": _turn_usage(usage, bot),
+            }
+            if mode == "hybrid":
+                result["upgrades"] = bot.upgrade_status()
+            return jsonify(result)
 
         else:
-            _, answer = bot.answer(question)
+            with usage.active():
+                _, answer = bot.answer(question)
             response = answer or "No response."
+            _save_session(sid, record, bot)
 
             return jsonify(
                 {
@@ -109,11 +492,101 @@ def chat():
                     "current_step": 0,
                     "total_steps": 0,
                     "mode": mode,
+                    "llm_usage": _turn_usage(usage, bot),
                 }
             )
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+    finally:
+        admission.release("chat", slot)
+
+
+def _turn_usage(usage, bot):
+    """LLM usage of this turn and of the whole session's answers"""
+    return {"turn": usage.totals(), "session": bot.chat_usage.totals()}
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    """
+    Same request as /api/chat, answered as Server-Sent Events while the answer
+    is generated: "delta" events carry text chunks, a final "done" event carries
+    the step position, the time to first chunk / total time in ms and the LLM
+    usage.
+    """
+    data = request.json
+    question = data.get("question")
+    sid = data.get("session_id", "default")
+
+    if not question:
+        return jsonify({"error": "Question is required"}), 400
+
+    try:
+        slot = admission.acquire("chat")
+    except Overloaded as e:
+        return _overloaded(e)
+
+    try:
+        record, bot = _load_session(sid)
+    except Exception as e:
+        admission.release("chat", slot)
+        return jsonify({"error": str(e)}), 500
+    if record is None:
+        admission.release("chat", slot)
+        return jsonify({"error": "Chatbot not initialized"}), 400
+    mode = record["mode"]
+
+    def generate():
+        start = time.perf_counter()
+        ttft = None
+        usage = UsageLedger()
+        try:
+            if mode in ["classical", "hybrid"]:
+                chunks = bot.respond_stream(question)
+            else:
+                chunks = bot.answer_stream(question)
+
+            with usage.active():
+                for text in chunks:
+                    if not text:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    yield _sse("delta", {"text": text})
+
+            if ttft is None:
+                yield _sse("delta", {"text": "No response."})
+            _save_session(sid, record, bot)
+        except Exception as e:
+            yield _sse("error", {"error": str(e)})
+            return
+
+        total = time.perf_counter() - start
+        done = {
+            "current_step": bot.current_step if mode != "llm" else 0,
+            "total_steps": len(bot.steps) if mode != "llm" else 0,
+            "mode": mode,
+            "ttft_ms": round((ttft if ttft is not None else total) * 1e3, 1),
+            "total_ms": round(total * 1e3, 1),
+            "llm_usage": _turn_usage(usage, bot),
+        }
+        if mode == "hybrid":
+            done["upgrades"] = bot.upgrade_status()
+        yield _sse("done", done)
+
+    response = Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+    # the slot is held until the stream ends or the client goes away
+    response.call_on_close(lambda: admission.release("chat", slot))
+    return response
 
 
 @app.route("/api/health", methods=["GET"])
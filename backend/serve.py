@@ -0,0 +1,226 @@
+"""
+Production entry point for the backend API (POSIX only): the master process
+imports the app and preloads the spaCy pipeline and the helper files, then
+forks --workers processes that share that memory copy-on-write and serve the
+same listening socket, each with a pool of --threads request threads. A worker
+is replaced whenever it dies and, with --max-requests, after about that many
+requests (plus up to --max-requests-jitter, so they don't all restart at once).
+
+Parsed recipes are shared between the workers through a memory-mapped cache
+file (SHARED_RECIPE_CACHE, see src/shared_recipe_cache.py; by default one per
+server on /dev/shm, removed when it stops), so a recipe is parsed once per host.
+
+Sessions are kept in the session store (SESSION_STORE, see
+src/session_store.py). The default in-process store is per worker, so with
+more than one worker, or with recycling, use one the workers share:
+
+Run from the repository root:
+>> SESSION_STORE=sqlite:sessions.db python -m backend.serve --workers 4 --threads 8
+"""
+
+import argparse
+import gc
+import os
+import random
+import signal
+import socket
+import sys
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+parent_dir = os.path.join(os.path.dirname(__file__), "..")
+sys.path.insert(0, parent_dir)
+
+
+class RequestHandler(WSGIRequestHandler):
+    # idle keep-alive connections give their thread back after this many seconds
+    timeout = 5
+
+    def run_wsgi(self):
+        self.server.handled += 1
+        super().run_wsgi()
+
+
+class WorkerServer(BaseWSGIServer):
+    """WSGI server of one worker: requests run on a fixed pool of threads."""
+
+    multithread = True
+
+    def __init__(self, app, sock: socket.socket, threads: int):
+        host, port = sock.getsockname()[:2]
+        super().__init__(host, port, app, handler=RequestHandler, fd=sock.fileno())
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix="request")
+        self.handled = 0
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request_thread, request, client_address)
+
+    def _process_request_thread(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+
+def preload():
+    """Imports the app and loads everything read-only that its requests share.
+
+    Returns:
+        The Flask app
+    """
+    from backend.api import app
+    from src.chatbot import Chatbot
+    from src.resources import preload as preload_resources
+
+    preload_resources()
+    Chatbot._load_shared_resources()
+
+    # keep the garbage collector from writing to (and so copying) the pages of
+    # everything loaded so far
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+def run_worker(app, sock: socket.socket, threads: int, max_requests: int):
+    """Serves until max_requests were handled, SIGTERM arrives or the master is gone."""
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    master = os.getppid()
+
+    server = WorkerServer(app, sock, threads)
+    server.timeout = 0.5  # how often handle_request() returns to check the above
+    while not stopping and os.getppid() == master:
+        if max_requests and server.handled >= max_requests:
+            break
+        server.handle_request()
+
+    # finish the requests already accepted
+    server.pool.shutdown(wait=True)
+
+
+def serve(
+    host: str,
+    port: int,
+    workers: int,
+    threads: int,
+    max_requests: int = 0,
+    max_requests_jitter: int = 0,
+):
+    """Preloads the app, forks the workers and keeps their number up until SIGTERM / SIGINT.
+
+    Args:
+        host: Interface to listen on
+        port: Port to listen on (0 for any free port)
+        workers: Number of worker processes
+        threads: Request threads per worker
+        max_requests: Requests after which a worker is replaced, 0 for never
+        max_requests_jitter: Up to this many more requests, drawn per worker
+    """
+    # the workers share the recipes any of them parsed, through a cache file
+    # of this server unless SHARED_RECIPE_CACHE names one
+    own_cache = not os.getenv("SHARED_RECIPE_CACHE")
+    if own_cache:
+        from src.shared_recipe_cache import default_cache_path
+
+        os.environ["SHARED_RECIPE_CACHE"] = default_cache_path()
+
+    app = preload()
+    sock = socket.create_server((host, port), backlog=1024)
+    sock.set_inheritable(True)
+    print(
+        f"serving on http://{host}:{sock.getsockname()[1]} "
+        f"(workers={workers}, threads={threads}, pid={os.getpid()})",
+        flush=True,
+    )
+
+    children = set()
+
+    def spawn():
+        limit = max_requests
+        if max_requests:
+            limit += random.randint(0, max_requests_jitter)
+        pid = os.fork()
+        if pid == 0:
+            status = 0
+            try:
+                run_worker(app, sock, threads, limit)
+            except BaseException:
+                traceback.print_exc()
+                status = 1
+            finally:
+                os._exit(status)
+        children.add(pid)
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(workers):
+        spawn()
+
+    while not stopping:
+        pid, _ = os.waitpid(-1, os.WNOHANG)
+        if pid:
+            children.discard(pid)
+            spawn()
+        else:
+            time.sleep(0.1)
+
+    for pid in children:
+        os.kill(pid, signal.SIGTERM)
+    for pid in children:
+        os.waitpid(pid, 0)
+    sock.close()
+    if own_cache:
+        os.unlink(os.environ["SHARED_RECIPE_CACHE"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default=os.getenv("HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "5001")))
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WEB_WORKERS", "1"))
+    )
+    parser.add_argument(
+        "--threads", type=int, default=int(os.getenv("WEB_THREADS", "8"))
+    )
+    parser.add_argument(
+        "--max-requests", type=int, default=int(os.getenv("WEB_MAX_REQUESTS", "0"))
+    )
+    parser.add_argument(
+        "--max-requests-jitter",
+        type=int,
+        default=int(os.getenv("WEB_MAX_REQUESTS_JITTER", "100")),
+    )
+    args = parser.parse_args()
+
+    serve(
+        args.host,
+        args.port,
+        args.workers,
+        args.threads,
+        args.max_requests,
+        args.max_requests_jitter,
+    )
+
+
+if __name__ == "__main__":
+    main()
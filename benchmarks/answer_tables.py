@@ -0,0 +1,73 @@
+"""
+Measures Chatbot.respond latency for the deterministic intents served from the
+per-step answer tables (navigation, retrieval, current-step listings, time and
+temperature) on a synthetic recipe.
+
+Run from the repository root:
+>> python -m benchmarks.answer_tables
+"""
+
+import time
+
+from src.chatbot import Chatbot
+
+QUESTIONS = [
+    "go to the next step",
+    "go back",
+    "repeat please",
+    "show me the ingredients",
+    "show me the steps",
+    "what are the ingredients in the current step",
+    "what are the tools in the current step",
+    "what are the methods in the current step",
+    "how long should i bake it",
+    "what temperature",
+]
+
+
+def make_bot(n_steps):
+    bot = Chatbot(backend=True)
+    bot.title = {"title": "Synthetic Recipe"}
+    bot.raw_ingredients = {"ingredients": [f"1 cup ingredient {i}" for i in range(n_steps)]}
+    bot.ingredients = []
+    bot._build_ingredient_index()
+    bot.steps = [
+        {
+            "step_number": i + 1,
+            "description": f"Bake the ingredient {i} in the oven at 350 degrees for {i} minutes.",
+            "ingredients": [f"ingredient {i}"],
+            "tools": ["oven"],
+            "methods": ["bake"],
+            "time": {"duration": f"{i} minutes"},
+            "temperature": {"value": "350", "unit": "°F"},
+            "type": "actionable",
+        }
+        for i in range(n_steps)
+    ]
+    bot._build_answer_tables()
+    return bot
+
+
+def main():
+    print(f"{'steps':>6} {'build ms':>10}  per-question latency (us)")
+    for n in (10, 100, 1000):
+        start = time.perf_counter()
+        bot = make_bot(n)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        timings = []
+        for question in QUESTIONS:
+            repeat = 2000
+            start = time.perf_counter()
+            for _ in range(repeat):
+                bot.current_step = n // 2
+                bot.respond(question)
+            timings.append((time.perf_counter() - start) / repeat * 1e6)
+
+        print(f"{n:>6} {build_ms:>10.2f}  " + " ".join(f"{t:.1f}" for t in timings))
+
+    print("questions: " + " | ".join(QUESTIONS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Cancellation of in-flight hybrid parses, against the local LLM stand-in server:
+--sessions recipes start parsing at once (every step escalated to the LLM), and
+once --cancel-at of their LLM calls have been made each session is closed
+through POST /api/cancel, as the frontend does when the tab is closed. Reports
+how long the parses took to stop, the LLM calls made compared with parses left
+to finish, the skipped work (get_cancellation_stats) and the queued calls that
+were aborted before being sent (more sessions than LLM_MAX_CONCURRENCY queue).
+Then re-initializes a session that is still parsing onto a recipe the backend
+already has: the parse must be cancelled (409) and the session left on the
+second recipe.
+
+Run from the repository root:
+>> python -m benchmarks.cancellation --sessions 12 --latency 0.3 --cancel-at 0.5
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from benchmarks.recipe_site import RecipeSite
+from src.chatbot import Chatbot
+from src.deadline import ParseCancelled, get_cancellation_stats
+from src.llm_provider import get_usage, reset_usage
+from src.local_llm_server import LocalLLMServer
+
+
+def make_bot():
+    bot = Chatbot(
+        mode="hybrid", backend=True, prefetch=False, escalation_threshold=1.01
+    )
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    return bot
+
+
+def parse(bot, finished):
+    try:
+        bot._process_metadata()
+    except ParseCancelled:
+        bot._release_parse_state()
+    finished[bot] = time.perf_counter()
+
+
+def reinitialize_onto_cached(api):
+    """
+    Starts a hybrid initialize of one recipe (served by the RecipeSite stand-in)
+    and, while it parses, re-initializes the session onto a cached recipe.
+    Returns (status of the first request, recipe_key the session ends up on)
+    """
+    site = RecipeSite().start()
+    os.environ["http_proxy"] = site.url
+    os.environ["no_proxy"] = "127.0.0.1,localhost"
+
+    cached = make_bot()
+    cached._process_metadata()
+    cached_key = "classical:" + cached.url
+    api._publish_recipe(cached_key, cached)
+
+    client = api.app.test_client()
+    first = {}
+
+    def slow_initialize():
+        first["response"] = client.post(
+            "/api/initialize",
+            json={
+                "url": "http://www.allrecipes.com/recipe/1/sample/",
+                "session_id": "reinit",
+                "mode": "hybrid",
+            },
+        )
+
+    thread = threading.Thread(target=slow_initialize)
+    thread.start()
+    while "reinit" not in api.parse_jobs:
+        time.sleep(0.01)
+    response = client.post(
+        "/api/initialize",
+        json={"url": cached.url, "session_id": "reinit", "mode": "classical"},
+    )
+    assert response.status_code == 200 and response.json["cached"]
+    thread.join()
+    site.stop()
+    return first["response"].status_code, api.store.get("reinit")["recipe_key"]
+
+
+def llm_calls():
+    usage = get_usage()
+    return sum(stats["calls"] for stats in usage.values()), sum(
+        stats["cancelled"] for stats in usage.values()
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=12)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--cancel-at", type=float, default=0.5)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0, latency=args.latency).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    from backend import api
+
+    make_bot()._process_metadata()  # load spaCy and the shared resources
+    reset_usage()
+
+    start = time.perf_counter()
+    make_bot()._process_metadata()
+    full_parse_s = time.perf_counter() - start
+    calls_per_parse, _ = llm_calls()
+    reset_usage()
+
+    finished = {}
+    threads = []
+    for i in range(args.sessions):
+        bot = make_bot()
+        api.parse_jobs[f"bench-{i}"] = bot
+        thread = threading.Thread(target=parse, args=(bot, finished))
+        thread.start()
+        threads.append(thread)
+
+    expected_calls = calls_per_parse * args.sessions
+    while llm_calls()[0] < args.cancel_at * expected_calls:
+        time.sleep(0.01)
+    client = api.app.test_client()
+    cancelled_at = time.perf_counter()
+    for i in range(args.sessions):
+        response = client.post("/api/cancel", json={"session_id": f"bench-{i}"})
+        assert response.json["parse_cancelled"]
+    for thread in threads:
+        thread.join()
+    stop_s = max(finished.values()) - cancelled_at
+    calls, aborted = llm_calls()
+    stats = get_cancellation_stats()
+
+    replaced_status, recipe_key = reinitialize_onto_cached(api)
+    server.stop()
+
+    print(
+        f"full parse: {full_parse_s:.2f}s, {calls_per_parse} LLM calls "
+        f"(x{args.sessions} = {expected_calls})"
+    )
+    print(f"all parses stopped {stop_s:.2f}s after the cancel requests")
+    print(f"LLM calls made: {calls}, queued calls aborted: {aborted}")
+    print(f"cancellation stats: {stats}")
+    print(
+        f"parse replaced by a cached recipe: HTTP {replaced_status}, "
+        f"session on {recipe_key}"
+    )
+
+    assert stats["jobs"] == args.sessions
+    assert calls < expected_calls
+    # a parse stops at its next step once the call in flight returns
+    assert stop_s < 2 * args.latency + 0.5
+    assert replaced_status == 409
+    assert recipe_key == "classical:https://www.allrecipes.com/recipe/0/sample/"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Deadline-aware hybrid initialization against the local LLM stand-in server:
+parses the sample recipe with every step escalated to the LLM
+(escalation_threshold above 1, the worst case) under several time budgets and
+reports the time taken, the LLM calls made and the parts that fell back to
+classical parsing. A budget of 0 gives the classical floor (no call fits);
+every budgeted run must end within max(budget, floor) plus a call of slack.
+
+Run from the repository root:
+>> python -m benchmarks.deadline --latency 0.2 --budgets 0.5 1 2
+"""
+
+import argparse
+import os
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+from src.deadline import Deadline
+from src.local_llm_server import LocalLLMServer
+
+
+def initialize(budget, latency):
+    bot = Chatbot(
+        mode="hybrid", backend=True, prefetch=False, escalation_threshold=1.01
+    )
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata(Deadline(budget, call_estimate=latency))
+    return bot.deadline.report()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0.5, 1, 2])
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0, latency=args.latency).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    initialize(None, args.latency)  # load spaCy and the shared resources
+
+    reports = [initialize(None, args.latency), initialize(0, args.latency)]
+    reports += [initialize(budget, args.latency) for budget in args.budgets]
+    server.stop()
+
+    for report in reports:
+        budget = report["time_budget_s"]
+        print(
+            f"budget={'none' if budget is None else f'{budget:.1f}s':>5}  "
+            f"elapsed={report['elapsed_s']:6.2f}s  "
+            f"llm calls={report['llm_calls']:>3}  degraded={report['degraded']}"
+        )
+
+    unbounded, floor = reports[0], reports[1]
+    assert not unbounded["degraded"]
+    assert floor["llm_calls"] == 0
+    for report in reports[1:]:
+        limit = max(report["time_budget_s"], floor["elapsed_s"])
+        assert report["elapsed_s"] <= limit + 2 * args.latency
+        assert report["llm_calls"] <= unbounded["llm_calls"]
+        if report["elapsed_s"] < unbounded["elapsed_s"]:
+            assert report["degraded"]
+
+
+if __name__ == "__main__":
+    main()
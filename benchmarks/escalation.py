@@ -0,0 +1,154 @@
+"""
+Confidence-gated LLM escalation in hybrid parsing, against the local LLM
+stand-in server: for several escalation thresholds, parses a labelled fixture
+of ingredient lines and steps and reports the LLM calls made and the accuracy
+of the ingredient names, step tools and step methods.
+
+Threshold 0 is the classical parser (no calls), a threshold above 1 the old
+hybrid behavior (every line / step goes to the LLM). Accuracy depends on both
+the spaCy model and the LLM answering; the stand-in server answers tools by
+keyword and methods with the first word of the step.
+
+Run from the repository root:
+>> python -m benchmarks.escalation --thresholds 0 0.5 0.7 0.9 1.01
+"""
+
+import argparse
+import os
+
+from src.ingredients_parser import IngredientsParser
+from src.llm_provider import get_usage, reset_usage
+from src.local_llm_server import LocalLLMServer
+from src.steps_parser import StepsParser
+
+# (ingredient line, expected name)
+INGREDIENTS = [
+    ("2 cups all-purpose flour", "flour"),
+    ("1 cup white sugar", "sugar"),
+    ("3 large eggs", "eggs"),
+    ("2 tablespoons butter, softened", "butter"),
+    ("1 (4 pound) whole chicken", "chicken"),
+    ("salt and pepper to taste", "salt and pepper"),
+    ("1 (14.5 ounce) can diced tomatoes", "tomatoes"),
+    ("2 cloves garlic, minced", "garlic"),
+    ("1 onion, chopped", "onion"),
+    ("½ cup milk", "milk"),
+    ("3 cups chicken broth", "chicken broth"),
+    ("1 teaspoon vanilla extract", "vanilla extract"),
+    ("2 ripe bananas, mashed", "bananas"),
+    ("1/4 cup olive oil", "olive oil"),
+    ("cooking spray", "cooking spray"),
+]
+
+# (step, expected tools, expected methods); compared by head word
+STEPS = [
+    ("Preheat the oven to 350 degrees F (175 degrees C).", ["oven"], ["preheat"]),
+    ("Whisk flour, sugar, and salt together in a large bowl.", ["bowl"], ["whisk"]),
+    ("Heat olive oil in a skillet over medium heat.", ["skillet"], ["heat"]),
+    ("Cook and stir onion until soft, about 5 minutes.", [], ["cook", "stir"]),
+    ("Pour batter into the prepared baking dish.", ["baking dish"], ["pour"]),
+    (
+        "Bake until a toothpick inserted into the center comes out clean.",
+        ["toothpick"],
+        ["bake"],
+    ),
+    ("Season with salt and pepper.", [], ["season"]),
+    ("Drain pasta in a colander.", ["colander"], ["drain"]),
+    ("Let cool in the pan for 10 minutes.", ["pan"], ["cool"]),
+    ("Brown the beef in a large pot.", ["pot"], ["brown"]),
+    (
+        "Transfer to a wire rack to cool completely.",
+        ["wire rack"],
+        ["transfer", "cool"],
+    ),
+    ("Stir in the cheese.", [], ["stir"]),
+]
+
+
+def heads(values):
+    return {value.split()[-1] for value in values if value.split()}
+
+
+def llm_calls():
+    return sum(stats["calls"] for stats in get_usage().values())
+
+
+def run(threshold):
+    reset_usage()
+
+    ingredients_parser = IngredientsParser(
+        {"ingredients": [line for line, _ in INGREDIENTS]},
+        mode="hybrid",
+        escalation_threshold=threshold,
+    )
+    ingredients = ingredients_parser.parse()
+    names_ok = sum(
+        parsed["ingredient_name"] == expected
+        for parsed, (_, expected) in zip(ingredients, INGREDIENTS)
+    )
+
+    parser = StepsParser(
+        {"directions": [step for step, _, _ in STEPS]},
+        ingredients,
+        mode="hybrid",
+        escalation_threshold=threshold,
+    )
+    tools_ok = methods_ok = 0
+    for step, tools, methods in STEPS:
+        tools_ok += heads(parser.extract_tools(step)) == heads(tools)
+        methods_ok += {m.split()[0] for m in parser.extract_methods(step)} == set(
+            methods
+        )
+
+    return {
+        "escalated": len(ingredients_parser.escalated)
+        + parser.tools_parser.escalations["escalated"]
+        + parser.methods_parser.escalations["escalated"],
+        "calls": llm_calls(),
+        "names": names_ok / len(INGREDIENTS),
+        "tools": tools_ok / len(STEPS),
+        "methods": methods_ok / len(STEPS),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--thresholds", type=float, nargs="+", default=[0, 0.5, 0.7, 0.9, 1.01]
+    )
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    results = []
+    items = len(INGREDIENTS) + 2 * len(STEPS)
+    print(
+        f"{'threshold':>9} {'escalated':>11} {'llm calls':>9} "
+        f"{'names':>6} {'tools':>6} {'methods':>7}"
+    )
+    for threshold in sorted(args.thresholds):
+        result = run(threshold)
+        results.append((threshold, result))
+        print(
+            f"{threshold:>9.2f} {result['escalated']:>5}/{items:<5} "
+            f"{result['calls']:>9} {result['names']:>6.0%} "
+            f"{result['tools']:>6.0%} {result['methods']:>7.0%}"
+        )
+
+    server.stop()
+
+    calls = [result["calls"] for _, result in results]
+    assert calls == sorted(calls)
+    for threshold, result in results:
+        if threshold <= 0:
+            assert result["calls"] == result["escalated"] == 0
+        if threshold > 1:
+            # every step twice, plus names / descriptors / preparations
+            assert result["calls"] == 2 * len(STEPS) + 3
+
+
+if __name__ == "__main__":
+    main()
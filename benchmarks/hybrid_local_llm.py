@@ -0,0 +1,116 @@
+"""
+End-to-end benchmark / load test of hybrid mode against the local LLM
+stand-in server: no network access or API key is needed. The server's
+latency, error rate and 429 rate are configurable, so fallbacks to the
+classical extractors are exercised as well.
+
+Run from the repository root:
+>> python -m benchmarks.hybrid_local_llm --sessions 4 --latency 0.05 --error-rate 0.1
+"""
+
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from src.chatbot import Chatbot
+from src.local_llm_server import LocalLLMServer
+
+SAMPLE_RECIPE = (
+    {"title": "Simple Roast Chicken"},
+    {
+        "ingredients": [
+            "1 (4 pound) whole chicken",
+            "2 tablespoons butter, softened",
+            "1 teaspoon kosher salt",
+            "½ teaspoon ground black pepper",
+            "1 lemon, halved",
+            "4 cloves garlic, crushed",
+        ]
+    },
+    {
+        "directions": [
+            "preheat the oven to 425 degrees f.",
+            "rub the chicken with butter and season with salt and pepper.",
+            "place lemon and garlic inside the chicken and set it in a roasting pan.",
+            "roast in the preheated oven until the juices run clear, about 1 hour.",
+            "let the chicken rest for 10 minutes before carving.",
+        ]
+    },
+)
+
+QUESTIONS = [
+    "what are the ingredients in the current step",
+    "go to the next step",
+    "how long should i roast it",
+    "what is a roasting pan",
+    "how do you baste",
+    "how much salt do i need",
+    "why does the chicken need to rest",
+]
+
+
+def run_session(latencies):
+    start = time.perf_counter()
+    bot = Chatbot(mode="hybrid", backend=True)
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+    latencies["initialize"].append(time.perf_counter() - start)
+
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        bot.respond(question)
+        latencies["chat"].append(time.perf_counter() - start)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(
+        port=0,
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    ).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    # measure live LLM calls (see benchmarks/llm_cache.py for the cached path)
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    latencies = {"initialize": [], "chat": []}
+    threads = [
+        threading.Thread(target=run_session, args=(latencies,))
+        for _ in range(args.sessions)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.stop()
+
+    print(f"sessions: {args.sessions}, wall time: {elapsed:.2f}s")
+    for name, values in latencies.items():
+        print(
+            f"{name:>10}: n={len(values)} mean={statistics.mean(values) * 1e3:.1f}ms "
+            f"p50={percentile(values, 0.5) * 1e3:.1f}ms "
+            f"p99={percentile(values, 0.99) * 1e3:.1f}ms"
+        )
+    print(f"server stats: {server.stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmarks ingredient lookups for quantity and "what kind of" questions on
+recipes with many ingredients: the original linear substring scan against the
+per-recipe TokenIndex built by Chatbot._build_ingredient_index.
+
+Run from the repository root:
+>> python -m benchmarks.ingredient_lookup
+"""
+
+import random
+import time
+from collections import Counter
+
+from src.chatbot import Chatbot
+
+FOODS = [
+    "flour", "sugar", "butter", "egg", "milk", "salt", "pepper", "onion",
+    "garlic", "tomato", "potato", "carrot", "celery", "chicken", "beef",
+    "rice", "bean", "lemon", "lime", "basil", "thyme", "oregano", "cream",
+    "cheese", "yogurt", "honey", "vinegar", "oil", "broth", "mushroom",
+]
+DESCRIPTORS = [
+    "fresh", "dried", "brown", "white", "red", "green", "kosher", "unsalted",
+    "whole", "ground", "smoked", "sweet", "sharp", "heavy", "light", "wild",
+]
+QUESTIONS = [
+    "how much {} do i need",
+    "how many {} should i use",
+    "what kind of {}",
+]
+
+
+def make_ingredients(n, seed=0):
+    rng = random.Random(seed)
+    ingredients = []
+    for i in range(n):
+        food = rng.choice(FOODS)
+        if rng.random() < 0.3:
+            food += "s"
+        descriptors = rng.sample(DESCRIPTORS, rng.randint(0, 2))
+        name = " ".join(descriptors + [food]) + f" {i}"
+        ingredients.append(
+            {
+                "original_ingredient_sentence": f"1 cup {name}",
+                "ingredient_name": name,
+                "ingredient_quantity": rng.randint(1, 4),
+                "measurement_unit": rng.choice(["cup", "teaspoon", None]),
+                "ingredient_descriptors": descriptors,
+                "ingredient_preparation": [],
+            }
+        )
+    return ingredients
+
+
+def linear_lookup(bot, question):
+    """Reference implementation of the pre-index scan (two passes)"""
+    tokens = bot._extract_keyword(question).split()
+    counter = Counter()
+    for idx, ing in enumerate(bot.ingredients):
+        for tok in tokens:
+            if tok in ing["ingredient_name"]:
+                counter[idx] += 1
+    if not counter:
+        return None
+    name = bot.ingredients[counter.most_common(1)[0][0]]["ingredient_name"]
+    for ing in bot.ingredients:
+        if name in ing["ingredient_name"]:
+            return ing
+
+
+def indexed_lookup(bot, question):
+    tokens = bot._extract_keyword(question).split()
+    return bot._find_ingredient(tokens)
+
+
+def per_call_us(fn, bot, questions, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for q in questions:
+            fn(bot, q)
+    return (time.perf_counter() - start) / (repeat * len(questions)) * 1e6
+
+
+def main():
+    bot = Chatbot(backend=True)
+    rng = random.Random(1)
+    questions = [rng.choice(QUESTIONS).format(rng.choice(FOODS)) for _ in range(50)]
+
+    print(f"{'ingredients':>12} {'build ms':>10} {'linear us':>12} {'indexed us':>12} {'speedup':>9}")
+    for n in (10, 100, 1000, 5000):
+        bot.ingredients = make_ingredients(n)
+
+        start = time.perf_counter()
+        bot._build_ingredient_index()
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        repeat = max(1, 2000 // n)
+        linear = per_call_us(linear_lookup, bot, questions, repeat)
+        indexed = per_call_us(indexed_lookup, bot, questions, repeat)
+        print(f"{n:>12} {build_ms:>10.2f} {linear:>12.1f} {indexed:>12.1f} {linear / indexed:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
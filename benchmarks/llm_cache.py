@@ -0,0 +1,107 @@
+"""
+Benchmark of the LLM response cache (src/llm_cache.py) on hybrid parsing of
+one recipe against the local LLM stand-in server:
+    - cold: empty cache, every prompt goes to the server
+    - warm: same process, answered from the in-memory LRU
+    - restart: fresh cache object on the same SQLite file (disk hits)
+    - prompt edit: a changed prompt file invalidates only its own entries
+and checks that cache hits don't count as calls in the parse's time budget
+(src/deadline.py), whose call estimate they would pull towards zero.
+
+Run from the repository root:
+>> python -m benchmarks.llm_cache --latency 0.2
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import src.llm_cache as llm_cache
+import src.llm_provider as llm_provider
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.deadline import Deadline
+from src.ingredients_parser import IngredientsParser
+from src.local_llm_server import LocalLLMServer
+from src.steps_parser import StepsParser
+
+
+def parse_recipe(deadline):
+    _, raw_ingredients, raw_steps = SAMPLE_RECIPE
+    ingredients = IngredientsParser(
+        raw_ingredients, mode="hybrid", deadline=deadline
+    ).parse()
+    StepsParser(raw_steps, ingredients, mode="hybrid", deadline=deadline).parse()
+
+
+def run(name, server, cache, latency):
+    """
+    Returns:
+        (LLM requests the server received, the parse's Deadline)
+    """
+    llm_provider.reset_usage()
+    requests_before = server.stats["requests"]
+    hits_before = cache.stats["memory_hits"] + cache.stats["disk_hits"]
+
+    deadline = Deadline(60, call_estimate=latency)
+    start = time.perf_counter()
+    parse_recipe(deadline)
+    elapsed = time.perf_counter() - start
+
+    requests = server.stats["requests"] - requests_before
+    hits = cache.stats["memory_hits"] + cache.stats["disk_hits"] - hits_before
+    print(
+        f"{name:>12}: {elapsed * 1e3:8.1f}ms  llm requests={requests:3d}  "
+        f"cache hits={hits:3d}"
+    )
+    return requests, deadline
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0, latency=args.latency).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+
+    with tempfile.TemporaryDirectory() as directory:
+        # work on a copy of the prompts so one can be edited safely
+        prompts = Path(directory) / "prompts"
+        shutil.copytree(llm_cache.PROMPTS_DIR, prompts)
+        llm_cache.PROMPTS_DIR = prompts
+        db = Path(directory) / "cache.sqlite3"
+
+        llm_cache._cache = llm_cache.LLMCache(db)
+        cold, cold_deadline = run("cold", server, llm_cache._cache, args.latency)
+        warm, warm_deadline = run("warm", server, llm_cache._cache, args.latency)
+
+        llm_cache._cache = llm_cache.LLMCache(db)
+        restart, restart_deadline = run(
+            "restart", server, llm_cache._cache, args.latency
+        )
+
+        with (prompts / "tools_prompt.txt").open("a") as f:
+            f.write("\nReturn tool names in lowercase.\n")
+        llm_cache._cache = llm_cache.LLMCache(db)
+        invalidated = llm_cache._cache.stats["invalidated"]
+        edited, _ = run("prompt edit", server, llm_cache._cache, args.latency)
+
+        print(f"invalidated on prompt edit: {invalidated} rows")
+        print(f"hit rate after edit: {llm_cache._cache.hit_rate():.0%}")
+        print(f"usage: {llm_provider.get_usage()}")
+
+    server.stop()
+
+    assert cold > 0 and warm == 0 and restart == 0
+    assert 0 < edited < cold and invalidated == edited
+    assert cold_deadline.calls > 0
+    for deadline in (warm_deadline, restart_deadline):
+        assert deadline.calls == 0 and deadline.call_estimate == args.latency
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Compares TLS handshakes and latency of hybrid-style LLM traffic against a
+local HTTPS stub (src/local_llm_server.py with a throwaway self-signed cert):
+    - before: one client per parser instance, as each parser used to build its own
+    - after: get_provider() handles sharing one pooled, keep-alive client
+
+Needs the `openssl` command line tool. Run from the repository root:
+>> python -m benchmarks.llm_connection_pool
+"""
+
+import os
+import subprocess
+import tempfile
+import time
+
+from src import llm_provider
+from src.llm_provider import LocalProvider, get_provider
+from src.local_llm_server import LocalLLMServer
+
+INITIALIZATIONS = 10
+# LLM clients one hybrid initialize used to create, and calls made through each
+CALLERS = {
+    "ingredients_parser": 3,
+    "methods_parser": 6,
+    "tools_parser": 6,
+    "steps_methods_parser": 6,
+    "steps_tools_parser": 6,
+    "chatbot": 2,
+}
+
+
+def make_cert(directory):
+    certfile = os.path.join(directory, "cert.pem")
+    keyfile = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl",
+            "req",
+            "-x509",
+            "-newkey",
+            "rsa:2048",
+            "-nodes",
+            "-keyout",
+            keyfile,
+            "-out",
+            certfile,
+            "-days",
+            "1",
+            "-subj",
+            "/CN=127.0.0.1",
+            "-addext",
+            "subjectAltName=IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return certfile, keyfile
+
+
+def run(make_provider):
+    start = time.perf_counter()
+    for _ in range(INITIALIZATIONS):
+        for caller, calls in CALLERS.items():
+            provider = make_provider(caller)
+            for i in range(calls):
+                provider.generate("local", f'INPUT JSON:\n{{"step": "stir {i}"}}')
+    return time.perf_counter() - start
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        certfile, keyfile = make_cert(directory)
+        server = LocalLLMServer(port=0, certfile=certfile, keyfile=keyfile).start()
+        os.environ["LLM_PROVIDER"] = "local"
+        os.environ["LOCAL_LLM_URL"] = server.url
+        os.environ["LOCAL_LLM_CA_BUNDLE"] = certfile
+
+        calls = INITIALIZATIONS * sum(CALLERS.values())
+        try:
+            before_connections = server.stats["connections"]
+            before = run(lambda caller: LocalProvider(server.url, verify=certfile))
+            before_handshakes = server.stats["connections"] - before_connections
+
+            llm_provider.reset_usage()
+            after_connections = server.stats["connections"]
+            after = run(get_provider)
+            after_handshakes = server.stats["connections"] - after_connections
+        finally:
+            server.stop()
+
+    print(f"{calls} calls over {INITIALIZATIONS} hybrid-style initializations")
+    print(f"{'':>8} {'handshakes':>11} {'total s':>9} {'ms/call':>9}")
+    print(
+        f"{'before':>8} {before_handshakes:>11} {before:>9.3f} {before / calls * 1e3:>9.2f}"
+    )
+    print(
+        f"{'after':>8} {after_handshakes:>11} {after:>9.3f} {after / calls * 1e3:>9.2f}"
+    )
+    print("per-caller usage (after):")
+    for caller, stats in llm_provider.get_usage().items():
+        print(f"  {caller}: {stats['calls']} calls, {stats['latency_s'] * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Checks that LLMBasedQA sends the recipe once (system instruction) and that
+every later turn carries only the question, against the local LLM stand-in
+server (src/local_llm_server.py), so no network or API key is needed.
+
+Run from the repository root:
+>> python -m benchmarks.llm_context_turns
+"""
+
+from src import LLM_based_qa
+from src.LLM_based_qa import LLMBasedQA
+from src.llm_provider import LocalProvider
+from src.local_llm_server import LocalLLMServer
+
+TURNS = 50
+
+
+def fake_recipe(url):
+    return (
+        {"title": "Synthetic Roast Chicken"},
+        {"ingredients": [f"{i} cups ingredient number {i}" for i in range(1, 31)]},
+        {"directions": [f"do the thing described in direction {i} for a while." for i in range(1, 21)]},
+    )
+
+
+def make_qa(server, **kwargs):
+    LLM_based_qa.get_recipe_data = fake_recipe
+    return LLMBasedQA(
+        "https://www.allrecipes.com/recipe/0/fake/",
+        provider=LocalProvider(server.url),
+        **kwargs,
+    )
+
+
+def main():
+    server = LocalLLMServer(port=0).start()
+    try:
+        qa = make_qa(server)
+        for i in range(TURNS):
+            qa.answer(f"what is step {i % 20 + 1}?")
+    finally:
+        server.stop()
+
+    turn_chars = [stat["prompt_chars"] for stat in qa.turn_stats]
+    prompt_tokens = [stat["prompt_tokens"] for stat in qa.turn_stats]
+    print(f"recipe context (sent once): {len(qa.recipe_context)} chars")
+    print(f"per-turn message chars: min {min(turn_chars)}, max {max(turn_chars)}")
+    print(
+        f"request tokens turn 1 / turn {TURNS}: {prompt_tokens[0]} / {prompt_tokens[-1]}"
+    )
+
+    legacy = len(qa.recipe_context) + max(turn_chars)
+    print(f"per-turn message chars when re-embedding the recipe: ~{legacy}")
+
+    assert max(turn_chars) - min(turn_chars) <= 2, "turn size should not depend on the turn"
+    assert max(turn_chars) < len(qa.recipe_context), "turns should not carry the recipe"
+    print("OK: constant-size turns")
+
+
+if __name__ == "__main__":
+    main()
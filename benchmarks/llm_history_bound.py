@@ -0,0 +1,71 @@
+"""
+Runs 200 LLMBasedQA turns against the local LLM stand-in server and checks
+that the request size stays bounded: the last turns are kept verbatim and
+older ones are folded into a rolling summary. Also checks that every fold
+restarts the chat on the bounded history, and the bounds of
+ConversationHistory itself on turns far longer than its budgets.
+
+Run from the repository root:
+>> python -m benchmarks.llm_history_bound
+"""
+
+from src.conversation_history import ConversationHistory, estimate_tokens
+from src.local_llm_server import LocalLLMServer
+from benchmarks.llm_context_turns import make_qa
+
+TURNS = 200
+TOKEN_BUDGET = 800
+
+
+def check_history_bounds():
+    history = ConversationHistory(token_budget=300, keep_turns=4, summary_budget=100)
+    for i in range(50):
+        folded = history.add_turn(f"question {i} " * 20, f"answer {i} " * (5 * i))
+        assert history.token_count() <= history.token_budget
+        assert len(history.turns) <= history.keep_turns
+        assert estimate_tokens(history.summary) <= history.summary_budget
+        if folded:
+            # the newest evicted turn is always in the summary
+            assert (
+                f"question {i - len(history.turns)}" in history.summary.splitlines()[-1]
+            )
+
+
+def main():
+    check_history_bounds()
+
+    server = LocalLLMServer(port=0).start()
+    restarts = 0
+    try:
+        qa = make_qa(server, history_token_budget=TOKEN_BUDGET, history_keep_turns=6)
+        for i in range(TURNS):
+            chat = qa.chat
+            qa.answer(
+                f"question {i}: how long should the chicken rest after step {i % 20}?"
+            )
+            if qa.chat is not chat:
+                # the new chat starts from the summary and the kept turns only
+                restarts += 1
+                assert qa.chat.history == qa.history.as_contents()
+    finally:
+        server.stop()
+
+    prompt_tokens = [stat["prompt_tokens"] for stat in qa.turn_stats]
+    history_tokens = [stat["history_tokens"] for stat in qa.turn_stats]
+    for turn in (1, 10, 50, 100, 200):
+        print(
+            f"turn {turn:>3}: prompt tokens {prompt_tokens[turn - 1]:>5}, "
+            f"history tokens {history_tokens[turn - 1]:>4}"
+        )
+    print(f"chat restarted on the bounded history {restarts} times")
+
+    assert restarts > 0 and qa.history.summary
+    assert max(history_tokens) <= TOKEN_BUDGET, "history exceeded its token budget"
+    assert (
+        max(prompt_tokens[100:]) <= max(prompt_tokens[:100]) + 10
+    ), "requests kept growing"
+    print(f"OK: request size bounded over {TURNS} turns")
+
+
+if __name__ == "__main__":
+    main()
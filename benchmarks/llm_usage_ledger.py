@@ -0,0 +1,112 @@
+"""
+LLM usage ledgers (src/llm_ledger.py) through the backend: initializes a
+hybrid session of the sample recipe (served by the RecipeSite stand-in,
+parsed against the local LLM stand-in), initializes a second one under another
+URL, whose parse is answered from the in-memory LLM response cache, and chats
+with the first. Prints the per-caller usage the API returned for each parse and
+the usage of the chat session, and checks the ledgers against the
+process-wide usage counters.
+
+Run from the repository root:
+>> python -m benchmarks.llm_usage_ledger --latency 0.05
+"""
+
+import argparse
+import os
+
+from benchmarks.hybrid_local_llm import QUESTIONS
+from benchmarks.recipe_site import RecipeSite
+from src.local_llm_server import LocalLLMServer
+
+RECIPE_URL = "http://www.allrecipes.com/recipe/{}/sample/"
+COUNTS = ("calls", "failures", "cache_hits", "prompt_tokens", "output_tokens")
+
+
+def print_usage(label, usage):
+    print(
+        f"{label}: {usage['calls']} calls, {usage['cache_hits']} cache hits, "
+        f"{usage['prompt_tokens']} + {usage['output_tokens']} tokens, "
+        f"{usage['latency_s']:.3f} s in calls, {usage['wait_s']:.3f} s waiting, "
+        f"{usage['sleep_s']:.3f} s sleeping"
+    )
+    for caller, stats in sorted(usage["by_caller"].items()):
+        print(
+            f"  {caller:<24} {stats['calls']:4d} calls  {stats['cache_hits']:4d} hits"
+            f"  {stats['prompt_tokens']:7d} + {stats['output_tokens']:6d} tokens"
+            f"  {stats['latency_s']:7.3f} s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    site = RecipeSite().start()
+    server = LocalLLMServer(
+        port=0, latency=args.latency, error_rate=args.error_rate
+    ).start()
+    os.environ["http_proxy"] = site.url
+    os.environ["no_proxy"] = "127.0.0.1,localhost"
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    # memory-only response cache, empty at start
+    os.environ["LLM_CACHE"] = "1"
+    os.environ["LLM_CACHE_PATH"] = ""
+
+    from backend import api
+    from src.llm_provider import get_usage, reset_usage
+    from src.prefetch import AnswerPrefetcher
+
+    reset_usage()
+    client = api.app.test_client()
+    parses = []
+    for i in range(2):
+        response = client.post(
+            "/api/initialize",
+            json={
+                "url": RECIPE_URL.format(i),
+                "session_id": f"usage-{i}",
+                "mode": "hybrid",
+            },
+        )
+        assert response.status_code == 200, response.json
+        parses.append(response.json["llm_usage"])
+
+    turns = []
+    for question in QUESTIONS:
+        response = client.post(
+            "/api/chat", json={"question": question, "session_id": "usage-0"}
+        )
+        assert response.status_code == 200, response.json
+        turns.append(response.json["llm_usage"]["turn"])
+    metrics = client.get("/api/metrics").get_data(as_text=True)
+
+    # the session's ledger also has the answers prefetched in the background
+    bot = api.bots["usage-0"][0]
+    AnswerPrefetcher.executor.shutdown(wait=True)
+    session = bot.chat_usage.totals()
+    prefetched = session["calls"] - sum(turn["calls"] for turn in turns)
+
+    site.stop()
+    server.stop()
+
+    print_usage("parse", parses[0])
+    print_usage("parse, LLM cache warm", parses[1])
+    print_usage(f"chat session ({len(turns)} turns)", session)
+    print(f"  of which {prefetched} calls prefetched answers")
+
+    # every call is in exactly one of the ledgers
+    usage = get_usage()
+    for field in COUNTS:
+        ledgers = sum(p[field] for p in parses) + session[field]
+        assert ledgers == sum(stats[field] for stats in usage.values()), field
+    assert prefetched >= 0
+    assert parses[0]["calls"] > 0 and parses[1]["cache_hits"] > 0
+    assert parses[1]["calls"] < parses[0]["calls"]
+    assert "recipe_parser_llm_calls_total{caller=" in metrics
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Throughput and memory of the backend served by the Flask development server
+(`flask run`, one process) and by backend/serve.py with 1, 4 and 8 preforked
+workers. --clients threads post /api/initialize (classical mode, the sample
+recipe served by the RecipeSite stand-in) for --duration seconds; reports
+initializations per second, p50/p99 latency, and the memory of the whole
+process tree: total RSS counts pages shared copy-on-write once per process,
+total PSS splits them between the processes that share them.
+
+Run from the repository root:
+>> python -m benchmarks.multiworker --workers 1 4 8 --clients 16 --duration 10
+"""
+
+import argparse
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from benchmarks.recipe_site import RecipeSite
+
+# a new URL per request, so every initialization parses instead of reusing
+# the stored recipe
+RECIPE_URL = "http://www.allrecipes.com/recipe/{}/sample/"
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_tree(root):
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    stat = f.read()
+            except OSError:
+                continue
+            # the fields after the command name, which is in parentheses
+            parents[int(entry)] = int(stat.rsplit(")", 1)[1].split()[1])
+    tree = [root]
+    for pid in tree:
+        tree += [child for child, parent in parents.items() if parent == pid]
+    return tree
+
+
+def memory_mb(root):
+    """Total RSS and PSS of the process tree, in MB."""
+    rss = pss = 0
+    for pid in process_tree(root):
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Rss:"):
+                        rss += int(line.split()[1])
+                    elif line.startswith("Pss:"):
+                        pss += int(line.split()[1])
+        except OSError:
+            continue
+    return rss / 1024, pss / 1024
+
+
+def start_server(command, port, env):
+    process = subprocess.Popen(
+        command,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        start_new_session=True,
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        try:
+            requests.get(f"{url}/api/health", timeout=1)
+            return process, url
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start: {command}")
+
+
+def stop_server(process):
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+
+
+def load(url, clients, duration, prefix="load"):
+    latencies, errors = [], []
+    end = time.perf_counter() + duration
+
+    def client(i):
+        session = requests.Session()
+        n = 0
+        while time.perf_counter() < end:
+            start = time.perf_counter()
+            response = session.post(
+                f"{url}/api/initialize",
+                json={
+                    "url": RECIPE_URL.format(f"{prefix}-{i}-{n}"),
+                    "session_id": f"{prefix}-{i}-{n}",
+                },
+            )
+            if response.ok:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors.append(response.status_code)
+            n += 1
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--threads", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    args = parser.parse_args()
+
+    site = RecipeSite().start()
+    env = dict(os.environ, http_proxy=site.url, no_proxy="127.0.0.1,localhost")
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.getcwd()] + [p for p in env.get("PYTHONPATH", "").split(os.pathsep) if p]
+    )
+    # the servers' own admission limits are not what is measured here
+    env.setdefault("ADMIT_INIT_CLASSICAL_LIMIT", "1000")
+    env.setdefault("ADMIT_INIT_QUEUE", "1000")
+
+    configs = [("dev server", None)] + [(f"{n} workers", n) for n in args.workers]
+    results = {}
+    for name, workers in configs:
+        port = free_port()
+        if workers is None:
+            command = [sys.executable, "-m", "flask", "--app", "backend.api"]
+            command += ["run", "--port", str(port), "--no-reload", "--no-debugger"]
+        else:
+            command = [sys.executable, "-m", "backend.serve", "--port", str(port)]
+            command += ["--workers", str(workers), "--threads", str(args.threads)]
+        process, url = start_server(command, port, env)
+
+        # one initialization per process loads the remaining lazy state
+        load(url, max(workers or 1, 1) * 2, 0.1, prefix="warmup")
+        idle_rss, idle_pss = memory_mb(process.pid)
+        latencies, errors = load(url, args.clients, args.duration)
+        rss, pss = memory_mb(process.pid)
+        stop_server(process)
+
+        results[name] = (latencies, idle_rss, idle_pss)
+        print(
+            f"{name:<12} {len(latencies) / args.duration:6.1f} init/s  "
+            f"p50={percentile(latencies, 0.5) * 1e3:6.0f}ms  "
+            f"p99={percentile(latencies, 0.99) * 1e3:6.0f}ms  errors={len(errors)}  "
+            f"idle RSS={idle_rss:6.0f}MB PSS={idle_pss:6.0f}MB  "
+            f"after load RSS={rss:6.0f}MB PSS={pss:6.0f}MB"
+        )
+        assert latencies and not errors
+
+    site.stop()
+    print(f"({os.cpu_count()} CPUs)")
+
+    # workers share the preloaded memory: PSS grows by much less than a
+    # process per worker
+    single = results[f"{args.workers[0]} workers"]
+    for workers in args.workers[1:]:
+        _, _, pss = results[f"{workers} workers"]
+        assert pss < single[2] * workers / args.workers[0]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+"""
+Benchmark suite of the parsers over the fixture corpus in benchmarks/corpus:
+saved recipe pages of the three supported sites, listed in manifest.json with
+their sha256 (change a page or add one and bump the manifest's "version", so
+that results of different corpora are never compared).
+
+Every case is timed call by call over the whole corpus for --rounds rounds and
+reports throughput (calls/s), p50 / p99 latency and the peak memory allocated
+during one more pass (tracemalloc, kept out of the timed rounds). The run is
+compared with the stored baseline (--baseline): a case whose p50 latency or
+peak memory grew by more than --threshold is flagged, and the run exits with
+status 1. --save stores the run as the new baseline; baselines are per machine,
+so they are not checked in.
+
+Run from the repository root:
+>> python -m benchmarks.parser_suite --save
+>> python -m benchmarks.parser_suite --rounds 20 --threshold 0.25
+"""
+
+import argparse
+import functools
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from urllib.parse import urlparse
+
+from bs4 import BeautifulSoup
+
+from src.chatbot import Chatbot
+from src.ingredients_parser import IngredientsParser
+from src.methods_parser import MethodsParser
+from src.scraper import _extract_json_ld_recipe
+from src.steps_parser import StepsParser
+from src.tools_parser import ToolsParser
+
+CORPUS_DIR = Path(__file__).resolve().parent / "corpus"
+DEFAULT_BASELINE = ".benchmarks/parser_suite.json"
+
+INGREDIENT_EXTRACTORS = (
+    "extract_ingredients_names",
+    "extract_quantities",
+    "extract_measurement_units",
+    "extract_descriptors",
+    "extract_preparations",
+)
+
+QUESTIONS = [
+    "show me the ingredients",
+    "go to the next step",
+    "what are the ingredients in the current step",
+    "what tools do i need for this step",
+    "how long do i cook it",
+    "what temperature",
+    "how much salt do i need",
+    "how do i do that",
+]
+
+# peak memory growth below this is noise, whatever the threshold
+MEMORY_FLOOR_KIB = 16
+
+
+class Page:
+    """One saved page of the corpus and what the parsers make of it."""
+
+    def __init__(self, path: Path, url: str):
+        self.url = url
+        self.domain = urlparse(url).netloc
+        self.soup = BeautifulSoup(path.read_text(encoding="utf-8"), "lxml")
+        title, ingredients, directions = _extract_json_ld_recipe(
+            self.soup, url, self.domain
+        )
+        self.title = {"title": title}
+        self.ingredients = {"ingredients": ingredients}
+        self.directions = {"directions": directions}
+        self.parsed_ingredients = IngredientsParser(self.ingredients).parse()
+        self.atomic_steps = StepsParser(
+            self.directions, self.parsed_ingredients
+        ).split_directions_into_atomic_steps()
+
+
+def load_corpus(directory: Path = CORPUS_DIR):
+    """Loads the corpus, checking every page against the manifest.
+
+    Returns:
+        (corpus version, list of Page)
+
+    Raises:
+        ValueError: If a page differs from the one the manifest lists
+    """
+    manifest = json.loads((directory / "manifest.json").read_text(encoding="utf-8"))
+    pages = []
+    for entry in manifest["pages"]:
+        path = directory / entry["path"]
+        if hashlib.sha256(path.read_bytes()).hexdigest() != entry["sha256"]:
+            raise ValueError(
+                f"{entry['path']} does not match manifest.json: update its sha256 "
+                "and bump the corpus version"
+            )
+        pages.append(Page(path, entry["url"]))
+    return manifest["version"], pages
+
+
+def _step_calls(make_parser, method):
+    """A case calling `method` of the parser make_parser(page) on each atomic step."""
+
+    def calls(page):
+        bound = getattr(make_parser(page), method)
+        return [functools.partial(bound, step) for step in page.atomic_steps]
+
+    return calls
+
+
+def _ingredient_calls(method):
+    return lambda page: [getattr(IngredientsParser(page.ingredients), method)]
+
+
+def _respond_calls(page):
+    bot = Chatbot(mode="classical", backend=True, prefetch=False)
+    bot.title, bot.raw_ingredients, bot.raw_steps = (
+        page.title,
+        page.ingredients,
+        page.directions,
+    )
+    bot._process_metadata()
+
+    def respond(question):
+        bot.current_step = 0
+        return bot.respond(question)
+
+    return [functools.partial(respond, question) for question in QUESTIONS]
+
+
+def _steps_parser(page):
+    return StepsParser(page.directions, page.parsed_ingredients)
+
+
+def cases():
+    """
+    Returns:
+        {case name: page -> list of calls (no arguments) making one pass}
+    """
+    suite = {
+        "scraper._extract_json_ld_recipe": lambda page: [
+            functools.partial(_extract_json_ld_recipe, page.soup, page.url, page.domain)
+        ],
+    }
+    for method in INGREDIENT_EXTRACTORS:
+        suite[f"IngredientsParser.{method}"] = _ingredient_calls(method)
+    suite.update(
+        {
+            "StepsParser.split_directions_into_atomic_steps": lambda page: [
+                _steps_parser(page).split_directions_into_atomic_steps
+            ],
+            "StepsParser.extract_ingredients_from_step": _step_calls(
+                _steps_parser, "extract_ingredients_from_step"
+            ),
+            "ToolsParser.extract_tools": _step_calls(
+                lambda page: ToolsParser(page.directions), "extract_tools"
+            ),
+            "MethodsParser.extract_methods": _step_calls(
+                lambda page: MethodsParser(page.directions), "extract_methods"
+            ),
+            "Chatbot.respond": _respond_calls,
+        }
+    )
+    return suite
+
+
+def percentile(samples, q):
+    """Nearest-rank percentile of sorted samples."""
+    return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+def measure(calls, rounds):
+    """Times each call `rounds` times, then the peak memory of one more pass.
+
+    Returns:
+        {"calls_per_s", "p50_us", "p99_us", "peak_kib"}
+    """
+    for call in calls:  # warm-up
+        call()
+
+    samples = []
+    for _ in range(rounds):
+        for call in calls:
+            start = time.perf_counter()
+            call()
+            samples.append(time.perf_counter() - start)
+    samples.sort()
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for call in calls:
+        call()
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return {
+        "calls_per_s": round(len(samples) / sum(samples), 1),
+        "p50_us": round(percentile(samples, 0.5) * 1e6, 2),
+        "p99_us": round(percentile(samples, 0.99) * 1e6, 2),
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Returns:
+        {case: list of "<metric> +x%" regressions} for the cases of results that
+        regressed against baseline
+    """
+    regressions = {}
+    for case, stats in results.items():
+        base = baseline.get(case)
+        if base is None:
+            continue
+        found = []
+        if stats["p50_us"] > base["p50_us"] * (1 + threshold):
+            found.append(f"p50 {stats['p50_us'] / base['p50_us'] - 1:+.0%}")
+        if (
+            stats["peak_kib"] > base["peak_kib"] * (1 + threshold)
+            and stats["peak_kib"] - base["peak_kib"] > MEMORY_FLOOR_KIB
+        ):
+            found.append(
+                f"peak {stats['peak_kib'] / max(base['peak_kib'], 0.1) - 1:+.0%}"
+            )
+        if found:
+            regressions[case] = found
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--filter", default="", help="only cases containing this")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.25)
+    parser.add_argument("--save", action="store_true", help="store as the baseline")
+    args = parser.parse_args()
+
+    version, pages = load_corpus()
+    print(f"corpus v{version}: {len(pages)} pages\n")
+
+    baseline = None
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline["corpus_version"] != version:
+            print(
+                f"baseline is of corpus v{baseline['corpus_version']}, not compared\n"
+            )
+            baseline = None
+
+    results = {}
+    print(
+        f"{'case':<48} {'calls/s':>10} {'p50 us':>10} {'p99 us':>10} {'peak KiB':>9}"
+        + ("   p50 vs baseline" if baseline else "")
+    )
+    for case, make_calls in cases().items():
+        if args.filter not in case:
+            continue
+        calls = [call for page in pages for call in make_calls(page)]
+        stats = results[case] = measure(calls, args.rounds)
+        line = (
+            f"{case:<48} {stats['calls_per_s']:>10.1f} {stats['p50_us']:>10.2f} "
+            f"{stats['p99_us']:>10.2f} {stats['peak_kib']:>9.1f}"
+        )
+        if baseline and case in baseline["cases"]:
+            line += f"   {stats['p50_us'] / baseline['cases'][case]['p50_us'] - 1:+.1%}"
+        print(line)
+
+    if args.save:
+        os.makedirs(os.path.dirname(args.baseline) or ".", exist_ok=True)
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "corpus_version": version,
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                    "rounds": args.rounds,
+                    "cases": {**(baseline or {}).get("cases", {}), **results},
+                },
+                f,
+                indent=2,
+            )
+        print(f"\nbaseline saved to {args.baseline}")
+        return
+
+    if baseline is None:
+        print("\nno baseline to compare with (store one with --save)")
+        return
+    regressions = compare(results, baseline["cases"], args.threshold)
+    if regressions:
+        print(f"\nregressions (more than {args.threshold:.0%} worse):")
+        for case, found in regressions.items():
+            print(f"  {case}: {', '.join(found)}")
+        sys.exit(1)
+    print(f"\nno regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Speculative prefetching in hybrid chat, against the local LLM stand-in server:
+the user moves to the next step, reads it for --think seconds, then asks the
+usual questions about it. Compares answer latency with and without the
+prefetcher and reports its hit rate, latency saved and cancellations
+(a burst of quick "next step" commands cancels the prefetches left behind).
+
+Run from the repository root:
+>> python -m benchmarks.prefetch --latency 0.5 --think 1.0
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+from src.local_llm_server import LocalLLMServer
+from src.prefetch import RateBudget
+
+QUESTIONS = [
+    "how much time does this step need",
+    "how hot should it be",
+    "how do you do that",
+]
+
+
+def make_bot(prefetch, server):
+    latency = server.latency
+    server.latency = 0.0  # parse quickly, only chat latency is measured
+
+    bot = Chatbot(mode="hybrid", backend=True, prefetch=prefetch)
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+
+    server.latency = latency
+    if bot.prefetcher is not None:
+        bot.prefetcher.budget = RateBudget(rate_per_minute=600, burst=12)
+    return bot
+
+
+def walk(bot, think):
+    latencies = []
+    for _ in range(len(bot.steps) - 1):
+        bot.respond("go to the next step")
+        time.sleep(think)
+        for question in QUESTIONS:
+            start = time.perf_counter()
+            bot.respond(question)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--think", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0, latency=args.latency).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    cold = walk(make_bot(False, server), args.think)
+    bot = make_bot(True, server)
+    warm = walk(bot, args.think)
+
+    print(f"without prefetch: mean={statistics.mean(cold) * 1e3:7.1f}ms")
+    print(f"with prefetch:    mean={statistics.mean(warm) * 1e3:7.1f}ms")
+    print(f"hit rate: {bot.prefetcher.hit_rate():.0%}")
+    print(f"latency saved: {bot.prefetcher.stats['latency_saved_s']:.2f}s")
+
+    # navigating faster than the server answers cancels stale prefetches
+    bot = make_bot(True, server)
+    for _ in range(len(bot.steps) - 1):
+        bot.respond("go to the next step")
+    bot.prefetcher.cancel_all()
+    print(f"quick navigation: {bot.prefetcher.stats}")
+
+    server.stop()
+
+    assert statistics.mean(warm) < statistics.mean(cold)
+    assert bot.prefetcher.stats["cancelled"] > 0
+
+
+if __name__ == "__main__":
+    main()
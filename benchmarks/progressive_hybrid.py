@@ -0,0 +1,68 @@
+"""
+Progressive hybrid mode against the local LLM stand-in server: time until the
+session answers its first question, blocking hybrid parse vs. classical parse
+with the LLM step annotations upgraded in the background. Also reports when
+the steps were swapped in, and checks that the progressive session ends up
+identical to the blocking hybrid one.
+
+Run from the repository root:
+>> python -m benchmarks.progressive_hybrid --latency 0.3
+"""
+
+import argparse
+import os
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+from src.local_llm_server import LocalLLMServer
+
+QUESTION = "what tools do i need for this step"
+
+
+def first_answer(progressive):
+    start = time.perf_counter()
+    bot = Chatbot(mode="hybrid", backend=True, prefetch=False, progressive=progressive)
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+    bot.respond(QUESTION)
+    return bot, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0, latency=args.latency).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    blocking, blocking_s = first_answer(progressive=False)
+    print(f"blocking hybrid:    first answer after {blocking_s * 1e3:7.1f}ms")
+
+    progressive, progressive_s = first_answer(progressive=True)
+    print(f"progressive hybrid: first answer after {progressive_s * 1e3:7.1f}ms")
+    print(f"upgrades right after the first answer: {progressive.upgrade_status()}")
+
+    start = time.perf_counter()
+    assert progressive.wait_for_upgrades(timeout=60)
+    print(
+        f"steps upgraded {(time.perf_counter() - start) * 1e3:.1f}ms later: "
+        f"{progressive.upgrade_status()}"
+    )
+
+    server.stop()
+
+    assert progressive_s < blocking_s
+    assert progressive.upgrade_status()["upgraded"] == ["steps"]
+    assert progressive.steps == blocking.steps
+    assert progressive.step_answers == blocking.step_answers
+    assert progressive.methods == blocking.methods
+    assert progressive.tools == blocking.tools
+
+
+if __name__ == "__main__":
+    main()
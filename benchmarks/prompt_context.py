@@ -0,0 +1,108 @@
+"""
+Prompt payload size of the hybrid parameter / clarification / procedure
+questions: the old payload (every step, ingredient, tool and procedure
+definition, indented JSON) vs. the StepContextBuilder slice (compact JSON
+under a token budget), on the sample recipe.
+
+Quality check: for every fixture, the facts an answer needs (current step
+text, the matching definition, the asked-about ingredient) must still be in
+the compact payload.
+
+Run from the repository root:
+>> python -m benchmarks.prompt_context --budget 800
+"""
+
+import argparse
+import json
+import statistics
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+from src.conversation_history import estimate_tokens
+from src.prompt_context import compact_json
+
+# (question, current step, question type, expected content)
+FIXTURES = [
+    ("how hot should the oven be", 0, "parameter", ["425"]),
+    ("how long should i roast it", 3, "parameter", ["1 hour"]),
+    ("when is it done", 3, "parameter", ["juices run clear"]),
+    ("how long should it rest", 4, "parameter", ["10 minutes"]),
+    ("what is a roasting pan", 2, "clarification", ['"roasting pan"']),
+    ("what is a whisk", 0, "clarification", ['"whisk"']),
+    ("define saute", 1, "clarification", ['"saute"']),
+    ("how do you roast", 3, "procedure", ['"roast"']),
+    ("how do i season it", 1, "procedure", ["season with salt and pepper"]),
+    ("how much butter do i rub on", 1, "parameter", ["butter"]),
+]
+
+
+def make_bot():
+    bot = Chatbot(backend=True)
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+    return bot
+
+
+def full_payload(bot, question, question_type):
+    # what _llm_parameter_clarification_procedure sent before the context builder
+    return json.dumps(
+        {
+            "user_query": question,
+            "current_step_index": bot.current_step,
+            "steps": bot.steps,
+            "ingredients": bot.ingredients,
+            "tool_definitions": bot.usages,
+            "procedure_definitions": bot.procedures,
+            "youtube_search_url": bot._get_youtube_link(question),
+            "question_type": question_type,
+        },
+        ensure_ascii=False,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=int, default=800)
+    args = parser.parse_args()
+
+    bot = make_bot()
+    before, after, missing = [], [], []
+
+    for question, step, question_type, expected in FIXTURES:
+        bot.current_step = step
+        full = full_payload(bot, question, question_type)
+        compact = compact_json(
+            bot.context_builder.build(
+                question,
+                question_type,
+                bot.steps,
+                step,
+                bot.ingredients,
+                bot._get_youtube_link(question),
+                token_budget=args.budget,
+            )
+        )
+        before.append(estimate_tokens(full))
+        after.append(estimate_tokens(compact))
+
+        for fact in expected:
+            assert fact in full, (question, fact)
+            if fact not in compact:
+                missing.append((question, fact))
+
+        print(f"{question:<32} {before[-1]:>6} -> {after[-1]:>4} tokens")
+
+    print(
+        f"mean payload tokens: {statistics.mean(before):.0f} -> "
+        f"{statistics.mean(after):.0f} "
+        f"({1 - statistics.mean(after) / statistics.mean(before):.0%} smaller)"
+    )
+    print(f"fixture facts missing from the compact payload: {missing or 'none'}")
+
+    assert max(after) <= args.budget
+    assert not missing
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Stand-in for the supported recipe websites, so the backend can be benchmarked
+end to end without network access: an HTTP proxy that answers every GET with a
+recipe page (JSON-LD, as get_recipe_data expects). Point the backend at it with
+http_proxy=<server.url> and use http:// recipe URLs.
+"""
+
+import html
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+
+
+def recipe_page(recipe=SAMPLE_RECIPE) -> str:
+    title, ingredients, directions = recipe
+    data = {
+        "@context": "https://schema.org",
+        "@type": "Recipe",
+        "name": title["title"],
+        "recipeIngredient": ingredients["ingredients"],
+        "recipeInstructions": [
+            {"@type": "HowToStep", "text": text} for text in directions["directions"]
+        ],
+    }
+    return (
+        f"<html><head><title>{html.escape(title['title'])}</title>"
+        f'<script type="application/ld+json">{json.dumps(data)}</script>'
+        "</head><body></body></html>"
+    )
+
+
+class RecipeSite:
+    def __init__(self, port: int = 0, page: str = None):
+        """
+        Args:
+            port: Port to listen on, 0 for any free port
+            page: HTML served for every URL (default: the sample recipe)
+        """
+        body = (page or recipe_page()).encode("utf-8")
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,220 @@
+"""
+Scaling stress suite: runs each parser on synthetic recipes
+(benchmarks/synthetic_recipe.py) of growing size, prints time and peak memory
+against size as a table and a log-scale chart, and fits the complexity
+exponent k of time ~ size^k (least squares on log-log, over the sizes from
+--fit-from up, where fixed costs no longer dominate). A case whose time or
+memory exponent exceeds its bound fails the run (exit status 1).
+
+Size n is a recipe of n ingredient lines and n directions, except for the
+conjuncts case: one sentence chaining n actions. Matching every step against
+every ingredient is n x n work, and the more ingredients share words ("fresh",
+"chicken"), the more of them each step mentions: those cases are bounded by a
+quadratic, everything else by a linear exponent. The answer tables are built
+from steps of two ingredients each, as benchmarks/answer_tables.py does, so
+that they measure the tables rather than the matching. The conjuncts case
+times the split alone, but its one long sentence goes through the spaCy model
+twice: its exponent is only meaningful with en_core_web_sm installed.
+
+Run from the repository root:
+>> python -m benchmarks.scaling_stress --sizes 10 30 100 300 1000
+>> python -m benchmarks.scaling_stress --bound StepsParser.parse=1.5 --json scaling.json
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+
+from benchmarks.synthetic_recipe import chained_direction, synthetic_recipe
+from src.chatbot import Chatbot
+from src.ingredients_parser import IngredientsParser
+from src.methods_parser import MethodsParser
+from src.steps_parser import StepsParser
+from src.tools_parser import ToolsParser
+
+# default bounds of the fitted exponents (linear or quadratic, with some slack)
+BOUNDS = {
+    "IngredientsParser.parse": 1.3,
+    "StepsParser.split_directions_into_atomic_steps": 1.3,
+    "StepsParser.split_directions_into_atomic_steps (conjuncts)": 1.3,
+    "StepsParser.extract_ingredients_from_step": 2.3,
+    "ToolsParser.parse": 1.3,
+    "MethodsParser.parse": 1.3,
+    "StepsParser.parse": 2.3,
+    "Chatbot._build_answer_tables": 1.3,
+}
+
+
+class Sized:
+    """A synthetic recipe of size n, with the classical parses cases start from."""
+
+    def __init__(self, n):
+        self.n = n
+        self.title, self.ingredients, self.directions = synthetic_recipe(n)
+        self.parsed_ingredients = IngredientsParser(self.ingredients).parse()
+        self.steps_parser = StepsParser(self.directions, self.parsed_ingredients)
+        self.atomic_steps = self.steps_parser.split_directions_into_atomic_steps()
+        self.conjuncts_parser = StepsParser(chained_direction(n), [])
+        names = [ing["ingredient_name"] for ing in self.parsed_ingredients]
+        self.parsed_steps = [
+            {
+                "step_number": i + 1,
+                "description": step,
+                "ingredients": [names[i % n], names[(i + 1) % n]],
+                "tools": ["oven"],
+                "methods": ["bake"],
+                "time": {"duration": "10 minutes"},
+                "temperature": None,
+                "type": "actionable",
+            }
+            for i, step in enumerate(self.atomic_steps)
+        ]
+
+
+def _match_all(sized):
+    for step in sized.atomic_steps:
+        sized.steps_parser.extract_ingredients_from_step(step)
+
+
+def _answer_tables(sized):
+    bot = Chatbot(mode="classical", backend=True, prefetch=False)
+    bot.title, bot.raw_ingredients = sized.title, sized.ingredients
+    bot.steps = sized.parsed_steps
+    bot._build_answer_tables()
+
+
+CASES = {
+    "IngredientsParser.parse": lambda s: IngredientsParser(s.ingredients).parse(),
+    "StepsParser.split_directions_into_atomic_steps": lambda s: StepsParser(
+        s.directions, s.parsed_ingredients
+    ).split_directions_into_atomic_steps(),
+    "StepsParser.split_directions_into_atomic_steps (conjuncts)": lambda s: (
+        s.conjuncts_parser.split_directions_into_atomic_steps()
+    ),
+    "StepsParser.extract_ingredients_from_step": _match_all,
+    "ToolsParser.parse": lambda s: ToolsParser(s.directions).parse(),
+    "MethodsParser.parse": lambda s: MethodsParser(s.directions).parse(),
+    "StepsParser.parse": lambda s: StepsParser(
+        s.directions, s.parsed_ingredients
+    ).parse(),
+    "Chatbot._build_answer_tables": _answer_tables,
+}
+
+
+def measure(fn, sized, repeat):
+    """
+    Returns:
+        (best time of `repeat` runs in seconds, peak memory of one run in bytes)
+    """
+    fn(sized)  # warm-up
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(sized)
+        best = min(best, time.perf_counter() - start)
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    fn(sized)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+    return best, peak
+
+
+def fit_exponent(sizes, values):
+    """Slope of the least-squares line through (log size, log value)."""
+    xs = [math.log(n) for n in sizes]
+    ys = [math.log(max(v, 1e-9)) for v in values]
+    mx, my = sum(xs) / len(xs), sum(ys) / len(ys)
+    return sum((x - mx) * (y - my) for x, y in zip(xs, ys)) / sum(
+        (x - mx) ** 2 for x in xs
+    )
+
+
+def chart(sizes, times, width=40):
+    """Bars of log(time), scaled to the run's smallest and largest times."""
+    low, high = math.log(min(times)), math.log(max(times))
+    span = (high - low) or 1.0
+    return [
+        f"    {n:>6} | {'#' * (1 + round((math.log(t) - low) / span * (width - 1)))}"
+        for n, t in zip(sizes, times)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 30, 100, 300, 1000]
+    )
+    parser.add_argument("--fit-from", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--filter", default="", help="only cases containing this")
+    parser.add_argument(
+        "--bound",
+        action="append",
+        default=[],
+        metavar="CASE=EXPONENT",
+        help="override the exponent bound of a case",
+    )
+    parser.add_argument("--json", help="write the measurements to this file")
+    args = parser.parse_args()
+
+    bounds = dict(BOUNDS)
+    for override in args.bound:
+        case, exponent = override.rsplit("=", 1)
+        if case not in bounds:
+            parser.error(f"unknown case {case}")
+        bounds[case] = float(exponent)
+
+    sizes = sorted(args.sizes)
+    fitted = [n for n in sizes if n >= args.fit_from]
+    if len(fitted) < 2:
+        parser.error("need at least two sizes from --fit-from up")
+
+    recipes = [Sized(n) for n in sizes]
+
+    results, failures = {}, []
+    for case, fn in CASES.items():
+        if args.filter not in case:
+            continue
+        times, peaks = zip(*(measure(fn, sized, args.repeat) for sized in recipes))
+        keep = [i for i, n in enumerate(sizes) if n >= args.fit_from]
+        time_k = fit_exponent(fitted, [times[i] for i in keep])
+        memory_k = fit_exponent(fitted, [peaks[i] for i in keep])
+        results[case] = {
+            "sizes": sizes,
+            "seconds": times,
+            "peak_bytes": peaks,
+            "time_exponent": round(time_k, 2),
+            "memory_exponent": round(memory_k, 2),
+            "bound": bounds[case],
+        }
+
+        failed = time_k > bounds[case] or memory_k > bounds[case]
+        if failed:
+            failures.append(case)
+        print(
+            f"{case}: time ~ n^{time_k:.2f}, memory ~ n^{memory_k:.2f} "
+            f"(bound {bounds[case]}){'  FAIL' if failed else ''}"
+        )
+        print(f"    {'n':>6}   {'ms':>10} {'peak KiB':>10}")
+        for n, t, peak in zip(sizes, times, peaks):
+            print(f"    {n:>6}   {t * 1e3:>10.3f} {peak / 1024:>10.1f}")
+        print("\n".join(chart(sizes, times)))
+        print()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if failures:
+        print("complexity above bound: " + ", ".join(failures))
+        sys.exit(1)
+    print("all cases within their complexity bounds")
+
+
+if __name__ == "__main__":
+    main()
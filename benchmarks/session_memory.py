@@ -0,0 +1,70 @@
+"""
+Measures memory and construction time of 1, 100 and 1000 backend Chatbot
+sessions, new and on a shared parsed recipe (load_recipe, as the backend
+rebuilds sessions). Helper JSON files, token indexes, query patterns and the
+Gemini client are class-level, the recipe and its tables are shared, and the
+cancellation token and usage ledgers are only created when used, so each extra
+session should only cost its own state.
+
+Run from the repository root:
+>> python -m benchmarks.session_memory
+"""
+
+import gc
+import time
+import tracemalloc
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+
+# per-session bound, well above what the instance state takes
+MAX_SESSION_BYTES = 1024
+
+
+def make_sessions(n, recipe=None):
+    sessions = []
+    for _ in range(n):
+        bot = Chatbot(backend=True)
+        if recipe is not None:
+            bot.load_recipe(recipe)
+        sessions.append(bot)
+    return sessions
+
+
+def main():
+    # first instance pays for the process-wide resources
+    tracemalloc.start()
+    make_sessions(1)
+    shared, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"shared resources: {shared / 1024:.1f} KiB")
+
+    parsed = Chatbot(backend=True)
+    parsed.url = "https://www.allrecipes.com/recipe/0/sample/"
+    parsed.title, parsed.raw_ingredients, parsed.raw_steps = SAMPLE_RECIPE
+    parsed._process_metadata()
+    recipe = parsed.shared_state()
+
+    print(
+        f"{'sessions':>9} {'recipe':>7} {'total KiB':>10} {'per session B':>14} "
+        f"{'init ms':>9}"
+    )
+    for label, shared_recipe in (("none", None), ("shared", recipe)):
+        for n in (1, 100, 1000):
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            sessions = make_sessions(n, shared_recipe)
+            elapsed = (time.perf_counter() - start) * 1e3
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{n:>9} {label:>7} {current / 1024:>10.1f} {current / n:>14.0f} "
+                f"{elapsed:>9.2f}"
+            )
+            del sessions
+        assert current / n <= MAX_SESSION_BYTES, f"{current / n:.0f} B per session"
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""
+Latency of serving a chat request for a session whose bot this process has to
+rebuild from the session store (backend/api.py _load_session), for the
+in-process and the SQLite store:
+- up to date: the process served the session's previous request
+- stale: another process did; only the session state is restored
+- recipe cached: new bot on the recipe this process already shares
+- cold: the recipe is read from the store and its tables are built
+- re-parse: what a process without a store would have to do
+and for an LLM-mode session with --turns turns of history. Sessions of one
+recipe share the parsed objects instead of holding copies, and a progressive
+hybrid session rebuilt elsewhere keeps upgrading, or moves to the hybrid recipe
+once it is stored.
+
+Run from the repository root:
+>> python -m benchmarks.session_rehydration --repeat 200 --turns 6
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from src.chatbot import Chatbot
+from src.local_llm_server import LocalLLMServer
+from src.session_store import MemorySessionStore, SQLiteSessionStore
+
+URL = "https://www.allrecipes.com/recipe/0/sample/"
+
+
+def timed(repeat, setup, action):
+    total = 0.0
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        action()
+        total += time.perf_counter() - start
+    return total / repeat * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--turns", type=int, default=6)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(port=0).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    from backend import api
+    from src.LLM_based_qa import LLMBasedQA
+
+    bot = Chatbot(mode="classical", backend=True)
+    bot.url = URL
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+
+    qa = LLMBasedQA(URL, recipe=SAMPLE_RECIPE)
+    for i in range(args.turns):
+        qa.answer(f"question {i} about the chicken")
+
+    def reparse():
+        fresh = Chatbot(mode="classical", backend=True)
+        fresh.url = URL
+        fresh.title, fresh.raw_ingredients, fresh.raw_steps = SAMPLE_RECIPE
+        fresh._process_metadata()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        stores = [
+            ("memory", MemorySessionStore()),
+            ("sqlite", SQLiteSessionStore(os.path.join(tmp, "sessions.db"))),
+        ]
+        for name, store in stores:
+            api.store = store
+            api.bots.clear()
+            api.recipes.entries.clear()
+
+            api._publish_recipe("classical:" + URL, bot)
+            record = {"mode": "classical", "recipe_key": "classical:" + URL}
+            api._save_session("s", record, bot)
+            api._publish_recipe("llm:" + URL, qa)
+            api._save_session("l", {"mode": "llm", "recipe_key": "llm:" + URL}, qa)
+
+            def stale():
+                record = store.get("s")
+                record["version"] += 1
+                store.put("s", record)
+
+            def forget_bot():
+                api.bots.clear()
+
+            def forget_all():
+                api.bots.clear()
+                api.recipes.entries.clear()
+
+            load = lambda: api._load_session("s")
+            rows = [
+                ("up to date", timed(args.repeat, lambda: None, load)),
+                ("stale", timed(args.repeat, stale, load)),
+                ("recipe cached", timed(args.repeat, forget_bot, load)),
+                ("cold", timed(args.repeat, forget_all, load)),
+                ("re-parse", timed(max(1, args.repeat // 20), lambda: None, reparse)),
+                (
+                    f"llm, {args.turns} turns",
+                    timed(args.repeat, forget_all, lambda: api._load_session("l")),
+                ),
+            ]
+            print(f"\n{name} store:")
+            for label, ms in rows:
+                print(f"  {label:<16} {ms:8.3f} ms")
+
+            # a rebuilt bot is in the session's state, on the shared recipe
+            api.bots.clear()
+            record, first = api._load_session("s")
+            api.bots.clear()
+            _, second = api._load_session("s")
+            assert first.current_step == bot.current_step
+            assert first is not second and first.steps is second.steps
+            _, rebuilt = api._load_session("l")
+            assert rebuilt.history.turns == qa.history.turns
+
+            api._save_session(
+                "p", {"mode": "hybrid", "recipe_key": "classical:" + URL}, bot
+            )
+            api.bots.clear()
+            _, progressive = api._load_session("p")
+            assert progressive.progressive and progressive.wait_for_upgrades(60)
+            assert progressive.upgrade_status()["upgraded"] == ["steps"]
+            api._publish_recipe("hybrid:" + URL, progressive)
+            api.bots.clear()
+            record, upgraded = api._load_session("p")
+            assert record["recipe_key"] == "hybrid:" + URL
+            assert upgraded.steps is progressive.steps
+
+            timings = dict(rows)
+            assert timings["cold"] < timings["re-parse"]
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
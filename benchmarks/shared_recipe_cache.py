@@ -0,0 +1,175 @@
+"""
+Memory and lookup latency of the host-wide shared recipe cache
+(src/shared_recipe_cache.py) against per-worker dict caches.
+
+Memory: --workers forked processes each look up --recipes recipes (the sample
+recipe, parsed once, under as many keys). With per-worker caches every worker
+holds its own rebuilt copy of each; with the shared cache they read the
+serialized records from one mapping and keep only their --local most recent
+ones. Reported is the growth of the process tree's PSS (pages shared between
+processes split between them) while the caches fill, and the size of the
+private copy a worker unpickles next to the serialized record: what each
+worker still duplicates per recipe it keeps.
+
+Latency: one lookup that hits the per-worker dict (RecipeCache), the shared
+cache, the SQLite store (read plus table rebuild), and a re-parse.
+
+Run from the repository root:
+>> python -m benchmarks.shared_recipe_cache --workers 4 --recipes 500 --local 8
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from benchmarks.multiworker import memory_mb
+from src.chatbot import Chatbot
+from src.session_store import RecipeCache, SQLiteSessionStore
+from src.shared_recipe_cache import SharedRecipeCache
+
+URL = "https://www.allrecipes.com/recipe/{}/sample/"
+
+
+def parsed_bot():
+    bot = Chatbot(mode="classical", backend=True)
+    bot.url = URL.format(0)
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+    return bot
+
+
+def timed(repeat, action):
+    start = time.perf_counter()
+    for i in range(repeat):
+        action(i)
+    return (time.perf_counter() - start) / repeat * 1e3
+
+
+def fork_workers(n, work):
+    """
+    Forks n processes that run work() when told to and waits until they are up.
+    Returns step(), which tells them to and returns the tree's PSS once they
+    are done, and stop()
+    """
+    workers = []
+    for _ in range(n):
+        go_read, go_write = os.pipe()
+        done_read, done_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.write(done_write, b"1")
+            os.read(go_read, 1)
+            kept = work()
+            os.write(done_write, b"1")
+            os.read(go_read, 1)  # stay alive, with kept, until measured
+            del kept
+            os._exit(0)
+        workers.append((pid, go_write, done_read))
+        os.read(done_read, 1)
+
+    def step():
+        for _, go, _ in workers:
+            os.write(go, b"1")
+        for _, _, done in workers:
+            os.read(done, 1)
+        return memory_mb(os.getpid())[1]
+
+    def stop():
+        for pid, go, _ in workers:
+            os.write(go, b"1")
+            os.waitpid(pid, 0)
+
+    return step, stop
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--recipes", type=int, default=500)
+    parser.add_argument("--local", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=2000)
+    args = parser.parse_args()
+
+    bot = parsed_bot()
+    state = bot.shared_state()
+    keys = [f"classical:{URL.format(i)}" for i in range(args.recipes)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        shared = SharedRecipeCache(os.path.join(tmp, "recipes.cache"), size_mb=32)
+        for key in keys:
+            shared.put(key, state)
+        store = SQLiteSessionStore(os.path.join(tmp, "sessions.db"))
+        store.put_recipe(keys[0], bot.export_recipe())
+
+        # latency of one lookup
+        local = RecipeCache(args.recipes)
+        local.put(keys[0], state)
+
+        def from_store(i):
+            rebuilt = Chatbot(backend=True, mode="classical", prefetch=False)
+            rebuilt.load_recipe(store.get_recipe(keys[0]))
+            rebuilt.shared_state()
+
+        rows = [
+            ("per-worker dict", timed(args.repeat, lambda i: local.get(keys[0], None))),
+            (
+                "shared cache",
+                timed(args.repeat, lambda i: shared.get(keys[i % len(keys)])),
+            ),
+            ("sqlite store", timed(max(1, args.repeat // 10), from_store)),
+            ("re-parse", timed(max(1, args.repeat // 100), lambda i: parsed_bot())),
+        ]
+        print("lookup latency:")
+        for label, ms in rows:
+            print(f"  {label:<16} {ms:9.4f} ms")
+
+        # memory of the workers' caches
+        def per_worker():
+            cache = RecipeCache(args.recipes)
+            for key in keys:
+                cache.get(key, lambda: shared.get(key))
+            return cache
+
+        def shared_only():
+            cache = RecipeCache(args.local)
+            for key in keys:
+                cache.get(key, lambda: shared.get(key))
+            return cache
+
+        growth = {}
+        for label, work in [("per-worker dict", per_worker), ("shared", shared_only)]:
+            step, stop = fork_workers(args.workers, work)
+            before = memory_mb(os.getpid())[1]
+            after = step()
+            stop()
+            growth[label] = after - before
+        print(
+            f"\nPSS growth, {args.workers} workers x {args.recipes} recipes "
+            f"({shared.snapshot()['bytes'] / 2**20:.1f}MB serialized):"
+        )
+        for label, mb in growth.items():
+            print(f"  {label:<16} {mb:9.1f} MB")
+
+        tracemalloc.start()
+        copy = shared.get(keys[0])
+        copy_bytes = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del copy
+        record_bytes = shared.snapshot()["bytes"] / len(keys)
+        print(
+            f"\nper recipe: {record_bytes / 1024:.1f}KB serialized, shared by all "
+            f"workers; {copy_bytes / 1024:.1f}KB unpickled, in every worker keeping it "
+            f"(--local {args.local}: {args.local * copy_bytes / 2**20:.1f}MB per worker)"
+        )
+
+        timings = dict(rows)
+        assert timings["shared cache"] < timings["sqlite store"] < timings["re-parse"]
+        assert growth["shared"] < growth["per-worker dict"]
+        assert shared.get(keys[-1])["steps"] == state["steps"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Overhead of the stage latency metrics (src/metrics.py): the cost of one span
+with metrics on and off, and the time of a classical parse of the sample
+recipe in a process started with METRICS=1 and one with METRICS=0 (the flag is
+read at import). Also prints the per-stage breakdown of one parse, as
+/api/initialize returns it with "timing": true.
+
+Run from the repository root:
+>> python -m benchmarks.stage_metrics --parses 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+
+def parse_time(parses):
+    """Best-of-5 mean time of a classical parse of the sample recipe, in ms."""
+    from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+    from src.chatbot import Chatbot
+
+    def parse():
+        bot = Chatbot(mode="classical", backend=True)
+        bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+        bot._process_metadata()
+
+    parse()  # loads the shared resources
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter()
+        for _ in range(parses):
+            parse()
+        best = min(best, (time.perf_counter() - start) / parses)
+    return best * 1e3
+
+
+def span_cost(calls=200000):
+    """Time of an empty `with span(...)` block, in microseconds."""
+    from src.metrics import span
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        with span("benchmark"):
+            pass
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def child(parses):
+    print(json.dumps({"parse_ms": parse_time(parses), "span_us": span_cost()}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--parses", type=int, default=200)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.parses)
+        return
+
+    results = {}
+    for flag in ("0", "1"):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.stage_metrics", "--child"]
+            + ["--parses", str(args.parses)],
+            env=dict(os.environ, METRICS=flag),
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        results[flag] = json.loads(output.splitlines()[-1])
+
+    off, on = results["0"], results["1"]
+    overhead = on["parse_ms"] / off["parse_ms"] - 1
+    print(f"span:  off {off['span_us']:.3f} us   on {on['span_us']:.3f} us")
+    print(
+        f"parse: off {off['parse_ms']:.3f} ms   on {on['parse_ms']:.3f} ms "
+        f"({overhead:+.1%})"
+    )
+
+    from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+    from src.chatbot import Chatbot
+    from src.metrics import ENABLED, breakdown_ms, collect
+
+    if ENABLED:
+        for _ in range(2):  # the first parse loads the resources
+            bot = Chatbot(mode="classical", backend=True)
+            bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+            with collect() as breakdown:
+                bot._process_metadata()
+        print("\nbreakdown of one parse:")
+        for stage, stats in sorted(
+            breakdown_ms(breakdown).items(), key=lambda item: -item[1]["total_ms"]
+        ):
+            print(f"  {stage:<30} {stats['count']:4d} x  {stats['total_ms']:8.3f} ms")
+
+    assert off["span_us"] < 1.0
+    assert overhead < 0.05
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+Time to first token vs. total latency of streamed answers, against the local
+LLM stand-in server (first word after --latency, then one word every
+--token-latency seconds):
+    - LLMBasedQA.answer_stream (llm mode)
+    - Chatbot.respond_stream for a question answered by the LLM (hybrid mode)
+    - POST /api/chat/stream through the Flask test client (Server-Sent Events)
+and checks that a streamed answer wrapped in a code fence is answered without it.
+
+Run from the repository root:
+>> python -m benchmarks.streaming_ttft --latency 0.3 --token-latency 0.03
+"""
+
+import argparse
+import os
+import statistics
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from benchmarks.llm_context_turns import make_qa
+from src.chatbot import Chatbot
+from src.llm_provider import LLMProvider, LLMResponse
+from src.local_llm_server import LocalLLMServer
+
+QUESTIONS = [
+    "why does the chicken need to rest",
+    "can i use a cast iron skillet instead of a roasting pan",
+    "what should i serve with this",
+]
+
+
+class FencedProvider(LLMProvider):
+    """Streams one answer wrapped in a code fence, fence and text in separate chunks."""
+
+    def generate_stream(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        for text in ("```txt\n", "Bake 30 minutes.\n", "```"):
+            yield LLMResponse(text)
+
+
+def measure(start_stream):
+    start = time.perf_counter()
+    ttft = None
+    for text in start_stream():
+        if ttft is None and text:
+            ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start
+
+
+def report(name, timings, token_latency):
+    ttfts, totals = zip(*timings)
+    print(
+        f"{name:>16}: ttft={statistics.mean(ttfts) * 1e3:7.1f}ms  "
+        f"total={statistics.mean(totals) * 1e3:7.1f}ms"
+    )
+    # the first chunk must arrive before the rest of the answer is generated
+    assert statistics.mean(ttfts) + token_latency < statistics.mean(totals)
+
+
+def sse_chunks(client, question):
+    # the test client produces the first event before post() returns
+    response = client.post(
+        "/api/chat/stream",
+        json={"question": question, "session_id": "bench"},
+        buffered=False,
+    )
+    for event in response.iter_encoded():
+        for line in event.decode("utf-8").splitlines():
+            if line.startswith("event: delta"):
+                yield line
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--token-latency", type=float, default=0.03)
+    args = parser.parse_args()
+
+    server = LocalLLMServer(
+        port=0, latency=args.latency, token_latency=args.token_latency
+    ).start()
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    qa = make_qa(server)
+    report(
+        "llm qa",
+        [measure(lambda: qa.answer_stream(q)) for q in QUESTIONS],
+        args.token_latency,
+    )
+
+    bot = Chatbot(mode="hybrid", backend=True)
+    bot.url = "https://www.allrecipes.com/recipe/0/sample/"
+    bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+    bot._process_metadata()
+    report(
+        "hybrid bot",
+        [measure(lambda: bot.respond_stream(q)) for q in QUESTIONS],
+        args.token_latency,
+    )
+
+    bot.provider = FencedProvider()
+    answer = bot.respond("how long do i bake it")
+    del bot.provider
+    assert answer == "Bake 30 minutes.", answer
+
+    from backend import api
+
+    key = "hybrid:" + bot.url
+    api._publish_recipe(key, bot)
+    api._save_session("bench", {"mode": "hybrid", "recipe_key": key}, bot)
+    client = api.app.test_client()
+    report(
+        "/api/chat/stream",
+        [measure(lambda: sse_chunks(client, q)) for q in QUESTIONS],
+        args.token_latency,
+    )
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Synthetic recipes of any size, for stress tests of the parsers: ingredient
+lines with quantities (integers, decimals, ranges, unicode fractions), units
+from units_map.json, descriptors and preparations; directions built from the
+method and tool keywords (method_keywords.json, tools_keywords.json) that
+mention the ingredients, chain actions with "and" / "then" and carry times and
+temperatures. The same arguments always give the same recipe.
+
+>> python -m benchmarks.synthetic_recipe --ingredients 20 --steps 8
+"""
+
+import argparse
+import random
+
+from src.resources import load_helper_json
+
+FOODS = [
+    "chicken thighs",
+    "pork shoulder",
+    "salmon",
+    "shrimp",
+    "tofu",
+    "eggs",
+    "butter",
+    "olive oil",
+    "flour",
+    "sugar",
+    "salt",
+    "black pepper",
+    "garlic",
+    "onion",
+    "shallots",
+    "carrots",
+    "celery",
+    "potatoes",
+    "tomatoes",
+    "spinach",
+    "mushrooms",
+    "bell pepper",
+    "zucchini",
+    "broccoli",
+    "cauliflower",
+    "lemon",
+    "lime",
+    "ginger",
+    "cumin",
+    "paprika",
+    "cinnamon",
+    "thyme",
+    "rosemary",
+    "basil",
+    "parsley",
+    "cilantro",
+    "rice",
+    "pasta",
+    "chickpeas",
+    "lentils",
+    "milk",
+    "cream",
+    "yogurt",
+    "parmesan",
+    "cheddar",
+    "honey",
+    "vinegar",
+    "soy sauce",
+    "chicken broth",
+    "walnuts",
+]
+
+DESCRIPTORS = [
+    "fresh",
+    "dried",
+    "ground",
+    "smoked",
+    "unsalted",
+    "toasted",
+    "frozen",
+    "organic",
+    "large",
+    "small",
+    "red",
+    "yellow",
+    "baby",
+    "wild",
+    "roasted",
+    "raw",
+    "sweet",
+    "aged",
+    "light",
+    "whole",
+]
+
+PREPARATIONS = [
+    "chopped",
+    "finely diced",
+    "thinly sliced",
+    "minced",
+    "grated",
+    "peeled and cubed",
+    "softened",
+    "drained",
+    "rinsed",
+    "at room temperature",
+]
+
+QUANTITIES = ["1", "2", "3", "½", "1 ½", "¼", "¾", "2 to 3", "1.5", "4"]
+
+
+def _keywords(name, key):
+    # multi-word keywords are also listed with underscores
+    return [word for word in load_helper_json(name)[key] if "_" not in word]
+
+
+def synthetic_recipe(n_ingredients, n_steps=None, seed=0):
+    """A recipe of the given size, in the form get_recipe_data returns.
+
+    Args:
+        n_ingredients: Number of ingredient lines (names repeat past 1000)
+        n_steps: Number of directions (default: n_ingredients)
+        seed: Seed of the choices
+
+    Returns:
+        ({"title"}, {"ingredients"}, {"directions"})
+    """
+    rng = random.Random(seed)
+    n_steps = n_ingredients if n_steps is None else n_steps
+    units = sorted(
+        alias for alias in load_helper_json("units_map.json") if "_" not in alias
+    )
+    methods = _keywords("method_keywords.json", "method_keywords")
+    tools = _keywords("tools_keywords.json", "tools_keywords")
+    prep_words = load_helper_json("tools_keywords.json")["prep_words"]
+
+    names = [f"{descriptor} {food}" for descriptor in DESCRIPTORS for food in FOODS]
+    rng.shuffle(names)
+    names = [names[i % len(names)] for i in range(n_ingredients)]
+
+    ingredients = []
+    for name in names:
+        quantity = rng.choice(QUANTITIES)
+        shape = rng.random()
+        if shape < 0.5:
+            line = f"{quantity} {rng.choice(units)} {name}, {rng.choice(PREPARATIONS)}"
+        elif shape < 0.75:
+            line = f"{quantity} {rng.choice(units)} {name}"
+        elif shape < 0.9:
+            line = f"{quantity} ({rng.randint(4, 16)} ounce) can {name}"
+        else:
+            line = f"{name}, to taste"
+        ingredients.append(line)
+
+    directions = []
+    for i in range(n_steps):
+        # every ingredient is mentioned at least once
+        mentioned = [names[(i + k * n_steps) % len(names)] for k in range(2)]
+        mentioned.append(rng.choice(names))
+        method, tool = rng.choice(methods), rng.choice(tools)
+        sentences = [
+            f"{method.capitalize()} the {mentioned[0]} and the {mentioned[1]} "
+            f"{rng.choice(prep_words)} the {tool} for {rng.randint(2, 45)} minutes."
+        ]
+        if rng.random() < 0.5:
+            sentences.append(
+                f"Stir in the {mentioned[2]} and {rng.choice(methods)} until "
+                "golden, then season to taste."
+            )
+        if rng.random() < 0.2:
+            sentences.insert(
+                0, f"Preheat the oven to {rng.choice((325, 350, 400, 425))} degrees F."
+            )
+        directions.append(" ".join(sentences))
+
+    return (
+        {"title": f"Synthetic Recipe ({n_ingredients} x {n_steps})"},
+        {"ingredients": ingredients},
+        {"directions": directions},
+    )
+
+
+def chained_direction(n_actions, seed=0):
+    """One sentence chaining n_actions actions with "and" / "then".
+
+    Returns:
+        {"directions": [the sentence]}
+    """
+    rng = random.Random(seed)
+    methods = _keywords("method_keywords.json", "method_keywords")
+    actions = [
+        f"{rng.choice(methods)} the {rng.choice(FOODS)}" for _ in range(n_actions)
+    ]
+    sentence = actions[0].capitalize()
+    for action in actions[1:]:
+        sentence += f" {rng.choice(('and', 'then'))} {action}"
+    return {"directions": [sentence + "."]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--ingredients", type=int, default=20)
+    parser.add_argument("--steps", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    title, ingredients, directions = synthetic_recipe(
+        args.ingredients, args.steps, args.seed
+    )
+    print(title["title"])
+    for line in ingredients["ingredients"]:
+        print(f"  - {line}")
+    for i, direction in enumerate(directions["directions"], start=1):
+        print(f"  {i}. {direction}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Per-request traces (src/tracing.py) of the backend: initializes --sessions
+hybrid sessions of the sample recipe (served by the RecipeSite stand-in,
+parsed against the local LLM stand-in with --error-rate failed calls) with
+"trace": true, writes their traces to --out in the Chrome trace event format
+and prints the span tree of the slowest one. Also compares the time of a
+classical parse untraced and traced.
+
+Open a written file in chrome://tracing or https://ui.perfetto.dev.
+
+Run from the repository root:
+>> python -m benchmarks.trace_export --sessions 3 --latency 0.05 --error-rate 0.2 --out traces
+"""
+
+import argparse
+import json
+import os
+import time
+
+from benchmarks.hybrid_local_llm import SAMPLE_RECIPE
+from benchmarks.recipe_site import RecipeSite
+from src.local_llm_server import LocalLLMServer
+
+RECIPE_URL = "http://www.allrecipes.com/recipe/{}/sample/"
+
+
+def parse_time(traced, parses):
+    """Mean time of a classical parse of the sample recipe, in ms."""
+    from src import tracing
+    from src.chatbot import Chatbot
+
+    start = time.perf_counter()
+    for _ in range(parses):
+        with tracing.trace("parse", force=traced):
+            bot = Chatbot(mode="classical", backend=True)
+            bot.title, bot.raw_ingredients, bot.raw_steps = SAMPLE_RECIPE
+            bot._process_metadata()
+    return (time.perf_counter() - start) / parses * 1e3
+
+
+def print_tree(node, depth=0):
+    attrs = " ".join(f"{k}={v}" for k, v in node["attrs"].items() if v is not None)
+    name = "  " * depth + node["name"]
+    print(f"{name:<40} {node['duration_ms']:9.2f} ms  {attrs}")
+    for child in node["children"]:
+        print_tree(child, depth + 1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--error-rate", type=float, default=0.2)
+    parser.add_argument("--parses", type=int, default=100)
+    parser.add_argument("--out", default="traces")
+    args = parser.parse_args()
+
+    site = RecipeSite().start()
+    server = LocalLLMServer(
+        port=0, latency=args.latency, error_rate=args.error_rate
+    ).start()
+    os.environ["http_proxy"] = site.url
+    os.environ["no_proxy"] = "127.0.0.1,localhost"
+    os.environ["LLM_PROVIDER"] = "local"
+    os.environ["LOCAL_LLM_URL"] = server.url
+    os.environ.setdefault("LLM_CACHE", "0")
+
+    from backend import api
+    from src import tracing
+
+    tracing.TRACE_DIR = ""  # written below, to --out
+    tracing.ALLOW_FORCE = True  # TRACE_ALLOW_FORCE=1
+    client = api.app.test_client()
+    paths, kept = [], []
+    for i in range(args.sessions):
+        response = client.post(
+            "/api/initialize",
+            json={
+                "url": RECIPE_URL.format(i),
+                "session_id": f"trace-{i}",
+                "mode": "hybrid",
+                "trace": True,
+            },
+        )
+        assert response.status_code == 200, response.json
+        current = tracing.get_trace(response.headers["X-Trace-Id"])
+        kept.append(current)
+        paths.append(tracing.export(current, args.out, "chrome"))
+
+    slowest = max(kept, key=lambda t: t.duration_ms())
+    print(f"slowest of {len(kept)} initializations:")
+    print_tree(slowest.to_dict()["root"])
+    print("\nwritten:")
+    for path in paths:
+        print(f"  {path}")
+
+    untraced = min(parse_time(False, args.parses) for _ in range(3))
+    traced = min(parse_time(True, args.parses) for _ in range(3))
+    print(
+        f"\nclassical parse: untraced {untraced:.3f} ms, traced {traced:.3f} ms "
+        f"({traced / untraced - 1:+.1%})"
+    )
+
+    listing = client.get("/api/traces").get_data(as_text=True)
+    # without TRACE_ALLOW_FORCE a request can't ask for a trace
+    tracing.ALLOW_FORCE = False
+    response = client.post(
+        "/api/initialize",
+        json={"url": RECIPE_URL.format(0), "session_id": "trace-x", "trace": True},
+    )
+    assert response.status_code == 200, response.json
+    assert "X-Trace-Id" not in response.headers
+    site.stop()
+    server.stop()
+
+    # session ids are credentials: traces only have their hash
+    assert "trace-0" not in listing
+    assert kept[0].root.attrs["session"] == tracing.session_tag("trace-0")
+
+    # the LLM calls are nested under the step and the part they annotate
+    names = {span.span_id: span.name for span in slowest.spans}
+    parents = {
+        (names.get(span.parent_id), span.name)
+        for span in slowest.spans
+        if span.name.startswith("llm.")
+    }
+    assert ("steps.tools", "llm.tools_parser") in parents
+    with open(paths[0], encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+    assert {"initialize", "scrape", "parse.steps", "steps.step"} <= {
+        event["name"] for event in events
+    }
+
+    # only the newest TRACE_MAX_FILES files are kept on disk
+    tracing.MAX_FILES = len(paths) - 1
+    tracing._prune(args.out)
+    assert not os.path.exists(paths[0]) and os.path.exists(paths[-1])
+
+
+if __name__ == "__main__":
+    main()
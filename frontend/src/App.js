@@ -17,6 +17,17 @@ function stopSpeaking() {
   }
 }
 
+// one backend session per page load: the chat itself isn't kept across
+// reloads, and a copied sessionStorage (duplicated tab) would share it
+function newSessionId() {
+  if (window.crypto && window.crypto.randomUUID) {
+    return window.crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+}
+
+const SESSION_ID = newSessionId();
+
 function getSpeechRecognition() {
   const SpeechRecognition =
     window.SpeechRecognition || window.webkitSpeechRecognition;
@@ -43,6 +54,18 @@ function App() {
     messagesEndRef.current?.scrollIntoView({ behavior: 'smooth' });
   }, [messages]);
 
+  // closing the tab stops its recipe if it is still parsing and frees its session
+  useEffect(() => {
+    const cancelSession = () => {
+      const body = new Blob([JSON.stringify({ session_id: SESSION_ID })], {
+        type: 'text/plain',
+      });
+      navigator.sendBeacon(`${API_URL}/api/cancel`, body);
+    };
+    window.addEventListener('pagehide', cancelSession);
+    return () => window.removeEventListener('pagehide', cancelSession);
+  }, []);
+
   const initializeRecipe = async () => {
     if (!url.trim()) return alert('Please enter a recipe URL');
 
@@ -53,8 +76,9 @@ function App() {
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           url: url.trim(),
-          session_id: 'default',
+          session_id: SESSION_ID,
           mode,
+          progressive: mode === 'hybrid',
         }),
       });
 
@@ -90,30 +114,62 @@ function App() {
     setLoading(true);
 
     try {
-      const res = await fetch(`${API_URL}/api/chat`, {
+      const res = await fetch(`${API_URL}/api/chat/stream`, {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ question: text, session_id: 'default' }),
+        body: JSON.stringify({ question: text, session_id: SESSION_ID }),
       });
 
-      const data = await res.json();
-
-      if (res.ok) {
-        setMessages((prev) => [...prev, { type: 'bot', text: data.response }]);
-
-        setCurrentStep(data.current_step || 0);
-        setTotalSteps(data.total_steps || 0);
-
-        if (data.mode) {
-          setMode(data.mode);
-        }
-
-        if (autoSpeak) speak(data.response);
-      } else {
+      if (!res.ok) {
+        const data = await res.json();
         setMessages((prev) => [
           ...prev,
           { type: 'bot', text: `Error: ${data.error}` },
         ]);
+        return;
+      }
+
+      // Server-Sent Events: "delta" chunks of the answer, then "done" or "error"
+      setMessages((prev) => [...prev, { type: 'bot', text: '' }]);
+      const appendToAnswer = (chunk) =>
+        setMessages((prev) => {
+          const last = prev[prev.length - 1];
+          return [...prev.slice(0, -1), { ...last, text: last.text + chunk }];
+        });
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      let answer = '';
+
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split('\n\n');
+        buffer = events.pop();
+
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = JSON.parse(raw.match(/^data: (.*)$/m)?.[1] || '{}');
+
+          if (event === 'delta') {
+            answer += data.text;
+            appendToAnswer(data.text);
+          } else if (event === 'error') {
+            appendToAnswer(`Error: ${data.error}`);
+          } else if (event === 'done') {
+            setCurrentStep(data.current_step || 0);
+            setTotalSteps(data.total_steps || 0);
+
+            if (data.mode) {
+              setMode(data.mode);
+            }
+
+            if (autoSpeak) speak(answer);
+          }
+        }
       }
     } catch (error) {
       setMessages((prev) => [
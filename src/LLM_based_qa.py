@@ -1,9 +1,9 @@
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import os
+import time
 from pathlib import Path
 from src.scraper import get_recipe_data
+from src.conversation_history import ConversationHistory
+from src.llm_provider import get_provider
+from src.llm_ledger import UsageLedger
 
 GREEN = "\033[92m"
 CYAN = "\033[96m"
@@ -14,73 +14,182 @@ BOLD = "\033[1m"
 
 
 class LLMBasedQA:
-    def __init__(self, url, model_name="gemini-2.5-flash"):
+    def __init__(
+        self,
+        url,
+        model_name="gemini-2.5-flash",
+        provider=None,
+        history_token_budget=2000,
+        history_keep_turns=6,
+        recipe=None,
+    ):
+        """
+        recipe: (title, ingredients, directions) as returned by get_recipe_data,
+        to skip fetching the page (e.g. from another session's export_recipe())
+        """
 
         self.path = Path(__file__).resolve().parent.parent
-        load_dotenv(self.path / "apikey.env")
-        self.api_key = os.getenv("GEMINI_API_KEY")
-        if not self.api_key:
-            raise ValueError(
-                "GEMINI_API_KEY not found. Please set it in your .env file."
-            )
+        self.provider = provider
+        if self.provider is None:
+            self.provider = get_provider("llm_qa")
 
         with open(self.path / "src" / "prompts" / "LLM_based_qa_prompt.txt", "r") as f:
             self.system_prompt = f.read()
 
-        self.client = genai.Client()
-        self.chat = self.client.chats.create(
-            model=model_name,
-            config=types.GenerateContentConfig(
-                system_instruction=self.system_prompt,
-                temperature=0.2,
-                top_p=0.8,
-                top_k=40,
-            ),
+        self.url = url
+        if recipe is None:
+            recipe = get_recipe_data(url)
+        self.title, self.ingredients, self.directions = recipe
+
+        # the recipe is sent once, as part of the system instruction, instead of
+        # being re-embedded in every turn of the chat history
+        self.recipe_context = self._recipe_formatting(
+            self.title["title"],
+            self.ingredients["ingredients"],
+            self.directions["directions"],
         )
 
-        self.title, self.ingredients, self.directions = get_recipe_data(url)
+        self.model_name = model_name
+        self.system_instruction = self.system_prompt + "\n\n" + self.recipe_context
 
-    def _question_formatting(
-        self, question: str, title: str, ingredients: list, steps: list
-    ) -> (str, str):
-        return (
-            (
-                "=== RECIPE DATA START ===\n"
-                f"Title:\n{title}\n\n"
-                "Ingredients:\n" + "\n".join(ingredients) + "\n\n"
-                "Steps:\n" + "\n".join(steps) + "\n"
-                "=== RECIPE DATA END ===\n\n"
-                "User Question:\n"
-                f"{question}\n\n"
-                "Answer:"
-            ),
-            question,
+        # last turns verbatim, older turns folded into a summary
+        self.history = ConversationHistory(
+            token_budget=history_token_budget, keep_turns=history_keep_turns
         )
 
-    def answer(self, question: str) -> (str, str):
-        formatted_question, user_question = self._question_formatting(
-            question,
-            self.title["title"],
-            self.ingredients["ingredients"],
-            self.directions["directions"],
+        self.chat = self.provider.start_chat(self.model_name, self.system_instruction)
+
+        # per-turn prompt size / latency, one dict per answer() call
+        self.turn_stats = []
+        # LLM usage of the conversation, across restores of the session
+        self.chat_usage = UsageLedger()
+
+    def export_recipe(self):
+        """
+        Returns the scraped recipe as a JSON-serializable dict
+        """
+        return {
+            "url": self.url,
+            "title": self.title,
+            "ingredients": self.ingredients,
+            "directions": self.directions,
+        }
+
+    @classmethod
+    def from_recipe(cls, recipe, **kwargs):
+        """
+        Builds a bot on an export_recipe() result, without fetching the page
+        """
+        return cls(
+            recipe["url"],
+            recipe=(recipe["title"], recipe["ingredients"], recipe["directions"]),
+            **kwargs,
         )
 
-        try:
-            self.chat.send_message(formatted_question)
+    def session_state(self):
+        """
+        Returns the conversation so far, as a JSON-serializable dict
+        """
+        return {
+            "history": self.history.to_dict(),
+            "llm_usage": self.chat_usage.to_dict(),
+        }
+
+    def restore_session_state(self, state):
+        """
+        Continues the conversation saved by session_state()
+        """
+        self.history.load_dict(state.get("history", {}))
+        self.chat_usage.load_dict(state.get("llm_usage", {}))
+        self.chat = self.provider.start_chat(
+            self.model_name,
+            self.system_instruction,
+            history=self.history.as_contents() or None,
+        )
 
-            history = self.chat.get_history()
+    def llm_usage(self):
+        """
+        Returns the LLM usage of the conversation (see UsageLedger.totals)
+        """
+        return {"chat": self.chat_usage.totals()}
 
-            if not history or not history[-1].parts:
-                return user_question, "The model returned an unexpected empty response. Please try again."
+    def _recipe_formatting(self, title: str, ingredients: list, steps: list) -> str:
+        return (
+            "=== RECIPE DATA START ===\n"
+            f"Title:\n{title}\n\n"
+            "Ingredients:\n" + "\n".join(ingredients) + "\n\n"
+            "Steps:\n" + "\n".join(steps) + "\n"
+            "=== RECIPE DATA END ==="
+        )
+
+    def _question_formatting(self, question: str) -> (str, str):
+        return (
+            ("User Question:\n" f"{question}\n\n" "Answer:"),
+            question,
+        )
 
-            return user_question, history[-1].parts[0].text
+    def _record_turn(
+        self, formatted_question: str, prompt_tokens, latency: float, ttft: float
+    ):
+        self.turn_stats.append(
+            {
+                "prompt_chars": len(formatted_question),
+                "prompt_tokens": prompt_tokens,
+                "history_tokens": self.history.token_count(),
+                "ttft_s": ttft,
+                "latency_s": latency,
+            }
+        )
 
-        except Exception as e:
-            err_type = type(e).__name__
-            return user_question, (
-                f"The model encountered an error ({err_type}). "
-                f"Please try your question again."
-            )
+    def answer(self, question: str) -> (str, str):
+        _, user_question = self._question_formatting(question)
+        return user_question, "".join(self.answer_stream(question)).strip()
+
+    def answer_stream(self, question: str):
+        """
+        Yields the answer text as it is generated. The turn is added to the
+        history once the answer is complete.
+        """
+        formatted_question, _ = self._question_formatting(question)
+
+        with self.chat_usage.active():
+            try:
+                start = time.perf_counter()
+                ttft = None
+                prompt_tokens = None
+                chunks = []
+                for chunk in self.chat.send_message_stream(formatted_question):
+                    prompt_tokens = chunk.prompt_tokens or prompt_tokens
+                    if not chunk.text:
+                        continue
+                    if ttft is None:
+                        ttft = time.perf_counter() - start
+                    chunks.append(chunk.text)
+                    yield chunk.text
+
+                answer = "".join(chunks).strip()
+                self._record_turn(
+                    formatted_question, prompt_tokens, time.perf_counter() - start, ttft
+                )
+
+                if not answer:
+                    yield "The model returned an unexpected empty response. Please try again."
+                    return
+
+                # once older turns are folded away, restart the chat on the bounded history
+                if self.history.add_turn(formatted_question, answer):
+                    self.chat = self.provider.start_chat(
+                        self.model_name,
+                        self.system_instruction,
+                        history=self.history.as_contents(),
+                    )
+
+            except Exception as e:
+                err_type = type(e).__name__
+                yield (
+                    f"The model encountered an error ({err_type}). "
+                    f"Please try your question again."
+                )
 
 if __name__ == "__main__":
     print(BOLD + CYAN + "\n=== Recipe Explainer Chatbot ===\n" + RESET)
@@ -105,7 +214,7 @@ if __name__ == "__main__":
             print(CYAN + "\nGoodbye!\n" + RESET)
             break
 
-        question, answer = llm_qa.answer(user_question)
-
         print(BOLD + MAGENTA + "Assistant:" + RESET)
-        print(f"{answer}\n")
+        for text in llm_qa.answer_stream(user_question):
+            print(text, end="", flush=True)
+        print("\n")
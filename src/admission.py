@@ -0,0 +1,177 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+
+class Overloaded(Exception):
+    """Raised when a lane's wait queue is full or the wait timed out."""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"Too many concurrent {lane} requests, retry later")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class _Lane:
+    def __init__(self, limit: int, queue_size: int, priority: int):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.priority = priority
+        self.running = 0
+        self.waiting = 0
+        self.service_estimate = None  # seconds, running mean of recent requests
+        self.stats = {
+            "admitted": 0,
+            "rejected": 0,
+            "timed_out": 0,
+            "max_waiting": 0,
+            "wait_s": 0.0,
+        }
+
+
+class AdmissionController:
+    """Concurrency limits with bounded wait queues, one lane per kind of request.
+
+    A request runs when its lane has a free slot and no lane of higher priority
+    (lower number) has requests waiting; otherwise it waits in its lane's queue.
+    A full queue rejects at once, and a wait longer than `timeout` gives up;
+    both raise Overloaded with a Retry-After estimate.
+    """
+
+    def __init__(self, timeout: float = 30.0):
+        """Initialize a controller without lanes.
+
+        Args:
+            timeout: Max seconds a request waits in a queue
+        """
+        self.timeout = timeout
+        self.cond = threading.Condition()
+        self.lanes: Dict[str, _Lane] = {}
+
+    def add_lane(self, name: str, limit: int, queue_size: int, priority: int = 1):
+        """Register a lane.
+
+        Args:
+            name: Lane name used by admit()
+            limit: Max requests running at once
+            queue_size: Max requests waiting for a slot
+            priority: 0 goes first; lower-priority lanes wait while it has a queue
+        """
+        self.lanes[name] = _Lane(limit, queue_size, priority)
+
+    def _can_run(self, lane: _Lane) -> bool:
+        if lane.running >= lane.limit:
+            return False
+        return not any(
+            other.waiting
+            for other in self.lanes.values()
+            if other.priority < lane.priority
+        )
+
+    def _retry_after(self, lane: _Lane) -> int:
+        # time for the queue ahead to drain through the lane's slots
+        service = lane.service_estimate or 1.0
+        return max(1, math.ceil(service * (lane.waiting + 1) / max(lane.limit, 1)))
+
+    def acquire(self, name: str) -> float:
+        """Take a slot in the lane, waiting in its queue if needed.
+
+        Args:
+            name: Lane name
+
+        Returns:
+            Start time to pass to release()
+
+        Raises:
+            Overloaded: If the queue is full or the wait timed out
+        """
+        lane = self.lanes[name]
+        with self.cond:
+            if not self._can_run(lane):
+                if lane.waiting >= lane.queue_size:
+                    lane.stats["rejected"] += 1
+                    raise Overloaded(name, self._retry_after(lane))
+
+                lane.waiting += 1
+                lane.stats["max_waiting"] = max(lane.stats["max_waiting"], lane.waiting)
+                queued = time.perf_counter()
+                admitted = self.cond.wait_for(lambda: self._can_run(lane), self.timeout)
+                lane.waiting -= 1
+                lane.stats["wait_s"] += time.perf_counter() - queued
+                # a lane with fewer waiters may unblock lower-priority lanes
+                self.cond.notify_all()
+
+                if not admitted:
+                    lane.stats["timed_out"] += 1
+                    raise Overloaded(name, self._retry_after(lane))
+
+            lane.running += 1
+            lane.stats["admitted"] += 1
+        return time.perf_counter()
+
+    def release(self, name: str, start: float):
+        lane = self.lanes[name]
+        service = time.perf_counter() - start
+        with self.cond:
+            lane.running -= 1
+            if lane.service_estimate is None:
+                lane.service_estimate = service
+            else:
+                lane.service_estimate = 0.8 * lane.service_estimate + 0.2 * service
+            self.cond.notify_all()
+
+    @contextmanager
+    def admit(self, name: str):
+        """acquire() / release() around the block."""
+        start = self.acquire(name)
+        try:
+            yield
+        finally:
+            self.release(name, start)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Per-lane limits, queue depth and counters."""
+        with self.cond:
+            return {
+                name: {
+                    "limit": lane.limit,
+                    "queue_size": lane.queue_size,
+                    "running": lane.running,
+                    "waiting": lane.waiting,
+                    **lane.stats,
+                }
+                for name, lane in self.lanes.items()
+            }
+
+
+def from_env() -> AdmissionController:
+    """The backend's controller: a chat lane with priority over one init lane per mode.
+
+    Environment:
+        ADMIT_CHAT_LIMIT (16), ADMIT_CHAT_QUEUE (64),
+        ADMIT_INIT_CLASSICAL_LIMIT (4), ADMIT_INIT_HYBRID_LIMIT (2),
+        ADMIT_INIT_LLM_LIMIT (2), ADMIT_INIT_QUEUE (8 per mode),
+        ADMIT_TIMEOUT (30 seconds)
+
+    Returns:
+        The configured controller
+    """
+    controller = AdmissionController(float(os.getenv("ADMIT_TIMEOUT", "30")))
+    controller.add_lane(
+        "chat",
+        int(os.getenv("ADMIT_CHAT_LIMIT", "16")),
+        int(os.getenv("ADMIT_CHAT_QUEUE", "64")),
+        priority=0,
+    )
+    init_queue = int(os.getenv("ADMIT_INIT_QUEUE", "8"))
+    for mode, limit in (("classical", "4"), ("hybrid", "2"), ("llm", "2")):
+        controller.add_lane(
+            "init_" + mode,
+            int(os.getenv(f"ADMIT_INIT_{mode.upper()}_LIMIT", limit)),
+            init_queue,
+            priority=1,
+        )
+    return controller
@@ -3,15 +3,21 @@ from src.ingredients_parser import IngredientsParser
 from src.steps_parser import StepsParser
 from src.methods_parser import MethodsParser
 from src.tools_parser import ToolsParser
+from src.token_index import TokenIndex
+from src.llm_provider import get_provider, strip_code_fence_stream
+from src.prompt_context import StepContextBuilder, compact_json
+from src.deadline import Deadline, ParseCancelled
+from src.conversation_history import estimate_tokens
+from src.prefetch import AnswerPrefetcher
+from src.resources import load_helper_json
+from src.metrics import span, timed
+from src.llm_ledger import UsageLedger
+import logging
 import re
+import threading
 from collections import Counter
 from urllib.parse import quote
 from pathlib import Path
-import json
-import os
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
 
 GREEN = "\033[92m"
 CYAN = "\033[96m"
@@ -20,122 +26,126 @@ MAGENTA = "\033[95m"
 RESET = "\033[0m"
 BOLD = "\033[1m"
 
+logger = logging.getLogger(__name__)
+
 
 class Chatbot:
     """Initialize Chatbot"""
 
-    def __init__(
-        self,
-        mode="classical",
-        test=False,
-        backend=False,
-        model_name="gemini-2.5-flash-lite",
-    ):
-        self.mode = mode
-        self.model_name = model_name
-
-        self.responses = [
-            self._retrieval_query,
-            self._navigation_query,
-            self._parameter_query,
-            self._procedure_query,
-            self._clarification_query,
-            self._quantity_query,
-        ]
-
-        self.path = Path(__file__).resolve().parent / "helper_files"
-        usages_path = self.path / "usages.json"
-        with open(usages_path, "r") as f:
-            self.usages = json.load(f)
-
-        procedures_path = self.path / "procedures.json"
-        with open(procedures_path, "r") as f:
-            self.procedures = json.load(f)
+    # read-only resources loaded once per process and shared by all sessions
+    usages = None
+    procedures = None
+
+    # token -> entry indexes over usages.json / procedures.json
+    usages_index = None
+    procedures_index = None
+
+    # selects the slice of the recipe / definitions sent with hybrid LLM questions
+    context_builder = None
+
+    # LLM provider and prompts, only loaded once a non-classical session is created
+    provider = None
+    parameter_clarification_procedure_prompt = None
+    qa_prompt = None
+
+    # per-session objects created on first use, as most sessions never need
+    # them (see _lazy): the parse cancellation token and the LLM usage ledgers
+    _cancel_event = None
+    _parse_usage = None
+    _chat_usage = None
+    _lazy_lock = threading.Lock()
+
+    # questions answered speculatively for the current and next step (hybrid mode)
+    prefetch_questions = {
+        "time": ("parameter", "How long does this step take?"),
+        "temperature": ("parameter", "What temperature should it be?"),
+        "procedure": ("procedure", "How do I do that?"),
+    }
+    vague_words = ("that", "this", "it")
+
+    # parse results that the sessions of a recipe can share (export_recipe), and
+    # the tables built from them
+    recipe_fields = (
+        "url",
+        "title",
+        "raw_ingredients",
+        "raw_steps",
+        "ingredients",
+        "methods",
+        "steps",
+        "tools",
+    )
+    table_fields = (
+        "ingredient_index",
+        "ingredient_by_name",
+        "listing_answers",
+        "step_answers",
+    )
 
-        if self.mode != "classical":
-            self.path = Path(__file__).resolve().parent.parent
-            load_dotenv(self.path / "apikey.env")
-            self.api_key = os.getenv("GEMINI_API_KEY")
-            if not self.api_key:
-                raise ValueError(
-                    "GEMINI_API_KEY not found. Please set it in your .env file."
-                )
-
-            self.client = genai.Client(api_key=self.api_key)
-
-            with open(
-                self.path
-                / "src"
-                / "prompts"
-                / "parameter_clarification_procedure_prompt.txt",
-                "r",
-            ) as f:
-                self.parameter_clarification_procedure_prompt = f.read()
-
-            with open(
-                self.path
-                / "src"
-                / "prompts"
-                / "qa_prompt.txt",
-                "r",
-            ) as f:
-                self.qa_prompt = f.read()
-
-        self.step_words = [
-            "first",
-            "second",
-            "third",
-            "fourth",
-            "fifth",
-            "sixth",
-            "seventh",
-            "eigth",
-            "ninth",
-            "tenth",
-            "eleventh",
-            "twelfth",
-            "thirteenth",
-            "fourteenth",
-            "fifteenth",
-            "sixteenth",
-            "seventeenth",
-            "eighteenth",
-            "nineteenth",
-            "twentieth",
-        ]
-        self.number_words = [
-            "one",
-            "two",
-            "three",
-            "four",
-            "five",
-            "six",
-            "seven",
-            "eight",
-            "nine",
-            "ten",
-            "eleven",
-            "twelve",
-            "thirteen",
-            "fourteen",
-            "fifteen",
-            "sixteen",
-            "seventeen",
-            "eighteen",
-            "nineteen",
-            "twenty",
-        ]
+    # exact questions answered straight from the per-step answer table
+    step_intents = {
+        "what are the ingredients in the current step": "ingredients",
+        "what are the tools in the current step": "tools",
+        "what are the methods in the current step": "methods",
+    }
+
+    step_words = (
+        "first",
+        "second",
+        "third",
+        "fourth",
+        "fifth",
+        "sixth",
+        "seventh",
+        "eigth",
+        "ninth",
+        "tenth",
+        "eleventh",
+        "twelfth",
+        "thirteenth",
+        "fourteenth",
+        "fifteenth",
+        "sixteenth",
+        "seventeenth",
+        "eighteenth",
+        "nineteenth",
+        "twentieth",
+    )
+    number_words = (
+        "one",
+        "two",
+        "three",
+        "four",
+        "five",
+        "six",
+        "seven",
+        "eight",
+        "nine",
+        "ten",
+        "eleven",
+        "twelve",
+        "thirteen",
+        "fourteen",
+        "fifteen",
+        "sixteen",
+        "seventeen",
+        "eighteen",
+        "nineteen",
+        "twenty",
+    )
 
-        self.query_types = [
-            "retrieval_query",
-            "navigation_query",
-            "parameter_query",
-            "procedure_query",
-            "clarification_query",
-            "quantity_query",
-        ]
+    query_types = (
+        "retrieval_query",
+        "navigation_query",
+        "parameter_query",
+        "procedure_query",
+        "clarification_query",
+        "quantity_query",
+    )
 
-        self.query_patterns = [
+    query_patterns = tuple(
+        tuple(re.compile(pattern) for pattern in patterns)
+        for patterns in (
             [  # retrieval_patterns
                 r"\b(show|display|list|give|tell)\s+(me\s+)?(the\s+)?(recipe|ingredients?|directions?|steps?|instructions?)",
                 r"\b(what|which)\s+(are\s+)?(the\s+)?(ingredients?|steps?)",
@@ -189,7 +199,50 @@ class Chatbot:
                 r"\bhow\s+many\s+(\w+\s+)?(do\s+I\s+need|should\s+I|is\s+needed)\b",
                 r"\bhow\s+much\s+of\s+(that|this|it)\b",
             ],
-        ]
+        )
+    )
+
+    # handler method per query type, same order as query_types / query_patterns
+    responses = (
+        "_retrieval_query",
+        "_navigation_query",
+        "_parameter_query",
+        "_procedure_query",
+        "_clarification_query",
+        "_quantity_query",
+    )
+
+    def __init__(
+        self,
+        mode="classical",
+        test=False,
+        backend=False,
+        model_name="gemini-2.5-flash-lite",
+        llm_context_budget=800,
+        prefetch=True,
+        progressive=False,
+        escalation_threshold=None,
+    ):
+        self.mode = mode
+        self.model_name = model_name
+        self.llm_context_budget = llm_context_budget
+        # hybrid parsing asks the LLM only about steps scoring below this
+        self.escalation_threshold = escalation_threshold
+
+        # progressive hybrid: answer from the classical parse right away and
+        # swap in the LLM annotations as background jobs finish them
+        self.progressive = progressive and self.mode != "classical"
+        self.upgrades = {}
+        self.upgrade_thread = None
+        self.classical_recipe = None
+        self.metadata_lock = threading.Lock()
+
+        self._load_shared_resources()
+        self.prefetcher = None
+        if self.mode != "classical":
+            self._load_llm_resources()
+            if prefetch:
+                self.prefetcher = AnswerPrefetcher(self._prefetch_answer)
 
         self.test = test
 
@@ -198,91 +251,187 @@ class Chatbot:
 
         self.current_step = 0
 
+    def _lazy(self, name, factory):
+        value = getattr(self, name)
+        if value is None:
+            with self._lazy_lock:
+                value = getattr(self, name)
+                if value is None:
+                    value = factory()
+                    setattr(self, name, value)
+        return value
+
+    @property
+    def cancel_event(self):
+        """Cancellation token of every parse this session runs (see cancel())"""
+        return self._lazy("_cancel_event", threading.Event)
+
+    @property
+    def parse_usage(self):
+        """LLM usage of parsing the recipe, upgrades included"""
+        return self._lazy("_parse_usage", UsageLedger)
+
+    @property
+    def chat_usage(self):
+        """LLM usage of answering this session's questions"""
+        return self._lazy("_chat_usage", UsageLedger)
+
+    @classmethod
+    def _load_shared_resources(cls):
+        """
+        Loads the helper JSON files and their token indexes once per process
+        """
+
+        if cls.usages is not None:
+            return
+
+        usages = load_helper_json("usages.json")
+        procedures = load_helper_json("procedures.json")
+
+        cls.usages_index = TokenIndex(usages)
+        cls.procedures_index = TokenIndex(procedures)
+        cls.context_builder = StepContextBuilder(
+            usages, procedures, cls.usages_index, cls.procedures_index
+        )
+        cls.procedures = procedures
+        cls.usages = usages
+
+    @classmethod
+    def _load_llm_resources(cls):
+        """
+        Creates the shared LLM provider and loads the hybrid-mode prompts once per process
+        """
+
+        if cls.provider is not None:
+            return
+
+        root = Path(__file__).resolve().parent.parent
+        provider = get_provider("chatbot")
+
+        with open(
+            root / "src" / "prompts" / "parameter_clarification_procedure_prompt.txt",
+            "r",
+        ) as f:
+            cls.parameter_clarification_procedure_prompt = f.read()
+
+        with open(root / "src" / "prompts" / "qa_prompt.txt", "r") as f:
+            cls.qa_prompt = f.read()
+
+        cls.provider = provider
+
     def _message_formatting(self, context: str) -> str:
         return "=== Context ===\n" f"{context}\n\n" "=== Context ===\n\n" "Output:"
 
-    def _llm_parameter_clarification_procedure(self, question_type, question):
+    def _stream_llm(self, contents):
+        """
+        Starts a streamed LLM answer and waits for its first text chunk.
+        Returns an iterator over the answer text, without surrounding whitespace
+        and code fence, or None if the model returned nothing.
+        """
+        chunks = strip_code_fence_stream(
+            chunk.text
+            for chunk in self.provider.generate_stream(self.model_name, contents)
+            if chunk.text
+        )
+        first = next(chunks, None)
+        if first is None:
+            return None
+        return _continue_stream(first, chunks)
+
+    def _llm_parameter_clarification_procedure(
+        self, question_type, question, step=None
+    ):
         """
-        Hybrid-mode LLM helper for parameter / clarification / procedure questions.
+        Hybrid-mode LLM helper for parameter / clarification / procedure questions
+        about the current step (or `step`).
         Falls back to classical handling on any failure.
         """
         try:
-            payload = {
-                "user_query": question,
-                "current_step_index": self.current_step,
-                "steps": self.steps,
-                "ingredients": self.ingredients,
-                "tool_definitions": self.usages,
-                "procedure_definitions": self.procedures,
-                "youtube_search_url": self._get_youtube_link(question),
-                "question_type": question_type,
-            }
+            payload = self.context_builder.build(
+                question,
+                question_type,
+                self.steps,
+                self.current_step if step is None else step,
+                self.ingredients,
+                self._get_youtube_link(question),
+                token_budget=self.llm_context_budget,
+            )
 
             full_prompt = (
                 self.parameter_clarification_procedure_prompt.strip()
                 + "\n\nINPUT JSON:\n"
-                + json.dumps(payload, ensure_ascii=False)
+                + compact_json(payload)
             )
 
             contents = self._message_formatting(full_prompt)
-
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    temperature=0.2,
-                    top_p=0.8,
-                    top_k=40,
-                ),
+            logger.info(
+                "%s question: %d chars (~%d tokens) sent, payload ~%d tokens",
+                question_type,
+                len(contents),
+                estimate_tokens(contents),
+                estimate_tokens(compact_json(payload)),
             )
 
-            try:
-                raw = response.text
-            except AttributeError:
-                raw_parts = []
-                for cand in getattr(response, "candidates", []) or []:
-                    for part in (
-                        getattr(getattr(cand, "content", None), "parts", []) or []
-                    ):
-                        if hasattr(part, "text"):
-                            raw_parts.append(part.text)
-                raw = "".join(raw_parts)
-
-            if raw is None:
-                return None
-
-            text = raw.strip()
-
-            if text.startswith("```"):
-                text = re.sub(
-                    r"^```(?:txt|text|plain)?", "", text, flags=re.IGNORECASE
-                ).strip()
-                if text.endswith("```"):
-                    text = text[:-3].strip()
+            return self._stream_llm(contents)
+        except Exception:
+            return None
 
-            if not text:
+    def _prefetch_answer(self, step, intent, cancelled):
+        """
+        Background job of the prefetcher: answers the canonical question of
+        `intent` for `step`, giving up as soon as `cancelled` is set.
+        """
+        question_type, question = self.prefetch_questions[intent]
+        with self.chat_usage.active():
+            chunks = self._llm_parameter_clarification_procedure(
+                question_type, question, step
+            )
+            if chunks is None:
                 return None
 
-            return text
-        except Exception:
+            answer = []
+            for text in chunks:
+                if cancelled.is_set():
+                    chunks.close()
+                    return None
+                answer.append(text)
+            return "".join(answer)
+
+    def _prefetch_around_step(self):
+        steps = [self.current_step]
+        if self.current_step + 1 < len(self.steps):
+            steps.append(self.current_step + 1)
+        self.prefetcher.schedule(steps, self.prefetch_questions)
+
+    def _prefetched_answer(self, intent):
+        if self.prefetcher is None or intent not in self.prefetch_questions:
             return None
+        return self.prefetcher.get(self.current_step, intent)
 
-    def process_url(self, url):
+    def process_url(self, url, time_budget=None):
         """
         Parses metadata related to URL and stores in chatbot
+        With a time_budget (seconds, scraping included), LLM calls that would not
+        fit are replaced by classical parsing; see self.deadline.report()
+        Returns False as well if cancel() stops the parse
         """
 
+        deadline = Deadline(time_budget, cancelled=self.cancel_event)
+
         if self.test:
             self.url = url
             self.title, self.raw_ingredients, self.raw_steps = get_recipe_data(url)
-            self._process_metadata()
+            self._process_metadata(deadline)
             return True
 
         try:
             self.url = url
             self.title, self.raw_ingredients, self.raw_steps = get_recipe_data(url)
-            self._process_metadata()
+            self._process_metadata(deadline)
             return True
+        except ParseCancelled:
+            self._release_parse_state()
+            return False
         except:
             return False
 
@@ -339,40 +488,301 @@ class Chatbot:
 
         return result[:-1] + "."
 
-    def _process_metadata(self):
+    def _process_metadata(self, deadline=None):
         """
         Parses all metadata related to URL
         """
 
-        ingredients = IngredientsParser(self.raw_ingredients)
-        self.ingredients = ingredients.parse()
+        parse_mode = "classical" if self.progressive else self.mode
+        self.deadline = deadline or Deadline(cancelled=self.cancel_event)
+        # a cancelled parse stops between stages; until the steps are split,
+        # the directions count as the skipped steps
+        directions = len(self.raw_steps["directions"])
+
+        with span("parse.ingredients"), self.parse_usage.active():
+            ingredients = IngredientsParser(
+                self.raw_ingredients, deadline=self.deadline
+            )
+            self.ingredients = ingredients.parse()
+        self._build_ingredient_index()
         if self.test:
             print("Ingredients parsed")
 
-        methods = MethodsParser(self.raw_steps, self.mode)
-        self.methods = methods.parse()
+        self.deadline.check(steps=directions)
+        self.methods = self._parse_methods(parse_mode)
         if self.test:
             print("Methods parsed")
 
-        steps = StepsParser(self.raw_steps, self.ingredients, self.mode)
-        self.steps = steps.parse()
-
-        for step in self.steps:
-            step["description"] = self._fix_step_grammar(step["description"])
-
+        self.deadline.check(steps=directions)
+        self.steps = self._parse_steps(parse_mode, self.deadline)
         if self.test:
             print("Steps parsed")
 
-        tools = ToolsParser(self.raw_steps, self.mode)
-        self.tools = tools.parse()
+        self.deadline.check()
+        self.tools = self._parse_tools(parse_mode)
         if self.test:
             print("Tools parsed")
 
+        self._build_answer_tables()
+
         if self.test:
             self._debug_metadata()
 
+        if self.progressive:
+            # the classical parse the upgrades start from, as classical sessions
+            # of the recipe can share it
+            self.classical_recipe = self.export_recipe()
+            self._start_upgrades()
+
         # supplement information between steps
 
+    def _release_parse_state(self):
+        """
+        Drops what a cancelled parse produced so far
+        """
+
+        for name in (
+            "raw_ingredients",
+            "raw_steps",
+            "ingredients",
+            "ingredient_index",
+            "ingredient_by_name",
+            "methods",
+            "steps",
+            "tools",
+            "listing_answers",
+            "step_answers",
+        ):
+            if hasattr(self, name):
+                setattr(self, name, None)
+
+    @timed("parse.methods")
+    def _parse_methods(self, mode, deadline=None):
+        with self.parse_usage.active():
+            return MethodsParser(self.raw_steps, mode, deadline=deadline).parse()
+
+    @timed("parse.steps")
+    def _parse_steps(self, mode, deadline=None):
+        with self.parse_usage.active():
+            steps = StepsParser(
+                self.raw_steps,
+                self.ingredients,
+                mode,
+                escalation_threshold=self.escalation_threshold,
+                deadline=deadline,
+            ).parse()
+        for step in steps:
+            step["description"] = self._fix_step_grammar(step["description"])
+        return steps
+
+    @timed("parse.tools")
+    def _parse_tools(self, mode, deadline=None):
+        with self.parse_usage.active():
+            return ToolsParser(self.raw_steps, mode, deadline=deadline).parse()
+
+    def _start_upgrades(self):
+        """
+        Starts the background LLM pass of progressive hybrid mode
+        """
+
+        # the recipe-wide methods and tools are parsed classically in hybrid
+        # mode too: only the steps have an LLM pass to upgrade to
+        self.upgrades = {"steps": "pending"}
+        self.upgrade_thread = threading.Thread(target=self._run_upgrades, daemon=True)
+        self.upgrade_thread.start()
+
+    def _run_upgrades(self):
+        """
+        Re-parses the steps (per-step ingredients, tools and methods) with the LLM
+        and swaps them and their answer tables in once complete
+        """
+
+        deadline = Deadline(cancelled=self.cancel_event)
+
+        try:
+            deadline.check()
+            steps = self._parse_steps(self.mode, deadline)
+            step_answers = [self._get_step_answers(step) for step in steps]
+        except ParseCancelled:
+            self.upgrades["steps"] = "cancelled"
+            return
+        except Exception:
+            self.upgrades["steps"] = "failed"
+            return
+
+        with self.metadata_lock:
+            self.steps = steps
+            self.step_answers = step_answers
+            self.upgrades["steps"] = "upgraded"
+
+    def upgrade_status(self):
+        """
+        Returns the fields of a progressive hybrid session grouped by state
+        ("pending", "upgraded", "failed", "cancelled")
+        """
+
+        status = {"pending": [], "upgraded": [], "failed": [], "cancelled": []}
+        for field, state in self.upgrades.items():
+            status[state].append(field)
+        return status
+
+    def export_recipe(self):
+        """
+        Returns the parsed recipe as a JSON-serializable dict, for load_recipe
+        """
+
+        with self.metadata_lock:
+            return {name: getattr(self, name) for name in self.recipe_fields}
+
+    def shared_state(self):
+        """
+        Returns the parsed recipe and the tables built from it, so bots of the same
+        recipe in this process can load_recipe it without rebuilding the tables
+        """
+
+        with self.metadata_lock:
+            return {
+                name: getattr(self, name)
+                for name in self.recipe_fields + self.table_fields
+            }
+
+    def load_recipe(self, recipe):
+        """
+        Uses an already parsed recipe (export_recipe / shared_state of another bot)
+        instead of parsing one; its objects are shared, not copied, and the tables
+        are built unless the recipe carries them. A progressive bot starts its LLM
+        upgrades from it
+        """
+
+        for name in self.recipe_fields:
+            setattr(self, name, recipe[name])
+
+        if all(name in recipe for name in self.table_fields):
+            for name in self.table_fields:
+                setattr(self, name, recipe[name])
+        else:
+            self._build_ingredient_index()
+            self._build_answer_tables()
+
+        if self.mode != "classical":
+            # nothing was parsed under it, it only reports an empty budget
+            self.deadline = Deadline(cancelled=self.cancel_event)
+        if self.progressive:
+            self._start_upgrades()
+
+    def session_state(self):
+        """
+        Returns what is specific to this session, as a JSON-serializable dict
+        """
+
+        return {
+            "current_step": self.current_step,
+            "llm_usage": self._chat_usage.to_dict() if self._chat_usage else {},
+        }
+
+    def restore_session_state(self, state):
+        self.current_step = state.get("current_step", 0)
+        if state.get("llm_usage") or self._chat_usage is not None:
+            self.chat_usage.load_dict(state.get("llm_usage", {}))
+
+    def llm_usage(self):
+        """
+        Returns the LLM usage of parsing the recipe and of this session's answers
+        (see UsageLedger.totals)
+        """
+
+        return {"parse": self.parse_usage.totals(), "chat": self.chat_usage.totals()}
+
+    def cancel(self):
+        """
+        Stops this session's work in the background: an in-flight parse (it ends at
+        the next step or LLM call), progressive upgrades and prefetches
+        """
+
+        self.cancel_event.set()
+        if self.prefetcher is not None:
+            self.prefetcher.cancel_all()
+
+    def cancelled(self):
+        return self._cancel_event is not None and self._cancel_event.is_set()
+
+    def wait_for_upgrades(self, timeout=None):
+        """
+        Blocks until the background LLM pass is over; returns False on timeout
+        """
+
+        if self.upgrade_thread is not None:
+            self.upgrade_thread.join(timeout)
+            return not self.upgrade_thread.is_alive()
+        return True
+
+    @timed("parse.answer_tables")
+    def _build_answer_tables(self):
+        """
+        Precomputes the answers that only depend on the recipe and the current step
+        (listings, per-step ingredients/tools/methods, time and temperature)
+        """
+
+        title = self._get_title()
+        ingredients = self._get_ingredients()
+        steps = self._get_steps()
+        self.listing_answers = {
+            "title": title,
+            "ingredients": ingredients,
+            "steps": steps,
+            "recipe": title + ingredients + steps,
+        }
+
+        self.step_answers = [self._get_step_answers(step) for step in self.steps]
+
+    def _get_step_answers(self, step):
+        answers = {}
+        for intent in ("ingredients", "tools", "methods"):
+            values = step[intent]
+            if len(values) == 0:
+                answers[intent] = f"There are no {intent} in the current step.\n"
+            else:
+                answers[intent] = f"The {intent} are: {', '.join(values)}.\n"
+
+        if step["time"] is None:
+            answers["time"] = "No time available for this step.\n"
+        else:
+            answers["time"] = f'{step["time"]["duration"]}.\n'
+
+        if step["temperature"] is None:
+            answers["temperature"] = "No temperature available for this step.\n"
+        else:
+            answers["temperature"] = (
+                f'{step["temperature"]["value"]} {step["temperature"]["unit"]}.\n'
+            )
+
+        return answers
+
+    @timed("parse.ingredient_index")
+    def _build_ingredient_index(self):
+        """
+        Indexes parsed ingredients by name and by name tokens (plus singular forms)
+        so quantity and "what kind of" questions are dictionary lookups
+        """
+
+        names = [str(ing["ingredient_name"] or "") for ing in self.ingredients]
+        self.ingredient_index = TokenIndex(names)
+
+        self.ingredient_by_name = {}
+        for name, ing in zip(names, self.ingredients):
+            self.ingredient_by_name.setdefault(name, ing)
+
+    def _find_ingredient(self, tokens):
+        """
+        Returns the ingredient record best matching the tokens, or None
+        """
+
+        idx = self.ingredient_index.best_index(tokens)
+        if idx is None:
+            return None
+
+        return self.ingredients[idx]
+
     def _debug_metadata(self):
         print("Ingredients")
         for ingredient in self.ingredients:
@@ -421,51 +831,54 @@ class Chatbot:
                 print(CYAN + "\nGoodbye!\n" + RESET)
                 break
 
-            answer = self.respond(query)
-
             print(BOLD + MAGENTA + "Assistant:" + RESET)
-            print(f"{answer}\n")
+            for text in self.respond_stream(query):
+                print(text, end="", flush=True)
+            print("\n")
 
     def respond(self, query):
+        with self.chat_usage.active():
+            with self.metadata_lock:
+                answer = self._respond(query)
+            if answer is None or isinstance(answer, str):
+                return answer
+            return "".join(answer)
+
+    def respond_stream(self, query):
+        """
+        Yields the answer as it is produced: LLM answers (hybrid mode) chunk by
+        chunk, classical answers in one piece.
+        """
+        with self.chat_usage.active():
+            with self.metadata_lock:
+                answer = self._respond(query)
+            if isinstance(answer, str):
+                yield answer
+            elif answer is not None:
+                yield from answer
+
+    def _respond(self, query):
+        """
+        Answers a query with either a string or, for LLM answers, an iterator
+        over the text chunks of the answer.
+        """
         try:
             query = self._clean_query(query)
-            if query == "what are the ingredients in the current step":
-                ings = self.steps[self.current_step]["ingredients"]
-
-                if len(ings) == 0:
-                    return "There are no ingredients in the current step.\n"
-
-                return f"The ingredients are: {', '.join(ings)}.\n"
-
-            if query == "what are the tools in the current step":
-                tools = self.steps[self.current_step]["tools"]
-
-                if len(tools) == 0:
-                    return "There are no tools in the current step.\n"
-
-                return f"The tools are: {', '.join(tools)}.\n"
-
-            if query == "what are the methods in the current step":
-                methods = self.steps[self.current_step]["methods"]
-
-                if len(methods) == 0:
-                    return "There are no methods in the current step.\n"
-
-                return f"The methods are: {', '.join(methods)}.\n"
+            if query in self.step_intents:
+                return self.step_answers[self.current_step][self.step_intents[query]]
 
             if "what kind of" in query:
                 query = query.split()
                 keyword = query[3]
 
                 result = []
-                for ing in self.ingredients:
-                    if keyword in ing["ingredient_name"]:
-                        if ing["ingredient_descriptors"] is not None:
-                            result.append(" ".join(ing["ingredient_descriptors"]))
+                ing = self._find_ingredient([keyword])
+                if ing is not None:
+                    if ing["ingredient_descriptors"] is not None:
+                        result.append(" ".join(ing["ingredient_descriptors"]))
 
-                        if ing["ingredient_preparation"] is not None:
-                            result.append(" ".join(ing["ingredient_preparation"]))
-                        break
+                    if ing["ingredient_preparation"] is not None:
+                        result.append(" ".join(ing["ingredient_preparation"]))
 
                 if len(result) == 0:
                     return "Unclear ingredient.\n"
@@ -495,7 +908,7 @@ class Chatbot:
             if self.test:
                 print(self.query_types[question_type])
 
-            return self.responses[question_type](query)
+            return getattr(self, self.responses[question_type])(query)
         except:
             if self.mode == "classical":
                 return "Unclear question.\n"
@@ -506,6 +919,7 @@ class Chatbot:
                 else:
                     return "Unclear question.\n"
 
+    @timed("intent.llm")
     def llm_respond(self, query, step):
         """
         Hybrid-mode LLM-based response for unsupported questions.
@@ -526,44 +940,7 @@ class Chatbot:
 
             contents = self._message_formatting(full_prompt)
 
-            response = self.client.models.generate_content(
-                model=self.model_name,
-                contents=contents,
-                config=types.GenerateContentConfig(
-                    temperature=0.2,
-                    top_p=0.8,
-                    top_k=40,
-                ),
-            )
-
-            try:
-                raw = response.text
-            except AttributeError:
-                raw_parts = []
-                for cand in getattr(response, "candidates", []) or []:
-                    for part in (
-                        getattr(getattr(cand, "content", None), "parts", []) or []
-                    ):
-                        if hasattr(part, "text"):
-                            raw_parts.append(part.text)
-                raw = "".join(raw_parts)
-
-            if raw is None:
-                return None
-
-            text = raw.strip()
-
-            if text.startswith("```"):
-                text = re.sub(
-                    r"^```(?:txt|text|plain)?", "", text, flags=re.IGNORECASE
-                ).strip()
-                if text.endswith("```"):
-                    text = text[:-3].strip()
-
-            if not text:
-                return None
-
-            return text
+            return self._stream_llm(contents)
         except Exception:
             return None
 
@@ -592,7 +969,7 @@ class Chatbot:
 
         # First check for regex matches
         for i in range(len(self.query_patterns)):
-            if any(re.search(pattern, query) for pattern in self.query_patterns[i]):
+            if any(pattern.search(query) for pattern in self.query_patterns[i]):
                 return i
 
         return -1
@@ -609,20 +986,20 @@ class Chatbot:
         return f' --- {self.title["title"]} --- \n'
 
     def _get_steps(self):
-        result = " --- Steps --- \n"
+        result = [" --- Steps --- \n"]
         for i, step in enumerate(self.steps, start=1):
-            result += f'{i}: {step["description"]}\n'
-        result += "\n"
+            result.append(f'{i}: {step["description"]}\n')
+        result.append("\n")
 
-        return result
+        return "".join(result)
 
     def _get_ingredients(self):
-        result = " --- Ingredients --- \n"
+        result = [" --- Ingredients --- \n"]
         for ingredient in self.raw_ingredients["ingredients"]:
-            result += " - " + ingredient + "\n"
-        result += "\n"
+            result.append(" - " + ingredient + "\n")
+        result.append("\n")
 
-        return result
+        return "".join(result)
 
     def _get_step(self, idx):
         """
@@ -634,18 +1011,19 @@ class Chatbot:
 
         return self.steps[idx]["description"]
 
+    @timed("intent.retrieval")
     def _retrieval_query(self, question: str):
         if "name" in question or "title" in question:
-            return self._get_title()
+            return self.listing_answers["title"]
 
         if "ingredient" in question:
-            return self._get_ingredients()
+            return self.listing_answers["ingredients"]
 
         if "step" in question or "direction" in question:
-            return self._get_steps()
+            return self.listing_answers["steps"]
 
         if "recipe" in question:
-            return self._get_title() + self._get_ingredients() + self._get_steps()
+            return self.listing_answers["recipe"]
 
         return "Unclear question."
 
@@ -679,6 +1057,7 @@ class Chatbot:
 
         return freq.most_common(1)[0][0] - 1
 
+    @timed("intent.navigation")
     def _navigation_query(self, question: str):
         prev_keywords = ["back", "prior", "before", "prev"]
         cur_keywords = ["repeat", "again", "current"]
@@ -697,7 +1076,12 @@ class Chatbot:
         if next_step < 0 or next_step >= len(self.steps):
             return "No such step exists."
 
+        changed = next_step != self.current_step
         self.current_step = next_step
+
+        if changed and self.prefetcher is not None:
+            self._prefetch_around_step()
+
         return self._get_step(self.current_step)
 
     """
@@ -711,14 +1095,40 @@ class Chatbot:
         "What can I use instead of butter?"
     """
 
+    @timed("intent.parameter")
     def _parameter_query(self, question):
+        intent = self._parameter_intent(question)
+
         if self.mode != "classical":
+            prefetched = self._prefetched_answer(intent)
+            if prefetched:
+                return prefetched
+
             llm_answer = self._llm_parameter_clarification_procedure(
                 "parameter", question
             )
             if llm_answer is not None and llm_answer != "":
                 return llm_answer
 
+        step_answers = self.step_answers[self.current_step]
+
+        if intent is None:
+            return "Can you please elaborate on your query?\n"
+
+        elif intent == "time":
+            return step_answers["time"]
+
+        # elif intent == "substitute":
+        #     return "Substitutes currently unavailble.\n"
+
+        elif intent == "temperature":
+            return step_answers["temperature"]
+
+    def _parameter_intent(self, question):
+        """
+        Returns "time", "substitute" or "temperature" for a parameter question,
+        or None if no keyword matches
+        """
         time_keywords = ["long", "time", "when", "done", "finished", "complete"]
         substitute_keywords = ["instead", "use", "replace", "what"]
         temperature_keywords = [
@@ -737,27 +1147,12 @@ class Chatbot:
             sum([question.count(keyword) for keyword in temperature_keywords]),
         ]
 
-        step = self.steps[self.current_step]
-
         idx = counts.index(max(counts))
 
         if counts[idx] == 0:
-            return "Can you please elaborate on your query?\n"
-
-        elif idx == 0:  # time
-            if step["time"] is None:
-                return "No time available for this step.\n"
-
-            return f'{step["time"]["duration"]}.\n'
-
-        # elif idx == 1:  # substitute
-        #     return "Substitutes currently unavailble.\n"
-
-        elif idx == 2:  # temperature
-            if step["temperature"] is None:
-                return "No temperature available for this step.\n"
+            return None
 
-            return f'{step["temperature"]["value"]} {step["temperature"]["unit"]}.\n'
+        return ("time", "substitute", "temperature")[idx]
 
     """
     Clarification Queries
@@ -804,6 +1199,7 @@ class Chatbot:
         encoded_query = quote(query)
         return f"https://www.youtube.com/results?search_query={encoded_query}"
 
+    @timed("intent.clarification")
     def _clarification_query(self, query):
         if self.mode != "classical":
             llm_answer = self._llm_parameter_clarification_procedure(
@@ -815,20 +1211,13 @@ class Chatbot:
         keyword = self._extract_keyword(query)
 
         tokens = keyword.split()
-        counter = Counter()
 
         usage = ""
         definition = ""
-        for tool in self.usages:
-            tool_tokens = tool.split()
-            for token in tokens:
-                for tool_tok in tool_tokens:
-                    if token == tool_tok:
-                        counter[tool] += 1
+        tool = self.usages_index.best_match(tokens)
 
         result = ""
-        if len(counter) > 0:
-            tool = counter.most_common(1)[0][0]
+        if tool is not None:
             usage = self.usages[tool]["usage"]
             definition = self.usages[tool]["description"]
             result = f"{tool[0].upper() + tool[1:]} refers to {definition[0].lower() + definition[1:]}. {usage}\n"
@@ -849,8 +1238,15 @@ class Chatbot:
     Vague (step-dependent): "How do I do that?" — referring to the current step’s action.
     """
 
+    @timed("intent.procedure")
     def _procedure_query(self, query):
         if self.mode != "classical":
+            # "how do i do that?" asks about the current step's action
+            if query.split()[-1] in self.vague_words:
+                prefetched = self._prefetched_answer("procedure")
+                if prefetched:
+                    return prefetched
+
             llm_answer = self._llm_parameter_clarification_procedure(
                 "procedure", query
             )
@@ -861,18 +1257,10 @@ class Chatbot:
         keyword = tokens[-1]
 
         tokens = keyword.split()
-        counter = Counter()
-
-        for procedure in self.procedures:
-            proc_tokens = procedure.split()
-            for token in tokens:
-                for proc_tok in proc_tokens:
-                    if token == proc_tok:
-                        counter[procedure] += 1
+        mx = self.procedures_index.best_match(tokens)
 
         result = ""
-        if len(counter) > 0:
-            mx = counter.most_common(1)[0][0]
+        if mx is not None:
             result += (
                 f"{mx[0].upper() + mx[1:]} means "
                 f"{self.procedures[mx][0].lower() + self.procedures[mx][1:]}\n"
@@ -892,14 +1280,12 @@ class Chatbot:
     Vague (step-dependent): "How much of that do I need?" — referring to an ingredient mentioned in the current step.
     """
 
-    def _get_ingredient_quantity(self, query):
+    def _get_ingredient_quantity(self, ingredient):
         quantity = -1
         unit = ""
-        for ingredient in self.ingredients:
-            if query in ingredient["ingredient_name"]:
-                quantity = ingredient["ingredient_quantity"]
-                unit = ingredient["measurement_unit"]
-                break
+        if ingredient is not None:
+            quantity = ingredient["ingredient_quantity"]
+            unit = ingredient["measurement_unit"]
 
         if quantity == "":
             return None, None
@@ -909,27 +1295,26 @@ class Chatbot:
 
         return f"{quantity} {unit}", True
 
+    @timed("intent.quantity")
     def _quantity_query(self, question):
         step = self.steps[self.current_step]
         tokens = self._extract_keyword(question).split()
-        counter = Counter()
-        for idx, ing in enumerate(self.ingredients):
-            for tok in tokens:
-                if tok in ing["ingredient_name"]:
-                    counter[idx] += 1
+        record = self._find_ingredient(tokens)
 
-        if len(counter) == 0:
+        if record is None:
             ingredient = step["ingredients"]
 
             if ingredient is None:
                 return "No ingredients mentioned\n"
 
             ingredient = ingredient[0]
+            record = self.ingredient_by_name.get(ingredient)
+            if record is None:
+                record = self._find_ingredient(ingredient.split())
         else:
-            idx = counter.most_common(1)[0][0]
-            ingredient = self.ingredients[idx]["ingredient_name"]
+            ingredient = record["ingredient_name"]
 
-        quantity, unit = self._get_ingredient_quantity(ingredient)
+        quantity, unit = self._get_ingredient_quantity(record)
 
         if quantity == "":
             return f"No quantity is available for the ingredient {ingredient}\n"
@@ -940,6 +1325,14 @@ class Chatbot:
             return f"{quantity} {ingredient}.\n"
 
 
+def _continue_stream(first, chunks):
+    yield first
+    try:
+        yield from chunks
+    except Exception:
+        pass  # keep the part of the answer that already arrived
+
+
 if __name__ == "__main__":
     print(BOLD + CYAN + "\n=== Recipe Navigation Chatbot ===\n" + RESET)
 
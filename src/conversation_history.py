@@ -0,0 +1,141 @@
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting.
+
+    Args:
+        text: Any prompt text
+
+    Returns:
+        Estimated number of tokens
+    """
+    return len(text) // 4 + 1
+
+
+class ConversationHistory:
+    """Bounded chat history: the last turns verbatim, older turns folded into a summary."""
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        keep_turns: int = 6,
+        summary_budget: int = 400,
+        summarize: bool = True,
+        summarizer: Optional[Callable[[str, List[Tuple[str, str]]], str]] = None,
+    ):
+        """Initialize an empty history.
+
+        Args:
+            token_budget: Max estimated tokens for summary + verbatim turns
+            keep_turns: Max number of most recent turns kept verbatim
+            summary_budget: Max estimated tokens of the rolling summary
+            summarize: Fold evicted turns into the summary (False drops them)
+            summarizer: Optional (old_summary, evicted_turns) -> new_summary function,
+                e.g. an LLM call; defaults to a compact extractive summary
+        """
+        self.token_budget = token_budget
+        self.keep_turns = keep_turns
+        self.summary_budget = summary_budget
+        self.summarize = summarize
+        self.summarizer = summarizer
+
+        self.turns: List[Tuple[str, str]] = []
+        self.summary = ""
+
+    def add_turn(self, question: str, answer: str) -> bool:
+        """Record a finished turn and compact the history if needed.
+
+        Args:
+            question: Message sent by the user
+            answer: Model reply
+
+        Returns:
+            True if older turns were folded or dropped
+        """
+        self.turns.append((question, answer or ""))
+        return self.compact()
+
+    def token_count(self) -> int:
+        """Estimated tokens the history adds to the next request."""
+        return sum(
+            estimate_tokens(content["parts"][0]["text"])
+            for content in self.as_contents()
+        )
+
+    def compact(self) -> bool:
+        """Evict the oldest turns until the history fits keep_turns and token_budget.
+
+        Returns:
+            True if any turn was evicted
+        """
+        evicted = []
+        while self.turns and (
+            len(self.turns) > self.keep_turns or self.token_count() > self.token_budget
+        ):
+            evicted.append(self.turns.pop(0))
+
+            if self.summarize:
+                self.summary = self._fold(self.summary, [evicted[-1]])
+
+        return len(evicted) > 0
+
+    def _fold(self, summary: str, turns: List[Tuple[str, str]]) -> str:
+        if self.summarizer is not None:
+            try:
+                return self.summarizer(summary, turns)
+            except Exception:
+                pass  # fall back to the extractive summary
+
+        lines = summary.splitlines() if summary else []
+        for question, answer in turns:
+            lines.append(f"- Q: {_shorten(question, 120)} A: {_shorten(answer, 160)}")
+
+        # keep the newest lines that fit the summary budget
+        while (
+            len(lines) > 1 and estimate_tokens("\n".join(lines)) > self.summary_budget
+        ):
+            lines.pop(0)
+
+        return "\n".join(lines)
+
+    def to_dict(self) -> Dict:
+        """Summary and verbatim turns, JSON-serializable (see load_dict)."""
+        return {"summary": self.summary, "turns": [list(turn) for turn in self.turns]}
+
+    def load_dict(self, state: Dict):
+        """Replace the history with one saved by to_dict().
+
+        Args:
+            state: A to_dict() result
+        """
+        self.summary = state.get("summary", "")
+        self.turns = [tuple(turn) for turn in state.get("turns", [])]
+
+    def as_contents(self) -> List[Dict]:
+        """History in google-genai content-dict form, oldest first."""
+        contents = []
+        if self.summary:
+            contents.append(
+                _content(
+                    "user", "Summary of the earlier conversation:\n" + self.summary
+                )
+            )
+            contents.append(_content("model", "Noted."))
+
+        for question, answer in self.turns:
+            contents.append(_content("user", question))
+            contents.append(_content("model", answer))
+
+        return contents
+
+
+def _content(role: str, text: str) -> Dict:
+    return {"role": role, "parts": [{"text": text}]}
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    if len(text) <= limit:
+        return text
+    return text[: limit - 3].rstrip() + "..."
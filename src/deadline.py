@@ -0,0 +1,175 @@
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from src import tracing
+from src.llm_ledger import UsageLedger
+from src.llm_provider import get_usage
+
+# assumed duration of one LLM call until this process has timed some
+DEFAULT_CALL_ESTIMATE_S = float(os.getenv("LLM_CALL_ESTIMATE_S", "2.0"))
+
+_cancellations = {"jobs": 0, "steps_skipped": 0, "llm_calls_skipped": 0}
+_cancellations_lock = threading.Lock()
+
+
+class ParseCancelled(Exception):
+    """Raised by Deadline.check() once the parse job has been cancelled."""
+
+
+def get_cancellation_stats() -> Dict[str, int]:
+    """Cancelled parse jobs since start-up and the work they skipped.
+
+    Returns:
+        jobs, steps_skipped (steps not annotated; recipe directions if the
+        job stopped before splitting them into steps) and llm_calls_skipped
+        (ingredient prompts not sent); queued LLM calls that were aborted are
+        counted per caller in get_usage()["cancelled"]
+    """
+    with _cancellations_lock:
+        return dict(_cancellations)
+
+
+def observed_call_estimate() -> float:
+    """Mean latency of the parser LLM calls made by this process so far.
+
+    Returns:
+        The mean in seconds, or DEFAULT_CALL_ESTIMATE_S before the first call
+    """
+    usage = [
+        stats for caller, stats in get_usage().items() if caller.endswith("_parser")
+    ]
+    calls = sum(stats["calls"] for stats in usage)
+    if not calls:
+        return DEFAULT_CALL_ESTIMATE_S
+    return sum(stats["latency_s"] + stats["wait_s"] for stats in usage) / calls
+
+
+class Deadline:
+    """Time budget and cancellation token of one recipe parse, shared by the parsers.
+
+    The parsers ask can_afford() before every LLM call and use their classical
+    extractor for the item when the remaining time can't cover another call;
+    degrade() records what was parsed classically for that reason. Without a
+    budget every call is affordable.
+
+    They also call check() between items, which raises ParseCancelled once
+    cancel() was called (from any thread); LLM calls still waiting for a
+    concurrency slot are aborted through the same event.
+    """
+
+    def __init__(
+        self,
+        seconds: Optional[float] = None,
+        call_estimate: Optional[float] = None,
+        cancelled: Optional[threading.Event] = None,
+    ):
+        """Start the clock.
+
+        Args:
+            seconds: Time budget, None for no limit
+            call_estimate: Expected seconds per LLM call (defaults to the mean
+                observed so far); updated from the calls timed by llm_call()
+                that reached the backend
+            cancelled: Event to use as the cancellation token (e.g. one owned
+                by the session), a new one by default
+        """
+        self.seconds = seconds
+        self.cancelled = cancelled or threading.Event()
+        self.counted = False
+        self.start = time.monotonic()
+        self.call_estimate = (
+            observed_call_estimate() if call_estimate is None else call_estimate
+        )
+        self.calls = 0
+        self.degraded: Dict[str, int] = {}
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.start
+
+    def remaining(self) -> float:
+        if self.seconds is None:
+            return math.inf
+        return self.seconds - self.elapsed()
+
+    def can_afford(self) -> bool:
+        """True if another LLM call is expected to finish within the budget."""
+        return not self.cancelled.is_set() and self.remaining() >= self.call_estimate
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def check(self, steps: int = 0, llm_calls: int = 0):
+        """Raise ParseCancelled if the job was cancelled.
+
+        Args:
+            steps: Steps the caller would still annotate (counted as skipped)
+            llm_calls: LLM calls the caller would still make (counted as skipped)
+        """
+        if not self.cancelled.is_set():
+            return
+
+        with _cancellations_lock:
+            if not self.counted:
+                self.counted = True
+                _cancellations["jobs"] += 1
+                _cancellations["steps_skipped"] += steps
+                _cancellations["llm_calls_skipped"] += llm_calls
+        raise ParseCancelled("Parse was cancelled")
+
+    def clip(self, seconds: float) -> float:
+        """Shorten a rate-limit pause so that it leaves room for the next call.
+
+        Args:
+            seconds: Requested pause
+
+        Returns:
+            The pause to take (unchanged without a budget)
+        """
+        if self.seconds is None:
+            return seconds
+        return max(0.0, min(seconds, self.remaining() - self.call_estimate))
+
+    @contextmanager
+    def llm_call(self):
+        """Times the LLM call made inside the block to refine call_estimate.
+
+        Answers served from the LLM response cache are neither timed nor
+        counted: they would pull the estimate towards zero.
+        """
+        usage = UsageLedger()
+        start = time.monotonic()
+        try:
+            with usage.active():
+                yield
+        finally:
+            if usage.totals()["calls"]:
+                self.calls += 1
+                observed = time.monotonic() - start
+                self.call_estimate = 0.5 * self.call_estimate + 0.5 * observed
+
+    def degrade(self, part: str, count: int = 1):
+        """Record items of `part` parsed classically because the budget ran out.
+
+        Args:
+            part: e.g. "ingredient_names", "step_tools"
+            count: Number of items
+        """
+        if self.cancelled.is_set():
+            return
+        self.degraded[part] = self.degraded.get(part, 0) + count
+        tracing.event(
+            "degraded", part=part, count=count, elapsed_s=round(self.elapsed(), 3)
+        )
+
+    def report(self) -> Dict[str, object]:
+        """Budget, elapsed time, LLM calls made and degraded parts (item counts)."""
+        return {
+            "time_budget_s": self.seconds,
+            "elapsed_s": round(self.elapsed(), 3),
+            "llm_calls": self.calls,
+            "degraded": dict(self.degraded),
+        }
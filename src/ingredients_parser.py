@@ -1,12 +1,11 @@
 import json
 import re
-import spacy
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import os
-import time
+from src.deadline import Deadline
+from src.llm_provider import default_escalation_threshold, get_provider
+from src import tracing
+from src.metrics import timed
+from src.resources import get_nlp, load_helper_json
 
 
 class IngredientsParser:
@@ -15,6 +14,8 @@ class IngredientsParser:
         ingredients: dict[str, list[str]],
         mode: str = "classical",
         model_name: str = "gemini-2.5-flash-lite",
+        escalation_threshold: float | None = None,
+        deadline: Deadline | None = None,
     ):
         self.mode = mode
         self.ingredients = ingredients["ingredients"]
@@ -25,10 +26,21 @@ class IngredientsParser:
         self.preparations = None
         self.model_name = model_name
 
-        self.nlp = spacy.load("en_core_web_sm")
-        self.path = Path(__file__).resolve().parent / "helper_files"
-        self.alias_to_canon = self._load_json(self.path / "units_map.json")
-        self.unicode_fractions = self._load_json(self.path / "unicode_fractions.json")
+        # hybrid mode only sends lines whose classical parse scores below this
+        self.escalation_threshold = (
+            default_escalation_threshold()
+            if escalation_threshold is None
+            else escalation_threshold
+        )
+        self.name_fallbacks = None
+        self.confidences = None
+        self.escalated = set()
+        # LLM calls the remaining time budget can't cover are left classical
+        self.deadline = deadline or Deadline()
+
+        self.nlp = get_nlp()
+        self.alias_to_canon = load_helper_json("units_map.json")
+        self.unicode_fractions = load_helper_json("unicode_fractions.json")
         self.frac_chars = "".join(self.unicode_fractions.keys())
         self.units_pattern = "|".join(
             sorted(map(re.escape, self.alias_to_canon.keys()), key=len, reverse=True)
@@ -44,14 +56,8 @@ class IngredientsParser:
 
         if self.mode != "classical":
             self.path = Path(__file__).resolve().parent.parent
-            load_dotenv(self.path / "apikey.env")
-            self.api_key = os.getenv("GEMINI_API_KEY")
-            if not self.api_key:
-                raise ValueError(
-                    "GEMINI_API_KEY not found. Please set it in your .env file."
-                )
-
-            self.client = genai.Client(api_key=self.api_key)
+            self.provider = get_provider("ingredients_parser")
+            self.provider.cancelled = self.deadline.cancelled
 
             self.ingredients_names_prompt = self._load_text(
                 self.path / "src" / "prompts" / "ingredients_names_prompt.txt"
@@ -75,15 +81,13 @@ class IngredientsParser:
         with path.open("r", encoding="utf-8") as f:
             return f.read()
 
-    def _load_json(self, path: Path) -> dict[str, str]:
-        with path.open("r", encoding="utf-8") as f:
-            return json.load(f)
-
+    @timed("ingredients.ingredients_names")
     def extract_ingredients_names(self):
         """
         Extracts core ingredient names, and stores them in self.ingredients_names.
         """
         results = []
+        fallbacks = []
         for line in self.ingredients:
             match = self.qty.search(line)
             line = line[match.end() :] if match else line
@@ -95,6 +99,7 @@ class IngredientsParser:
 
             doc = self.nlp(line)
             noun_chunks = list(doc.noun_chunks)
+            fallbacks.append(not noun_chunks)
             if noun_chunks:
                 chunk = noun_chunks[-1]
                 head = chunk.root
@@ -107,7 +112,9 @@ class IngredientsParser:
                 line = " ".join(keep_tokens).lower().strip()
             results.append(line)
         self.ingredients_names = results
+        self.name_fallbacks = fallbacks
 
+    @timed("ingredients.quantities")
     def extract_quantities(self):
         """
         Extracts the quantity value from each ingredient line.
@@ -143,6 +150,7 @@ class IngredientsParser:
             results.append(quantity)
         self.ingredients_quantities_and_amounts = results
 
+    @timed("ingredients.measurement_units")
     def extract_measurement_units(self):
         """
         Detects the measurement unit in each ingredient line.
@@ -158,6 +166,7 @@ class IngredientsParser:
             )
         self.ingredients_measurement_units = results
 
+    @timed("ingredients.descriptors")
     def extract_descriptors(self):
         """
         Extracts descriptive modifiers of the ingredient (adjectives, compounds, and participial adjectives)
@@ -194,6 +203,7 @@ class IngredientsParser:
             results.append(descriptors)
         self.descriptors = results
 
+    @timed("ingredients.preparations")
     def extract_preparations(self):
         """
         Extract preparation notes by taking the text after the last comma, keeping it only if it contains a verb or participle.
@@ -216,59 +226,93 @@ class IngredientsParser:
             results.append([line] if keep and line else [])
         self.preparations = results
 
+    @timed("ingredients.score_confidences")
+    def score_confidences(self):
+        """
+        Scores how much the classical parse of each line can be trusted, from 0 to 1,
+        and stores the scores in self.confidences. Expects the classical extractors
+        to have run. Penalizes a missing quantity, a name taken from the raw text
+        (no noun chunk), long names, alternatives ("or", "and", "/"), parentheticals
+        and a comma tail that was not recognized as a preparation.
+        """
+        results = []
+        for i, line in enumerate(self.ingredients):
+            score = 1.0
+            if self.ingredients_quantities_and_amounts[i] is None:
+                score -= 0.25
+            if self.name_fallbacks[i]:
+                score -= 0.35
+
+            name = self.ingredients_names[i] or ""
+            if not name or len(name.split()) > 2:
+                score -= 0.2
+
+            head = self.paren.sub("", line).rsplit(",", 1)[0].lower()
+            if re.search(r"\b(?:or|and)\b|/", head):
+                score -= 0.25
+            if self.paren.search(line):
+                score -= 0.1
+            if "," in line and not self.preparations[i]:
+                score -= 0.2
+
+            results.append(round(max(score, 0.0), 2))
+        self.confidences = results
+
     def _message_formatting(self, context: str) -> str:
         return "=== Context ===\n" f"{context}\n\n" "=== Context ===\n\n" "Output:"
 
-    def _call_llm(self, task_prompt: str):
+    def _call_llm(self, task_prompt: str, prompt_file: str, lines: list[str]):
         """
-        Calls the LLM with a given task prompt and the current ingredients list.
-        Expects the model to return ONLY a JSON array (no extra text).
+        Calls the LLM with a given task prompt and the given ingredient lines.
+        Expects the model to return ONLY a JSON array (no extra text) with one
+        entry per line; raises ValueError otherwise.
+        prompt_file names the prompt under src/prompts/ for the response cache.
         """
-        payload = json.dumps({"ingredients": self.ingredients}, ensure_ascii=False)
+        payload = json.dumps({"ingredients": lines}, ensure_ascii=False)
         full_prompt = task_prompt.strip() + "\n\nINPUT JSON:\n" + payload
 
         contents = self._message_formatting(full_prompt)
 
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                top_p=0.8,
-                top_k=40,
-            ),
-        )
-
-        try:
-            raw = response.text
-        except AttributeError:
-            raw_parts = []
-            for cand in getattr(response, "candidates", []) or []:
-                for part in getattr(cand, "content", {}).parts or []:
-                    if hasattr(part, "text"):
-                        raw_parts.append(part.text)
-            raw = "".join(raw_parts)
+        parsed = self.provider.generate_json(self.model_name, contents, prompt_file)
+        if not isinstance(parsed, list) or len(parsed) != len(lines):
+            raise ValueError(f"Expected a JSON list of {len(lines)} entries.")
+        return parsed
 
-        if raw is None:
-            raise ValueError("LLM response had no text content.")
-
-        text = raw.strip()
-
-        if text.startswith("```"):
-            text = re.sub(r"^```(?:json)?", "", text, flags=re.IGNORECASE).strip()
-            if text.endswith("```"):
-                text = text[:-3].strip()
+    def _escalate(self, task_prompt: str, prompt_file: str, classical: list, part: str):
+        """
+        Replaces the classical results of the escalated lines with the LLM's.
+        Keeps the classical results if the call fails, or if the time budget can't
+        cover it (counted in self.deadline.degraded under `part`).
+        """
+        escalated = sorted(self.escalated)
+        if not self.deadline.can_afford():
+            self.deadline.degrade(part, len(escalated))
+            return classical
 
         try:
-            return json.loads(text)
-        except json.JSONDecodeError as e:
-            raise ValueError(
-                f"Failed to parse LLM JSON output: {e}\nRaw output:\n{text}"
-            ) from e
-
+            with self.deadline.llm_call():
+                parsed = self._call_llm(
+                    task_prompt, prompt_file, [self.ingredients[i] for i in escalated]
+                )
+        except Exception as e:
+            tracing.event("fallback", part=part, error=type(e).__name__)
+            self.provider.throttle(self.deadline.clip(20))
+            return classical
+
+        self.provider.throttle(self.deadline.clip(5))
+        results = list(classical)
+        for i, value in zip(escalated, parsed):
+            results[i] = value
+        return results
+
+    @timed("ingredients.llm_based_extraction")
     def llm_based_extraction(self):
         """
-        Uses the LLM (with 5 task-specific prompts) to populate:
+        Runs the classical extractors, then uses the LLM (with task-specific prompts)
+        to redo the names, descriptors and preparations of the lines whose classical
+        confidence is below self.escalation_threshold, as long as self.deadline
+        leaves time for the call. Raises ParseCancelled if the deadline's job is
+        cancelled. Populates:
         - self.ingredients_names
         - self.ingredients_quantities_and_amounts
         - self.ingredients_measurement_units
@@ -276,31 +320,51 @@ class IngredientsParser:
         - self.preparations
         """
 
-        try:
-            self.ingredients_names = self._call_llm(self.ingredients_names_prompt)
-            time.sleep(5)
-        except Exception:
-            self.extract_ingredients_names()  # Fallback to classical extraction
-            time.sleep(20)
-
-        # self.ingredients_quantities_and_amounts = self._call_llm(self.quantities_prompt)
-        # self.ingredients_measurement_units = self._call_llm(self.measurement_units_prompt)
+        self.extract_ingredients_names()
         self.extract_quantities()  # Regular extraction for quantities
         self.extract_measurement_units()  # Regular extraction for measurement units
+        self.extract_descriptors()
+        self.extract_preparations()
+        self.score_confidences()
 
-        try:
-            self.descriptors = self._call_llm(self.descriptors_prompt)
-            time.sleep(5)
-        except Exception:
-            self.extract_descriptors()  # Fallback to classical extraction
-            time.sleep(20)
+        self.escalated = {
+            i
+            for i, confidence in enumerate(self.confidences)
+            if confidence < self.escalation_threshold
+        }
+        if not self.escalated:
+            return
 
-        try:
-            self.preparations = self._call_llm(self.preparations_prompt)
-            time.sleep(5)
-        except Exception:
-            self.extract_preparations()  # Fallback to classical extraction
-            time.sleep(20)
+        # self.ingredients_quantities_and_amounts = self._call_llm(self.quantities_prompt)
+        # self.ingredients_measurement_units = self._call_llm(self.measurement_units_prompt)
+        fields = [
+            (
+                "ingredients_names",
+                self.ingredients_names_prompt,
+                "ingredients_names_prompt.txt",
+                "ingredient_names",
+            ),
+            (
+                "descriptors",
+                self.descriptors_prompt,
+                "descriptors_prompt.txt",
+                "ingredient_descriptors",
+            ),
+            (
+                "preparations",
+                self.preparations_prompt,
+                "preparations_prompt.txt",
+                "ingredient_preparations",
+            ),
+        ]
+        for done, (attr, task_prompt, prompt_file, part) in enumerate(fields):
+            # stops here if the parse job was cancelled (replaced session, closed tab)
+            self.deadline.check(llm_calls=len(fields) - done)
+            setattr(
+                self,
+                attr,
+                self._escalate(task_prompt, prompt_file, getattr(self, attr), part),
+            )
 
         n = len(self.ingredients)
         for name, arr in [
@@ -364,20 +428,20 @@ class IngredientsParser:
 
     def _parse_llm(self) -> list[dict[str, list[str] | str | int | float | None]]:
         """
-        LLM-based parsing. Same output schema as _parse_classical.
+        LLM-based parsing (low-confidence lines only). Same output schema as _parse_classical.
         """
 
         self.llm_based_extraction()
 
         output = []
         for i in range(len(self.ingredients)):
-            cleaned_name = self._clean_name_with_descriptors(
-                self.ingredients_names[i], self.descriptors[i]
-            )
+            name = self.ingredients_names[i]
+            if i in self.escalated:
+                name = self._clean_name_with_descriptors(name, self.descriptors[i])
             output.append(
                 {
                     "original_ingredient_sentence": self.ingredients[i],
-                    "ingredient_name": cleaned_name,
+                    "ingredient_name": name,
                     "ingredient_quantity": self.ingredients_quantities_and_amounts[i],
                     "measurement_unit": self.ingredients_measurement_units[i],
                     "ingredient_descriptors": self.descriptors[i],
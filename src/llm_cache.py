@@ -0,0 +1,201 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+DEFAULT_PATH = Path(__file__).resolve().parent.parent / ".cache" / "llm_cache.sqlite3"
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def prompt_version(name):
+    """
+    Content hash of a prompt file under src/prompts/, recomputed only when the
+    file's mtime or size changes. Cache keys embed it, so editing a prompt
+    invalidates every response produced with the old wording.
+    """
+    path = PROMPTS_DIR / name
+    stat = path.stat()
+    signature = (stat.st_mtime_ns, stat.st_size)
+
+    with _versions_lock:
+        cached = _versions.get(name)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+    version = hashlib.sha256(path.read_bytes()).hexdigest()[:16]
+    with _versions_lock:
+        _versions[name] = (signature, version)
+    return version
+
+
+class LLMCache:
+    """
+    Exact-match cache of LLM responses keyed by (model, prompt template version,
+    payload hash): an in-memory LRU in front of an optional SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, memory_items=1024, max_rows=50000):
+        """
+        Args:
+            path: SQLite file, or None for a memory-only cache
+            memory_items: Max entries kept in the in-memory LRU
+            max_rows: Max rows kept on disk (least recently used are evicted)
+        """
+        self.memory_items = memory_items
+        self.max_rows = max_rows
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "invalidated": 0,
+        }
+
+        self.db = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self.db = sqlite3.connect(str(path), check_same_thread=False)
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, template TEXT, version TEXT, "
+                "response TEXT, accessed REAL)"
+            )
+            self.db.commit()
+            self.purge_stale()
+
+    def key(self, model, template, payload):
+        version = prompt_version(template)
+        digest = hashlib.sha256(
+            "\0".join((model, template, version, payload)).encode("utf-8")
+        ).hexdigest()
+        return digest, version
+
+    def get(self, model, template, payload):
+        key, _ = self.key(model, template, payload)
+
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self.memory[key]
+
+            if self.db is not None:
+                row = self.db.execute(
+                    "SELECT response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    self.db.execute(
+                        "UPDATE responses SET accessed = ? WHERE key = ?",
+                        (time.time(), key),
+                    )
+                    self.db.commit()
+                    self.stats["disk_hits"] += 1
+                    self._remember(key, row[0])
+                    return row[0]
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, model, template, payload, response):
+        key, version = self.key(model, template, payload)
+
+        with self.lock:
+            self._remember(key, response)
+            self.stats["stores"] += 1
+
+            if self.db is not None:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+                    (key, template, version, response, time.time()),
+                )
+                # trim the table every 100 stores instead of on every insert
+                if self.stats["stores"] % 100 == 0:
+                    self._evict_rows()
+                self.db.commit()
+
+    def _remember(self, key, response):
+        self.memory[key] = response
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_items:
+            self.memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_rows(self):
+        count = self.db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_rows:
+            self.db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed LIMIT ?)",
+                (count - self.max_rows,),
+            )
+            self.stats["evictions"] += count - self.max_rows
+
+    def purge_stale(self):
+        """Deletes rows produced with an older version of their prompt file."""
+        if self.db is None:
+            return
+
+        with self.lock:
+            templates = self.db.execute(
+                "SELECT DISTINCT template FROM responses"
+            ).fetchall()
+            for (template,) in templates:
+                try:
+                    version = prompt_version(template)
+                except OSError:
+                    version = None  # prompt file was removed
+                deleted = self.db.execute(
+                    "DELETE FROM responses WHERE template = ? AND version IS NOT ?",
+                    (template, version),
+                ).rowcount
+                self.stats["invalidated"] += deleted
+            self.db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            if self.db is not None:
+                self.db.execute("DELETE FROM responses")
+                self.db.commit()
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    Process-wide response cache configured from the environment, or None when
+    LLM_CACHE=0:
+        - LLM_CACHE_PATH: SQLite file ("" for memory only), default .cache/llm_cache.sqlite3
+        - LLM_CACHE_MEMORY_ITEMS: in-memory LRU size, default 1024
+        - LLM_CACHE_MAX_ROWS: on-disk row limit, default 50000
+    """
+    global _cache
+
+    if os.getenv("LLM_CACHE", "1") == "0":
+        return None
+
+    with _cache_lock:
+        if _cache is None:
+            path = os.getenv("LLM_CACHE_PATH", str(DEFAULT_PATH)) or None
+            _cache = LLMCache(
+                path,
+                memory_items=int(os.getenv("LLM_CACHE_MEMORY_ITEMS", "1024")),
+                max_rows=int(os.getenv("LLM_CACHE_MAX_ROWS", "50000")),
+            )
+        return _cache
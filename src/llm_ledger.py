@@ -0,0 +1,133 @@
+import contextvars
+import threading
+from contextlib import contextmanager
+from typing import Dict
+
+FIELDS = (
+    "calls",
+    "failures",
+    "cache_hits",
+    "cancelled",
+    "prompt_tokens",
+    "output_tokens",
+    "latency_s",
+    "wait_s",
+    "sleep_s",
+)
+
+# ledgers of the operations the code running in this context is part of
+_active = contextvars.ContextVar("llm_ledgers", default=())
+
+
+def _empty() -> Dict:
+    return {field: 0.0 if field.endswith("_s") else 0 for field in FIELDS}
+
+
+class UsageLedger:
+    """LLM usage of one operation: a recipe parse, a chat session or a single turn.
+
+    Every LLM call site reports through the provider handles (see
+    llm_provider.SharedProvider), which add the call to each ledger active in
+    the calling context: calls, failures, cache hits, calls cancelled while
+    queued, prompt and output tokens, seconds spent in calls, waiting for a
+    concurrency slot and sleeping in rate-limit pauses, in total and per caller.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.by_caller: Dict[str, Dict] = {}
+
+    @contextmanager
+    def active(self):
+        """Records the LLM calls made in this context during the block here too."""
+        previous = _active.get()
+        _active.set(previous + (self,))
+        try:
+            yield self
+        finally:
+            # set rather than reset: a streamed answer may finish in another context
+            _active.set(previous)
+
+    def add(self, caller: str, **amounts):
+        with self.lock:
+            stats = self.by_caller.setdefault(caller, _empty())
+            for field, amount in amounts.items():
+                stats[field] += amount
+
+    def totals(self) -> Dict:
+        """Usage summed over the callers, plus "by_caller"."""
+        with self.lock:
+            by_caller = {
+                caller: dict(stats) for caller, stats in self.by_caller.items()
+            }
+        totals = _empty()
+        for stats in by_caller.values():
+            for field in FIELDS:
+                totals[field] += stats[field]
+        for field in FIELDS:
+            if field.endswith("_s"):
+                totals[field] = round(totals[field], 6)
+        totals["by_caller"] = by_caller
+        return totals
+
+    def to_dict(self) -> Dict:
+        """The per-caller usage, as a JSON-serializable dict (see load_dict())."""
+        with self.lock:
+            return {caller: dict(stats) for caller, stats in self.by_caller.items()}
+
+    def load_dict(self, state: Dict):
+        with self.lock:
+            self.by_caller = {
+                caller: {**_empty(), **stats} for caller, stats in state.items()
+            }
+
+
+def record(caller: str, **amounts):
+    """Adds amounts (FIELDS) for caller to every ledger active in this context."""
+    for ledger in _active.get():
+        ledger.add(caller, **amounts)
+
+
+def usage_prometheus(usage: Dict[str, Dict]) -> str:
+    """Per-caller usage totals (llm_provider.get_usage()) as Prometheus counters."""
+    counters = [
+        ("calls", "recipe_parser_llm_calls_total", "LLM calls made.", None),
+        (
+            "failures",
+            "recipe_parser_llm_failures_total",
+            "LLM calls that failed.",
+            None,
+        ),
+        (
+            "cache_hits",
+            "recipe_parser_llm_cache_hits_total",
+            "LLM calls answered from the response cache.",
+            None,
+        ),
+        (
+            "cancelled",
+            "recipe_parser_llm_cancelled_total",
+            "LLM calls cancelled while waiting for a slot.",
+            None,
+        ),
+        ("prompt_tokens", "recipe_parser_llm_tokens_total", "LLM tokens.", "prompt"),
+        ("output_tokens", "recipe_parser_llm_tokens_total", None, "output"),
+        (
+            "latency_s",
+            "recipe_parser_llm_seconds_total",
+            "Seconds spent in LLM calls, waiting for a slot and in rate-limit pauses.",
+            "call",
+        ),
+        ("wait_s", "recipe_parser_llm_seconds_total", None, "wait"),
+        ("sleep_s", "recipe_parser_llm_seconds_total", None, "sleep"),
+    ]
+    lines = []
+    for field, name, help_text, kind in counters:
+        if help_text is not None:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for caller, stats in sorted(usage.items()):
+            labels = f'caller="{caller}"'
+            if kind is not None:
+                labels += f',kind="{kind}"'
+            lines.append(f"{name}{{{labels}}} {stats.get(field, 0)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,719 @@
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+
+import requests
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+from src.llm_cache import get_cache
+from src import llm_ledger, tracing
+from src.metrics import observe, span
+
+# upper bound on in-flight LLM calls across the whole process
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+_concurrency = threading.BoundedSemaphore(MAX_CONCURRENCY)
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+_usage = {}
+_usage_lock = threading.Lock()
+
+
+class LLMError(Exception):
+    """Raised when an LLM backend fails to produce a response."""
+
+
+class LLMRateLimitError(LLMError):
+    """Raised when an LLM backend answers with HTTP 429."""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class LLMCancelled(LLMError):
+    """Raised when a call is cancelled while waiting for a concurrency slot."""
+
+
+class LLMResponse:
+    """Text of one LLM reply plus the usage metadata reported by the backend."""
+
+    def __init__(self, text, prompt_tokens=None, output_tokens=None):
+        self.text = text
+        self.prompt_tokens = prompt_tokens
+        self.output_tokens = output_tokens
+
+
+def strip_code_fence(text):
+    """
+    Strips surrounding whitespace and a Markdown code fence (```json, ```txt, ...).
+    Returns None for missing or empty text.
+    """
+    if text is None:
+        return None
+
+    text = text.strip()
+
+    if text.startswith("```"):
+        text = re.sub(r"^```[a-zA-Z]*", "", text).strip()
+        if text.endswith("```"):
+            text = text[:-3].strip()
+
+    return text or None
+
+
+def strip_code_fence_stream(chunks):
+    """
+    strip_code_fence() over streamed text: yields the text of `chunks` without
+    surrounding whitespace and Markdown code fence. Text that may still turn out
+    to be whitespace or a fence is held back until the next chunk decides, so
+    no empty chunk is ever yielded.
+    """
+    chunks = iter(chunks)
+    head = ""
+    for chunk in chunks:
+        head += chunk
+        text = head.lstrip()
+        if len(text) < 3 and "```".startswith(text):
+            continue  # nothing yet, or the start of a fence
+        if not text.startswith("```"):
+            fenced = False
+            break
+        text = re.sub(r"^```[a-zA-Z]*", "", text)
+        if text:  # the language tag is complete
+            fenced = True
+            break
+    else:
+        text = strip_code_fence(head)
+        if text:
+            yield text
+        return
+
+    # the closing fence and trailing whitespace are only known at the end
+    tail = re.compile(r"\s*`{0,3}\s*$" if fenced else r"\s*$")
+    started = False
+    pending = text
+    for chunk in chunks:
+        pending += chunk
+        if not started:
+            pending = pending.lstrip()
+        cut = tail.search(pending).start()
+        if cut:
+            yield pending[:cut]
+            started = True
+            pending = pending[cut:]
+
+    text = pending.strip()
+    if fenced and text.endswith("```"):
+        text = text[:-3].strip()
+    if text:
+        yield text
+
+
+class LLMProvider:
+    """
+    Interface shared by every LLM call site (parsers, Chatbot, LLMBasedQA).
+
+    generate() answers a single prompt, start_chat() opens a multi-turn session
+    whose send_message() returns an LLMResponse. generate_stream() and the chat's
+    send_message_stream() yield the answer as LLMResponse chunks (text deltas;
+    token counts on the chunks that report them) as soon as they arrive.
+    """
+
+    # multiplier applied to the rate-limit pauses of the call sites
+    throttle_scale = 1.0
+
+    def generate(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        raise NotImplementedError
+
+    def generate_stream(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        # backends without a streaming API answer in a single chunk
+        yield self.generate(model, contents, temperature, top_p, top_k)
+
+    def start_chat(
+        self,
+        model,
+        system_instruction,
+        history=None,
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+    ):
+        raise NotImplementedError
+
+    def throttle(self, seconds):
+        """Pauses between calls to stay under the backend's rate limit."""
+        if seconds * self.throttle_scale > 0:
+            time.sleep(seconds * self.throttle_scale)
+
+    def generate_json(self, model, contents, prompt_file=None):
+        """
+        generate() for prompts that must answer with JSON only.
+        Returns the parsed value; raises ValueError on a missing or malformed answer.
+        """
+        return _parse_json(self.generate(model, contents).text)
+
+
+def _parse_json(text):
+    if text is None:
+        raise ValueError("LLM response had no text content.")
+
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(
+            f"Failed to parse LLM JSON output: {e}\nRaw output:\n{text}"
+        ) from e
+
+
+def _gemini_text(response):
+    try:
+        return response.text
+    except AttributeError:
+        raw_parts = []
+        for cand in getattr(response, "candidates", []) or []:
+            for part in getattr(getattr(cand, "content", None), "parts", []) or []:
+                if hasattr(part, "text"):
+                    raw_parts.append(part.text)
+        return "".join(raw_parts)
+
+
+def _gemini_response(response, strip=True):
+    usage = getattr(response, "usage_metadata", None)
+    text = _gemini_text(response)
+    return LLMResponse(
+        strip_code_fence(text) if strip else text,
+        getattr(usage, "prompt_token_count", None),
+        getattr(usage, "candidates_token_count", None),
+    )
+
+
+class GeminiChat:
+    def __init__(self, chat):
+        self.chat = chat
+
+    def send_message(self, message):
+        return _gemini_response(self.chat.send_message(message))
+
+    def send_message_stream(self, message):
+        for chunk in self.chat.send_message_stream(message):
+            yield _gemini_response(chunk, strip=False)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini through the google-genai SDK."""
+
+    def __init__(self, api_key):
+        self.client = genai.Client(api_key=api_key)
+
+    def generate(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        response = self.client.models.generate_content(
+            model=model,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+            ),
+        )
+        return _gemini_response(response)
+
+    def generate_stream(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        stream = self.client.models.generate_content_stream(
+            model=model,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+            ),
+        )
+        for chunk in stream:
+            yield _gemini_response(chunk, strip=False)
+
+    def start_chat(
+        self,
+        model,
+        system_instruction,
+        history=None,
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+    ):
+        chat = self.client.chats.create(
+            model=model,
+            config=types.GenerateContentConfig(
+                system_instruction=system_instruction,
+                temperature=temperature,
+                top_p=top_p,
+                top_k=top_k,
+            ),
+            history=history,
+        )
+        return GeminiChat(chat)
+
+
+class LocalChat:
+    def __init__(self, provider, model, system_instruction, history, options):
+        self.provider = provider
+        self.model = model
+        self.system_instruction = system_instruction
+        self.history = list(history or [])
+        self.options = options
+
+    def send_message(self, message):
+        contents = self.history + [{"role": "user", "parts": [{"text": message}]}]
+        response = self.provider._post(
+            self.model, contents, self.system_instruction, self.options
+        )
+        self.history = contents + [
+            {"role": "model", "parts": [{"text": response.text or ""}]}
+        ]
+        return response
+
+    def send_message_stream(self, message):
+        contents = self.history + [{"role": "user", "parts": [{"text": message}]}]
+        text = []
+        for chunk in self.provider._post_stream(
+            self.model, contents, self.system_instruction, self.options
+        ):
+            text.append(chunk.text or "")
+            yield chunk
+        self.history = contents + [
+            {"role": "model", "parts": [{"text": "".join(text)}]}
+        ]
+
+
+class LocalProvider(LLMProvider):
+    """
+    Client for the deterministic stand-in server in src/local_llm_server.py,
+    for benchmarks and load tests without network access or an API key.
+    """
+
+    def __init__(self, url, timeout=60, throttle_scale=0.0, verify=True):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        self.throttle_scale = throttle_scale
+        self.verify = verify
+
+        # keep-alive connections, reused by every call through this provider
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_maxsize=MAX_CONCURRENCY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, model, contents, system_instruction, options, stream=False):
+        response = self.session.post(
+            self.url + "/generate",
+            json={
+                "model": model,
+                "contents": contents,
+                "system_instruction": system_instruction,
+                "stream": stream,
+                **options,
+            },
+            timeout=self.timeout,
+            verify=self.verify,
+            stream=stream,
+        )
+
+        if response.status_code == 429:
+            raise LLMRateLimitError(
+                "Local LLM server is rate limiting requests.",
+                retry_after=response.headers.get("Retry-After"),
+            )
+        if response.status_code != 200:
+            raise LLMError(f"Local LLM server returned HTTP {response.status_code}.")
+
+        return response
+
+    def _post(self, model, contents, system_instruction, options):
+        data = self._request(model, contents, system_instruction, options).json()
+        return LLMResponse(
+            strip_code_fence(data.get("text")),
+            data.get("prompt_tokens"),
+            data.get("output_tokens"),
+        )
+
+    def _post_stream(self, model, contents, system_instruction, options):
+        # one JSON object per line: text deltas, token counts on the last line
+        response = self._request(
+            model, contents, system_instruction, options, stream=True
+        )
+        with response:
+            for line in response.iter_lines():
+                if line:
+                    data = json.loads(line)
+                    yield LLMResponse(
+                        data.get("text", ""),
+                        data.get("prompt_tokens"),
+                        data.get("output_tokens"),
+                    )
+
+    def generate(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        return self._post(
+            model,
+            [{"role": "user", "parts": [{"text": contents}]}],
+            None,
+            {"temperature": temperature, "top_p": top_p, "top_k": top_k},
+        )
+
+    def generate_stream(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        yield from self._post_stream(
+            model,
+            [{"role": "user", "parts": [{"text": contents}]}],
+            None,
+            {"temperature": temperature, "top_p": top_p, "top_k": top_k},
+        )
+
+    def start_chat(
+        self,
+        model,
+        system_instruction,
+        history=None,
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+    ):
+        return LocalChat(
+            self,
+            model,
+            system_instruction,
+            history,
+            {"temperature": temperature, "top_p": top_p, "top_k": top_k},
+        )
+
+
+class SharedChat:
+    def __init__(self, provider, chat):
+        self.provider = provider
+        self.chat = chat
+
+    def send_message(self, message):
+        return self.provider._call(self.chat.send_message, message)
+
+    def send_message_stream(self, message):
+        return self.provider._stream(self.chat.send_message_stream, message)
+
+
+class SharedProvider(LLMProvider):
+    """
+    Per-caller handle on a process-wide provider: all handles share one client
+    (and its keep-alive connections), a global concurrency limit, and report
+    their calls into the per-caller usage table (see get_usage()).
+
+    generate_json() calls that name their prompt file are answered from the
+    response cache (src/llm_cache.py) when possible; the throttle() pause that
+    follows a cached answer is skipped since no request was made.
+
+    A handle whose `cancelled` event is set (a parse job's cancellation token)
+    raises LLMCancelled instead of waiting for a slot, and cuts throttle() short.
+    """
+
+    def __init__(self, provider, caller, cache=None):
+        self.provider = provider
+        self.caller = caller
+        self.cache = cache
+        self.throttle_scale = provider.throttle_scale
+        self.served_from_cache = False
+        self.cancelled = None
+
+    def _acquire(self):
+        if self.cancelled is None:
+            _concurrency.acquire()
+            return
+
+        while not _concurrency.acquire(timeout=0.05):
+            if self.cancelled.is_set():
+                break
+        else:
+            if not self.cancelled.is_set():
+                return
+            _concurrency.release()
+
+        _record_cancelled(self.caller)
+        raise LLMCancelled("LLM call cancelled before it was sent.")
+
+    def _call(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        self._acquire()
+        try:
+            acquired = time.perf_counter()
+            try:
+                response = fn(*args, **kwargs)
+            except Exception as e:
+                _record_usage(
+                    self.caller,
+                    None,
+                    acquired - start,
+                    time.perf_counter() - acquired,
+                    failed=True,
+                    prompt_chars=_prompt_chars(args),
+                    error=type(e).__name__,
+                )
+                raise
+        finally:
+            _concurrency.release()
+        _record_usage(
+            self.caller,
+            response,
+            acquired - start,
+            time.perf_counter() - acquired,
+            prompt_chars=_prompt_chars(args),
+        )
+        return response
+
+    def _stream(self, fn, *args):
+        """
+        Like _call() for streamed answers; time to first token is recorded apart.
+        The slot is held until the stream ends or its consumer closes (or drops)
+        the generator, which also closes the backend's stream.
+        """
+        start = time.perf_counter()
+        self._acquire()
+        acquired = time.perf_counter()
+        usage = LLMResponse(None)
+        ttft = None
+        failed = False
+        stream = fn(*args)
+        try:
+            for chunk in stream:
+                if ttft is None and chunk.text:
+                    ttft = time.perf_counter() - acquired
+                # backends report running totals, the last value wins
+                usage.prompt_tokens = chunk.prompt_tokens or usage.prompt_tokens
+                usage.output_tokens = chunk.output_tokens or usage.output_tokens
+                yield chunk
+        except Exception:
+            failed = True
+            raise
+        finally:
+            try:
+                if hasattr(stream, "close"):
+                    stream.close()
+            finally:
+                _concurrency.release()
+            _record_usage(
+                self.caller,
+                usage,
+                acquired - start,
+                time.perf_counter() - acquired,
+                failed=failed,
+                ttft=ttft,
+                prompt_chars=_prompt_chars(args),
+            )
+
+    def generate(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        self.served_from_cache = False
+        return self._call(
+            self.provider.generate, model, contents, temperature, top_p, top_k
+        )
+
+    def generate_stream(self, model, contents, temperature=0.2, top_p=0.8, top_k=40):
+        self.served_from_cache = False
+        return self._stream(
+            self.provider.generate_stream, model, contents, temperature, top_p, top_k
+        )
+
+    def generate_json(self, model, contents, prompt_file=None):
+        if self.cache is None or prompt_file is None:
+            return super().generate_json(model, contents)
+
+        text = self.cache.get(model, prompt_file, contents)
+        if text is not None:
+            _record_cache_hit(self.caller)
+            tracing.event("llm_cache_hit", caller=self.caller, prompt=prompt_file)
+            self.served_from_cache = True
+            return json.loads(text)
+
+        text = self.generate(model, contents).text
+        parsed = _parse_json(text)  # only well-formed answers are cached
+        self.cache.put(model, prompt_file, contents, text)
+        return parsed
+
+    def throttle(self, seconds):
+        if self.served_from_cache or seconds * self.throttle_scale <= 0:
+            return
+        start = time.perf_counter()
+        with span("llm_throttle") as pause:
+            pause.set(seconds=round(seconds * self.throttle_scale, 3))
+            if self.cancelled is not None:
+                self.cancelled.wait(seconds * self.throttle_scale)
+            else:
+                super().throttle(seconds)
+        _record_sleep(self.caller, time.perf_counter() - start)
+
+    def start_chat(
+        self,
+        model,
+        system_instruction,
+        history=None,
+        temperature=0.2,
+        top_p=0.8,
+        top_k=40,
+    ):
+        chat = self.provider.start_chat(
+            model, system_instruction, history, temperature, top_p, top_k
+        )
+        return SharedChat(self, chat)
+
+
+def _usage_stats(caller):
+    return _usage.setdefault(
+        caller,
+        {
+            "calls": 0,
+            "failures": 0,
+            "cache_hits": 0,
+            "prompt_tokens": 0,
+            "output_tokens": 0,
+            "latency_s": 0.0,
+            "wait_s": 0.0,
+            "streamed": 0,
+            "ttft_s": 0.0,
+            "cancelled": 0,
+            "sleep_s": 0.0,
+        },
+    )
+
+
+def _record_cache_hit(caller):
+    with _usage_lock:
+        _usage_stats(caller)["cache_hits"] += 1
+    llm_ledger.record(caller, cache_hits=1)
+
+
+def _record_cancelled(caller):
+    with _usage_lock:
+        _usage_stats(caller)["cancelled"] += 1
+    llm_ledger.record(caller, cancelled=1)
+
+
+def _record_sleep(caller, seconds):
+    with _usage_lock:
+        _usage_stats(caller)["sleep_s"] += seconds
+    llm_ledger.record(caller, sleep_s=seconds)
+
+
+def _prompt_chars(args):
+    return sum(len(arg) for arg in args if isinstance(arg, str))
+
+
+def _record_usage(
+    caller,
+    response,
+    wait,
+    latency,
+    failed=False,
+    ttft=None,
+    prompt_chars=None,
+    error=None,
+):
+    with _usage_lock:
+        stats = _usage_stats(caller)
+        stats["calls"] += 1
+        stats["failures"] += int(failed)
+        stats["wait_s"] += wait
+        stats["latency_s"] += latency
+        if ttft is not None:
+            stats["streamed"] += 1
+            stats["ttft_s"] += ttft
+        if response is not None:
+            stats["prompt_tokens"] += response.prompt_tokens or 0
+            stats["output_tokens"] += response.output_tokens or 0
+
+    llm_ledger.record(
+        caller,
+        calls=1,
+        failures=int(failed),
+        prompt_tokens=(response and response.prompt_tokens) or 0,
+        output_tokens=(response and response.output_tokens) or 0,
+        latency_s=latency,
+        wait_s=wait,
+    )
+
+    # in a trace, the wait is an attribute of the call's span
+    observe("llm_wait", wait, traced=False)
+    if not tracing.active():
+        observe(f"llm.{caller}", latency)
+    else:
+        attrs = {"prompt_chars": prompt_chars, "wait_s": round(wait, 6)}
+        if response is not None:
+            attrs.update(
+                prompt_tokens=response.prompt_tokens,
+                output_tokens=response.output_tokens,
+            )
+        if failed:
+            attrs.update(failed=True, error=error)
+        if ttft is not None:
+            attrs["ttft_s"] = round(ttft, 6)
+        observe(f"llm.{caller}", latency, **attrs)
+    if ttft is not None:
+        observe(f"llm_ttft.{caller}", ttft, traced=False)
+
+
+def get_usage():
+    """Per-caller LLM usage since start-up (or the last reset_usage())."""
+    with _usage_lock:
+        return {caller: dict(stats) for caller, stats in _usage.items()}
+
+
+def reset_usage():
+    with _usage_lock:
+        _usage.clear()
+
+
+def default_escalation_threshold():
+    """
+    Confidence below which the hybrid parsers send an item to the LLM
+    (LLM_ESCALATION_THRESHOLD, default 0.7): 0 never escalates, above 1 always does.
+    """
+    return float(os.getenv("LLM_ESCALATION_THRESHOLD", "0.7"))
+
+
+def _build_provider():
+    name = os.getenv("LLM_PROVIDER", "gemini").lower()
+
+    if name == "local":
+        url = os.getenv("LOCAL_LLM_URL", "http://127.0.0.1:8765")
+        return (name, url), lambda: LocalProvider(
+            url,
+            throttle_scale=float(os.getenv("LOCAL_LLM_THROTTLE_SCALE", "0")),
+            verify=os.getenv("LOCAL_LLM_CA_BUNDLE") or True,
+        )
+
+    if name != "gemini":
+        raise ValueError(f"Unknown LLM_PROVIDER: {name}. Use 'gemini' or 'local'.")
+
+    api_key = os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise ValueError("GEMINI_API_KEY not found. Please set it in your .env file.")
+
+    return (name, api_key), lambda: GeminiProvider(api_key)
+
+
+def get_provider(caller="default"):
+    """
+    Returns a handle on the process-wide LLM provider selected by the
+    LLM_PROVIDER environment variable (read from apikey.env as well):
+        - "gemini" (default): needs GEMINI_API_KEY.
+        - "local": the stand-in server at LOCAL_LLM_URL (default http://127.0.0.1:8765).
+    The underlying client is created once per backend and shared by every caller;
+    `caller` only names the usage-accounting bucket. Parser prompts go through
+    the response cache unless LLM_CACHE=0 (see src/llm_cache.py).
+    """
+    load_dotenv(Path(__file__).resolve().parent.parent / "apikey.env")
+
+    key, factory = _build_provider()
+    with _providers_lock:
+        if key not in _providers:
+            _providers[key] = factory()
+        provider = _providers[key]
+
+    return SharedProvider(provider, caller, get_cache())
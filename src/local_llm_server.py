@@ -0,0 +1,327 @@
+import argparse
+import json
+import random
+import re
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+TOOL_WORDS = [
+    "baking sheet",
+    "baking dish",
+    "skillet",
+    "saucepan",
+    "pan",
+    "pot",
+    "bowl",
+    "oven",
+    "whisk",
+    "spatula",
+    "knife",
+    "thermometer",
+]
+UNIT_WORDS = {
+    "cup",
+    "cups",
+    "teaspoon",
+    "teaspoons",
+    "tablespoon",
+    "tablespoons",
+    "pound",
+    "pounds",
+    "ounce",
+    "ounces",
+    "pinch",
+    "clove",
+    "cloves",
+    "large",
+    "small",
+}
+
+
+def _input_json(prompt):
+    """Returns the INPUT JSON payload embedded in a parser prompt, or None."""
+    idx = prompt.find("INPUT JSON:")
+    if idx < 0:
+        return None
+    try:
+        payload, _ = json.JSONDecoder().raw_decode(
+            prompt[idx + len("INPUT JSON:") :].lstrip()
+        )
+        return payload
+    except ValueError:
+        return None
+
+
+def _ingredient_name(line):
+    line = re.sub(r"\([^)]*\)", "", line.split(",")[0])
+    words = [w for w in line.split() if w.isalpha() and w not in UNIT_WORDS]
+    return words[-1] if words else line.strip()
+
+
+def fake_completion(prompt):
+    """
+    Deterministic stand-in answer for the prompts used in src/: JSON arrays for
+    the ingredient / tool / method extractors, short plain text otherwise.
+    """
+    payload = _input_json(prompt)
+
+    if (
+        isinstance(payload, dict)
+        and "ingredients" in payload
+        and "user_query" not in payload
+    ):
+        lines = payload["ingredients"]
+        if "ingredient DESCRIPTOR extractor" in prompt:
+            return json.dumps([[] for _ in lines])
+        if "ingredient PREPARATION extractor" in prompt:
+            return json.dumps(
+                [
+                    [line.rsplit(",", 1)[1].strip()] if "," in line else []
+                    for line in lines
+                ]
+            )
+        return json.dumps([_ingredient_name(line) for line in lines])
+
+    if isinstance(payload, dict) and "step" in payload:
+        step = payload["step"].lower()
+        if "COOKING TOOLS" in prompt:
+            found = []
+            for tool in TOOL_WORDS:
+                if tool in step and not any(tool in f for f in found):
+                    found.append(tool)
+            return json.dumps(found)
+        words = step.split()
+        return json.dumps(words[:1] if words and words[0].isalpha() else [])
+
+    question = payload.get("user_query") if isinstance(payload, dict) else None
+    if question is None:
+        question = prompt.strip().splitlines()[-1] if prompt.strip() else ""
+    return "This is a local test answer about: " + " ".join(question.split()[:12])
+
+
+class LocalLLMServer:
+    """
+    Deterministic HTTP stand-in for an LLM API with configurable latency,
+    error rate and 429 injection. Serves POST /generate, GET /health and GET /stats.
+    Connections are kept alive (HTTP/1.1); with certfile/keyfile it serves HTTPS
+    and stats["connections"] counts TLS handshakes.
+
+    With "stream": true, /generate answers with chunked newline-delimited JSON,
+    one word per line: `latency` is the time to the first word and
+    `token_latency` the pause between words.
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=8765,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        rate_limit_rate=0.0,
+        retry_after=1,
+        seed=0,
+        certfile=None,
+        keyfile=None,
+        token_latency=0.0,
+    ):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {
+            "connections": 0,
+            "requests": 0,
+            "errors": 0,
+            "rate_limited": 0,
+            "prompt_tokens": 0,
+        }
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def setup(self):
+                super().setup()
+                with server.lock:
+                    server.stats["connections"] += 1
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, headers=None):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _write_chunk(self, body):
+                data = json.dumps(body).encode("utf-8") + b"\n"
+                self.wfile.write(b"%X\r\n%s\r\n" % (len(data), data))
+
+            def _send_stream(self, body):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+
+                for i, word in enumerate(re.findall(r"\S+\s*", body["text"])):
+                    if i > 0:
+                        time.sleep(server.token_latency)
+                    self._write_chunk({"text": word})
+                self._write_chunk(
+                    {
+                        "text": "",
+                        "prompt_tokens": body["prompt_tokens"],
+                        "output_tokens": body["output_tokens"],
+                    }
+                )
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                if self.path == "/health":
+                    self._send(200, {"status": "ok"})
+                elif self.path == "/stats":
+                    with server.lock:
+                        self._send(200, dict(server.stats))
+                else:
+                    self._send(404, {"error": "not found"})
+
+            def do_POST(self):
+                if self.path != "/generate":
+                    self._send(404, {"error": "not found"})
+                    return
+
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length) or b"{}")
+                status, body, headers = server.handle(request)
+                if status == 200 and request.get("stream"):
+                    self._send_stream(body)
+                else:
+                    self._send(status, body, headers)
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+        self.scheme = "http"
+        if certfile:
+            context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            context.load_cert_chain(certfile, keyfile)
+            self.httpd.socket = context.wrap_socket(self.httpd.socket, server_side=True)
+            self.scheme = "https"
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"{self.scheme}://{host}:{port}"
+
+    def handle(self, request):
+        """Produces (status, body, headers) for one /generate request."""
+        with self.lock:
+            self.stats["requests"] += 1
+            delay = self.latency + self.rng.uniform(0, self.jitter)
+            roll = self.rng.random()
+
+        time.sleep(delay)
+
+        if roll < self.rate_limit_rate:
+            with self.lock:
+                self.stats["rate_limited"] += 1
+            return (
+                429,
+                {"error": "rate limited"},
+                {"Retry-After": str(self.retry_after)},
+            )
+
+        if roll < self.rate_limit_rate + self.error_rate:
+            with self.lock:
+                self.stats["errors"] += 1
+            return 500, {"error": "injected failure"}, None
+
+        texts = [request.get("system_instruction") or ""]
+        for content in request.get("contents", []):
+            texts.extend(part.get("text", "") for part in content.get("parts", []))
+        prompt_tokens = sum(len(t) for t in texts) // 4 + 1
+
+        last = (
+            request["contents"][-1]["parts"][-1]["text"]
+            if request.get("contents")
+            else ""
+        )
+        text = fake_completion(last)
+
+        with self.lock:
+            self.stats["prompt_tokens"] += prompt_tokens
+
+        return (
+            200,
+            {
+                "text": text,
+                "prompt_tokens": prompt_tokens,
+                "output_tokens": len(text) // 4 + 1,
+            },
+            None,
+        )
+
+    def start(self):
+        """Serves requests on a background thread."""
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deterministic local LLM stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds per call")
+    parser.add_argument(
+        "--jitter", type=float, default=0.0, help="extra random seconds"
+    )
+    parser.add_argument(
+        "--token-latency", type=float, default=0.0, help="seconds per streamed word"
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--certfile", help="serve HTTPS with this certificate")
+    parser.add_argument("--keyfile")
+    args = parser.parse_args()
+
+    local_server = LocalLLMServer(
+        args.host,
+        args.port,
+        args.latency,
+        args.jitter,
+        args.error_rate,
+        args.rate_limit_rate,
+        args.retry_after,
+        args.seed,
+        args.certfile,
+        args.keyfile,
+        args.token_latency,
+    )
+    print(f"Local LLM server on {local_server.url} (Ctrl+C to stop)")
+    try:
+        local_server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        local_server.httpd.server_close()
@@ -1,41 +1,45 @@
 import json
-import spacy
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import os
-import re
+from src.deadline import Deadline
+from src.llm_provider import default_escalation_threshold, get_provider
+from src.resources import get_nlp, load_helper_json
 
 
 class MethodsParser:
     def __init__(
-        self, directions, mode="classical", model_name="gemini-2.5-flash-lite"
+        self,
+        directions,
+        mode="classical",
+        model_name="gemini-2.5-flash-lite",
+        escalation_threshold=None,
+        deadline=None,
     ):
         self.mode = mode
         self.model_name = model_name
 
+        # extract_methods_hybrid only asks the LLM when the classical score is below this
+        self.escalation_threshold = (
+            default_escalation_threshold()
+            if escalation_threshold is None
+            else escalation_threshold
+        )
+        self.escalations = {"items": 0, "escalated": 0}
+        self.last_escalated = False
+        # LLM calls the remaining time budget can't cover are left classical
+        self.deadline = deadline or Deadline()
+
         self.directions = directions["directions"]
-        self.nlp = spacy.load("en_core_web_sm")
+        self.nlp = get_nlp()
         self.directions_split = self.split_directions_into_steps()
         # Load method keywords from JSON file
-        self.path = Path(__file__).resolve().parent / "helper_files"
-        method_keywords_path = self.path / "method_keywords.json"
-        with open(method_keywords_path, "r") as f:
-            data = json.load(f)
+        data = load_helper_json("method_keywords.json")
 
         self.method_keywords = data.get("method_keywords")
 
         if self.mode != "classical":
             self.path = Path(__file__).resolve().parent.parent
-            load_dotenv(self.path / "apikey.env")
-            self.api_key = os.getenv("GEMINI_API_KEY")
-            if not self.api_key:
-                raise ValueError(
-                    "GEMINI_API_KEY not found. Please set it in your .env file."
-                )
-
-            self.client = genai.Client(api_key=self.api_key)
+            self.provider = get_provider("methods_parser")
+            self.provider.cancelled = self.deadline.cancelled
 
             with open(self.path / "src" / "prompts" / "methods_prompt.txt", "r") as f:
                 self.methods_prompt = f.read()
@@ -68,8 +72,21 @@ class MethodsParser:
         Returns:
             list: A list of extracted methods found in the step.
         """
+        return self.extract_methods_scored(step)[0]
+
+    def extract_methods_scored(self, step):
+        """extract_methods() plus a confidence score for its result, from 0 to 1.
+        The score drops when no method is found, when verbs are dropped by the
+        method keyword whitelist, when the first-token fallback is used, and when
+        the step starts with a method keyword that was not tagged as a verb.
+        Args:
+            step (str): A single step from the recipe directions.
+        Returns:
+            tuple: The extract_methods() result and its confidence.
+        """
         doc = self.nlp(step)
         methods = []
+        used_fallback = False
 
         # prefer ROOT verb, then first-token verb, then any other verb in sentence
         for tok in doc:
@@ -136,9 +153,11 @@ class MethodsParser:
             and (doc[0].pos_ == "VERB" or doc[0].tag_.startswith("VB"))
         ):
             methods.append(doc[0].lemma_.lower())
+            used_fallback = True
 
         # keep order, unique
         methods = list(dict.fromkeys(methods))
+        candidates = len(methods)
 
         # apply whitelist filter if provided
         if self.method_keywords:
@@ -148,7 +167,18 @@ class MethodsParser:
                 if any(m == k or m.startswith(k + " ") for k in self.method_keywords)
             ]
 
-        return methods
+        score = 1.0
+        if not methods:
+            score -= 0.4 if candidates else 0.3
+        score -= 0.15 * min(candidates - len(methods), 2)
+        if used_fallback:
+            score -= 0.2
+        # an imperative tagged as a noun ("Brown", "Season") is easy to misread
+        if len(doc) and not (doc[0].pos_ == "VERB" or doc[0].tag_.startswith("VB")):
+            if doc[0].lemma_.lower() in self.method_keywords:
+                score -= 0.3
+
+        return methods, round(max(score, 0.0), 2)
 
     def _message_formatting(self, context: str) -> str:
         return "=== Context ===\n" f"{context}\n\n" "=== Context ===\n\n" "Output:"
@@ -165,39 +195,11 @@ class MethodsParser:
 
         contents = self._message_formatting(full_prompt)
 
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                top_p=0.8,
-                top_k=40,
-            ),
-        )
-
         try:
-            raw = response.text
-        except AttributeError:
-            raw_parts = []
-            for cand in getattr(response, "candidates", []) or []:
-                for part in getattr(cand, "content", {}).parts or []:
-                    if hasattr(part, "text"):
-                        raw_parts.append(part.text)
-            raw = "".join(raw_parts)
-
-        if raw is None:
-            return self.extract_methods(step)
-
-        text = raw.strip()
-
-        if text.startswith("```"):
-            text = re.sub(r"^```(?:json)?", "", text, flags=re.IGNORECASE).strip()
-            if text.endswith("```"):
-                text = text[:-3].strip()
-
-        try:
-            parsed = json.loads(text)
-        except json.JSONDecodeError:
+            parsed = self.provider.generate_json(
+                self.model_name, contents, "methods_prompt.txt"
+            )
+        except ValueError:
             return self.extract_methods(step)
 
         if not isinstance(parsed, list):
@@ -212,6 +214,29 @@ class MethodsParser:
 
         return methods
 
+    def extract_methods_hybrid(self, step):
+        """Classical extraction, escalated to extract_methods_llm() only when its
+        confidence is below self.escalation_threshold and self.deadline leaves
+        time for the call.
+        Args:
+            step (str): A single step from the recipe directions.
+        Returns:
+            list: A list of extracted methods found in the step.
+        """
+        methods, confidence = self.extract_methods_scored(step)
+        self.escalations["items"] += 1
+        self.last_escalated = confidence < self.escalation_threshold
+        if not self.last_escalated:
+            return methods
+        if not self.deadline.can_afford():
+            self.last_escalated = False
+            self.deadline.degrade("step_methods")
+            return methods
+
+        self.escalations["escalated"] += 1
+        with self.deadline.llm_call():
+            return self.extract_methods_llm(step)
+
     def parse(self, flag_llm=False):
         """
         Parse cooking directions and extract cooking methods from each step.
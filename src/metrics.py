@@ -0,0 +1,226 @@
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator
+
+from src import tracing
+
+# METRICS=0 turns the spans into no-ops (and timed() into the plain function),
+# which also leaves them out of traces (see tracing.py)
+ENABLED = os.getenv("METRICS", "1") != "0"
+
+# histogram bucket upper bounds, in seconds
+BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+# per-stage totals of the request being timed in this context (collect())
+_breakdown = contextvars.ContextVar("breakdown", default=None)
+
+
+class Histogram:
+    """Latency histogram of one stage: counts per bucket, plus count and sum."""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)  # the last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+
+def observe(
+    stage: str, seconds: float, start: float = None, traced: bool = True, **attrs
+):
+    """Record one duration of `stage` (for times measured by the caller).
+
+    In a traced request it is also added to the trace, as a span without
+    children.
+
+    Args:
+        stage: Stage name, e.g. "llm.ingredients_parser"
+        seconds: Duration
+        start: perf_counter() at its start (default: `seconds` ago)
+        traced: False to leave it out of the trace
+        **attrs: Attributes of the trace span
+    """
+    if not ENABLED:
+        return
+    if traced:
+        tracing.record(stage, seconds, start, **attrs)
+    _observe(stage, seconds)
+
+
+def _observe(stage, seconds):
+    with _histograms_lock:
+        histogram = _histograms.get(stage)
+        if histogram is None:
+            histogram = _histograms[stage] = Histogram()
+        histogram.observe(seconds)
+
+    breakdown = _breakdown.get()
+    if breakdown is not None:
+        totals = breakdown.setdefault(stage, [0, 0.0])
+        totals[0] += 1
+        totals[1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start", "traced")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.traced = tracing.start_span(self.stage)
+        self.start = time.perf_counter()
+        return self
+
+    def set(self, **attrs):
+        """Sets attributes of the span's trace span, if the request is traced."""
+        if self.traced is not None:
+            self.traced[0].set(**attrs)
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.start
+        if self.traced is not None:
+            tracing.end_span(self.traced)
+        _observe(self.stage, seconds)
+        return False
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def set(self, **attrs):
+        pass
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(stage: str):
+    """Context manager timing its block as one observation of `stage`.
+
+    In a traced request the block is a span of the trace, and the spans
+    opened inside it are its children; `with span(...) as s: s.set(...)`
+    adds attributes to it.
+
+    Args:
+        stage: Stage name, e.g. "steps.split"
+
+    Returns:
+        The span (a shared no-op when metrics are off)
+    """
+    if not ENABLED:
+        return _NULL_SPAN
+    return _Span(stage)
+
+
+def timed(stage: str) -> Callable:
+    """Decorator timing every call of the function as `stage`."""
+
+    def decorator(fn):
+        if not ENABLED:
+            return fn
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _Span(stage):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, list]]:
+    """Collects the stages observed in this context (thread) during the block.
+
+    Yields:
+        stage -> [count, total seconds], filled as the block runs; stays empty
+        when metrics are off
+    """
+    breakdown = {}
+    token = _breakdown.set(breakdown)
+    try:
+        yield breakdown
+    finally:
+        _breakdown.reset(token)
+
+
+def breakdown_ms(breakdown: Dict[str, list]) -> Dict[str, Dict]:
+    """A collect() result as {stage: {"count", "total_ms"}}."""
+    return {
+        stage: {"count": count, "total_ms": round(total * 1e3, 3)}
+        for stage, (count, total) in breakdown.items()
+    }
+
+
+def snapshot() -> Dict[str, Dict]:
+    """Per-stage count, sum (seconds) and count per bucket (the last one is +Inf)."""
+    with _histograms_lock:
+        return {
+            stage: {
+                "count": histogram.count,
+                "sum": histogram.sum,
+                "buckets": list(histogram.buckets),
+            }
+            for stage, histogram in _histograms.items()
+        }
+
+
+def reset():
+    with _histograms_lock:
+        _histograms.clear()
+
+
+def render_prometheus() -> str:
+    """The stage histograms in the Prometheus text exposition format."""
+    name = "recipe_parser_stage_seconds"
+    lines = [
+        f"# HELP {name} Time spent in each instrumented stage.",
+        f"# TYPE {name} histogram",
+    ]
+    for stage, stats in sorted(snapshot().items()):
+        label = stage.replace("\\", "\\\\").replace('"', '\\"')
+        cumulative = 0
+        for bound, count in zip(BUCKETS, stats["buckets"]):
+            cumulative += count
+            lines.append(f'{name}_bucket{{stage="{label}",le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{stage="{label}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'{name}_sum{{stage="{label}"}} {stats["sum"]:.6f}')
+        lines.append(f'{name}_count{{stage="{label}"}} {stats["count"]}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,213 @@
+import os
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor, TimeoutError
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+
+class RateBudget:
+    """Token bucket shared by all prefetches: `rate_per_minute` calls, bursts of `burst`."""
+
+    def __init__(self, rate_per_minute: float, burst: int):
+        self.rate = rate_per_minute / 60.0
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self) -> bool:
+        """Take one call from the budget without waiting.
+
+        Returns:
+            False if the budget is currently spent
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.burst, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class _Job:
+    def __init__(self):
+        self.cancelled = threading.Event()
+        self.started = None  # set once a pool thread picks the job up
+        self.latency = None
+        self.future = None
+
+
+class AnswerPrefetcher:
+    """Speculative answers for one chat session, keyed by (step index, intent).
+
+    Jobs run on a small process-wide thread pool within a process-wide rate
+    budget. Finished answers stay cached for the session; jobs for steps the
+    user navigated away from are cancelled. A question never waits for a job
+    still queued behind other sessions' jobs, and waits at most `wait_timeout`
+    seconds for a running one.
+    """
+
+    # shared by every session of the process
+    executor = ThreadPoolExecutor(
+        max_workers=int(os.getenv("PREFETCH_WORKERS", "2")),
+        thread_name_prefix="prefetch",
+    )
+    budget = RateBudget(
+        rate_per_minute=float(os.getenv("PREFETCH_RATE_PER_MIN", "30")),
+        burst=int(os.getenv("PREFETCH_BURST", "6")),
+    )
+    wait_timeout = float(os.getenv("PREFETCH_WAIT_S", "5"))
+
+    def __init__(
+        self,
+        answer_fn: Callable[[int, str, threading.Event], Optional[str]],
+        budget: Optional[RateBudget] = None,
+    ):
+        """Initialize an empty per-session prefetcher.
+
+        Args:
+            answer_fn: (step index, intent, cancelled event) -> answer or None;
+                should return early once the event is set
+            budget: Rate budget to draw from (defaults to the shared one)
+        """
+        self.answer_fn = answer_fn
+        if budget is not None:
+            self.budget = budget
+
+        self.lock = threading.Lock()
+        self.jobs: Dict[Tuple[int, str], _Job] = {}
+        self.answers: Dict[Tuple[int, str], Tuple[str, float]] = {}
+        self.stats = {
+            "scheduled": 0,
+            "completed": 0,
+            "cancelled": 0,
+            "skipped_budget": 0,
+            "hits": 0,
+            "in_flight_hits": 0,
+            "misses": 0,
+            "latency_saved_s": 0.0,
+        }
+
+    def schedule(self, steps: Iterable[int], intents: Iterable[str]):
+        """Start prefetches for the given steps and cancel those for other steps.
+
+        Args:
+            steps: Step indexes to prefetch, most important first
+            intents: Intents to prefetch for every step
+        """
+        steps = list(steps)
+        intents = list(intents)
+
+        with self.lock:
+            for key, job in list(self.jobs.items()):
+                if key[0] not in steps:
+                    self._cancel(key, job)
+
+            for step in steps:
+                for intent in intents:
+                    key = (step, intent)
+                    if key in self.answers or key in self.jobs:
+                        continue
+                    if not self.budget.try_acquire():
+                        self.stats["skipped_budget"] += 1
+                        continue
+
+                    job = _Job()
+                    self.jobs[key] = job
+                    self.stats["scheduled"] += 1
+                    job.future = self.executor.submit(self._run, key, job)
+
+    def _cancel(self, key, job):
+        job.cancelled.set()
+        job.future.cancel()
+        del self.jobs[key]
+        self.stats["cancelled"] += 1
+
+    def _run(self, key, job):
+        if job.cancelled.is_set():
+            return None
+
+        job.started = time.perf_counter()
+        try:
+            answer = self.answer_fn(key[0], key[1], job.cancelled)
+        except Exception:
+            answer = None
+        job.latency = time.perf_counter() - job.started
+
+        with self.lock:
+            if self.jobs.get(key) is job:
+                del self.jobs[key]
+                if answer and not job.cancelled.is_set():
+                    self.answers[key] = (answer, job.latency)
+                    self.stats["completed"] += 1
+        return answer
+
+    def get(self, step: int, intent: str) -> Optional[str]:
+        """Prefetched answer for (step, intent), waiting for a running job.
+
+        A job still queued is cancelled, and one running longer than
+        `wait_timeout` is given up: the caller answers directly instead.
+
+        Args:
+            step: Current step index
+            intent: Question intent
+
+        Returns:
+            The answer, or None if nothing was prefetched in time
+        """
+        key = (step, intent)
+        with self.lock:
+            if key in self.answers:
+                answer, latency = self.answers[key]
+                self.stats["hits"] += 1
+                self.stats["latency_saved_s"] += latency
+                return answer
+            job = self.jobs.get(key)
+
+        if job is not None and job.future.cancel():
+            # not started yet: the direct call beats waiting for a free worker
+            with self.lock:
+                if self.jobs.get(key) is job:
+                    self._cancel(key, job)
+            job = None
+
+        if job is None:
+            with self.lock:
+                self.stats["misses"] += 1
+            return None
+
+        # the job started before the question arrived, so its head start is saved
+        started = job.started
+        head_start = time.perf_counter() - started if started is not None else 0.0
+        try:
+            answer = job.future.result(timeout=self.wait_timeout)
+        except CancelledError:
+            answer = None
+        except TimeoutError:
+            with self.lock:
+                if self.jobs.get(key) is job:
+                    self._cancel(key, job)
+            answer = None
+        with self.lock:
+            if answer:
+                self.stats["in_flight_hits"] += 1
+                self.stats["latency_saved_s"] += head_start
+            else:
+                self.stats["misses"] += 1
+        return answer
+
+    def cancel_all(self):
+        with self.lock:
+            for key, job in list(self.jobs.items()):
+                self._cancel(key, job)
+
+    def hit_rate(self) -> float:
+        """Share of eligible questions answered from a prefetch."""
+        hits = self.stats["hits"] + self.stats["in_flight_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
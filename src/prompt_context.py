@@ -0,0 +1,212 @@
+import json
+import re
+from typing import Any, Dict, List
+
+from src.conversation_history import estimate_tokens
+from src.token_index import TokenIndex
+
+STEP_FIELDS = ("description", "ingredients", "tools", "methods", "time", "temperature")
+INGREDIENT_FIELDS = ("ingredient_name", "ingredient_quantity", "measurement_unit")
+
+
+def compact_json(value: Any) -> str:
+    """JSON without indentation or spaces after separators.
+
+    Args:
+        value: Any JSON-serializable value
+
+    Returns:
+        The serialized value
+    """
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def compact_step(step: Dict[str, Any]) -> Dict[str, Any]:
+    """The prompt-relevant fields of a parsed step, without empty values.
+
+    Args:
+        step: Step dict produced by StepsParser.parse()
+
+    Returns:
+        Step dict with description, ingredients, tools, methods, time and temperature
+    """
+    return {key: step[key] for key in STEP_FIELDS if step.get(key)}
+
+
+def compact_ingredient(ingredient: Dict[str, Any]) -> Dict[str, Any]:
+    """Name, quantity and unit of a parsed ingredient, without empty values.
+
+    Args:
+        ingredient: Ingredient dict produced by IngredientsParser.parse()
+
+    Returns:
+        Ingredient dict with the fields the prompt describes
+    """
+    return {
+        key: ingredient[key]
+        for key in INGREDIENT_FIELDS
+        if ingredient.get(key) not in (None, "", [])
+    }
+
+
+class StepContextBuilder:
+    """Builds the INPUT JSON of the parameter / clarification / procedure prompt.
+
+    Instead of every step, ingredient and definition, the payload holds the
+    current step plus whatever fits the token budget, most relevant first:
+    definitions matching the question, definitions of the step's tools and
+    methods, the step's ingredients, then neighbouring steps together with
+    their ingredients, nearest first.
+    """
+
+    def __init__(
+        self,
+        usages: Dict[str, Dict[str, str]],
+        procedures: Dict[str, str],
+        usages_index: TokenIndex,
+        procedures_index: TokenIndex,
+        neighbours: int = 2,
+    ):
+        """Initialize the builder over the shared definition tables.
+
+        Args:
+            usages: Tool definitions (usages.json)
+            procedures: Procedure definitions (procedures.json)
+            usages_index: TokenIndex over usages
+            procedures_index: TokenIndex over procedures
+            neighbours: Max steps considered on each side of the current one
+        """
+        self.usages = usages
+        self.procedures = procedures
+        self.usages_index = usages_index
+        self.procedures_index = procedures_index
+        self.neighbours = neighbours
+
+    def build(
+        self,
+        question: str,
+        question_type: str,
+        steps: List[Dict[str, Any]],
+        current_step: int,
+        ingredients: List[Dict[str, Any]],
+        youtube_search_url: str,
+        token_budget: int = 800,
+    ) -> Dict[str, Any]:
+        """Select the prompt payload for one question.
+
+        Args:
+            question: Cleaned user question
+            question_type: "parameter", "clarification" or "procedure"
+            steps: Parsed steps of the recipe
+            current_step: Index of the current step in steps
+            ingredients: Parsed ingredients of the recipe
+            youtube_search_url: Search link the answer may point to
+            token_budget: Max estimated tokens of the serialized payload; the
+                current step is always included
+
+        Returns:
+            Payload dict; "steps" holds a contiguous slice of the recipe whose
+            first element is step number "step_offset" + 1
+        """
+        tokens = re.findall(r"[a-z]+", question.lower())
+        step = steps[current_step]
+
+        payload = {
+            "user_query": question,
+            "question_type": question_type,
+            "current_step_index": 0,
+            "step_offset": current_step,
+            "steps": [compact_step(step)],
+            "ingredients": [],
+            "tool_definitions": {},
+            "procedure_definitions": {},
+            "youtube_search_url": youtube_search_url,
+        }
+
+        for add in self._candidates(tokens, steps, current_step, ingredients):
+            candidate = add(payload)
+            if estimate_tokens(compact_json(candidate)) <= token_budget:
+                payload = candidate
+
+        return payload
+
+    def _candidates(self, tokens, steps, current_step, ingredients):
+        """Payload extensions in priority order, each a payload -> payload function."""
+        step = steps[current_step]
+
+        tools = [self.usages_index.best_match(tokens)]
+        procedures = [self.procedures_index.best_match(tokens)]
+        for tool in step.get("tools") or []:
+            tools.append(self.usages_index.best_match(tool.split()))
+        for method in step.get("methods") or []:
+            procedures.append(self.procedures_index.best_match(method.split()))
+
+        for tool in dict.fromkeys(t for t in tools if t is not None):
+            yield _with_entry("tool_definitions", tool, self.usages[tool])
+        for procedure in dict.fromkeys(p for p in procedures if p is not None):
+            yield _with_entry(
+                "procedure_definitions", procedure, self.procedures[procedure]
+            )
+
+        by_name = {ing["ingredient_name"]: ing for ing in ingredients}
+        query = set(tokens)
+        mentioned = [
+            name for name in by_name if name and set(name.lower().split()) <= query
+        ]
+        for name in dict.fromkeys(mentioned + list(step.get("ingredients") or [])):
+            if name in by_name:
+                yield _with_ingredient(compact_ingredient(by_name[name]))
+
+        for distance in range(1, self.neighbours + 1):
+            for idx in (current_step - distance, current_step + distance):
+                if 0 <= idx < len(steps):
+                    step_ingredients = [
+                        compact_ingredient(by_name[name])
+                        for name in steps[idx].get("ingredients") or []
+                        if name in by_name
+                    ]
+                    yield _with_step(idx, compact_step(steps[idx]), step_ingredients)
+
+
+def _with_entry(section: str, key: str, value: Any):
+    def add(payload):
+        return {**payload, section: {**payload[section], key: value}}
+
+    return add
+
+
+def _with_ingredient(ingredient: Dict[str, Any]):
+    def add(payload):
+        if ingredient in payload["ingredients"]:
+            return payload
+        return {**payload, "ingredients": payload["ingredients"] + [ingredient]}
+
+    return add
+
+
+def _with_step(idx: int, step: Dict[str, Any], ingredients: List[Dict[str, Any]]):
+    def add(payload):
+        first = payload["step_offset"]
+        last = first + len(payload["steps"]) - 1
+        ingredients_list = payload["ingredients"] + [
+            ing for ing in ingredients if ing not in payload["ingredients"]
+        ]
+
+        # keep the slice contiguous: only extend it by one step at either end
+        if idx == first - 1:
+            return {
+                **payload,
+                "steps": [step] + payload["steps"],
+                "step_offset": idx,
+                "current_step_index": payload["current_step_index"] + 1,
+                "ingredients": ingredients_list,
+            }
+        if idx == last + 1:
+            return {
+                **payload,
+                "steps": payload["steps"] + [step],
+                "ingredients": ingredients_list,
+            }
+        return payload
+
+    return add
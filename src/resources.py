@@ -0,0 +1,54 @@
+import json
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import spacy
+
+from src.metrics import span
+
+HELPER_FILES = Path(__file__).resolve().parent / "helper_files"
+SPACY_MODEL = "en_core_web_sm"
+
+_nlp = None
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """The process-wide spaCy pipeline, loaded on first use.
+
+    The parsers only run it over text, so every parser of every session shares
+    one copy (and a preforked server shares it across workers, see
+    backend/serve.py).
+
+    Returns:
+        The loaded en_core_web_sm pipeline
+    """
+    global _nlp
+    if _nlp is None:
+        with _nlp_lock:
+            if _nlp is None:
+                with span("spacy_load"):
+                    _nlp = spacy.load(SPACY_MODEL)
+    return _nlp
+
+
+@lru_cache(maxsize=None)
+def load_helper_json(name: str):
+    """A helper_files JSON file, read once per process; callers must not modify it.
+
+    Args:
+        name: File name, e.g. "units_map.json"
+
+    Returns:
+        The parsed JSON
+    """
+    with (HELPER_FILES / name).open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def preload():
+    """Loads the spaCy pipeline and every helper file into this process."""
+    get_nlp()
+    for path in sorted(HELPER_FILES.glob("*.json")):
+        load_helper_json(path.name)
@@ -4,9 +4,12 @@ import requests
 from bs4 import BeautifulSoup
 import html
 
+from src.metrics import timed
+
 SUPPORTED_WEBSITES = ["allrecipes.com", "epicurious.com", "bonappetit.com"]
 
 
+@timed("scrape")
 def get_recipe_data(url: str):
     """
     Extracts recipe data (title, ingredients, and directions) from a supported recipe URL.
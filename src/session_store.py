@@ -0,0 +1,193 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class SessionStore:
+    """Session records and parsed recipes, kept outside the bots that use them.
+
+    A session record is a JSON-serializable dict (mode, recipe_key, current_step,
+    LLM history, version); the recipe it points to is stored once under
+    recipe_key and shared by every session of that recipe. Any process using the
+    same store can rebuild a session's bot from the two.
+    """
+
+    def get(self, sid: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put(self, sid: str, record: Dict):
+        raise NotImplementedError
+
+    def delete(self, sid: str) -> bool:
+        raise NotImplementedError
+
+    def get_recipe(self, key: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def put_recipe(self, key: str, recipe: Dict):
+        raise NotImplementedError
+
+
+class MemorySessionStore(SessionStore):
+    """In-process store (the default); values are kept serialized, as a shared store would."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sessions: Dict[str, str] = {}
+        self.recipes: Dict[str, str] = {}
+
+    def get(self, sid):
+        with self.lock:
+            data = self.sessions.get(sid)
+        return None if data is None else json.loads(data)
+
+    def put(self, sid, record):
+        data = json.dumps(record)
+        with self.lock:
+            self.sessions[sid] = data
+
+    def delete(self, sid):
+        with self.lock:
+            return self.sessions.pop(sid, None) is not None
+
+    def get_recipe(self, key):
+        with self.lock:
+            data = self.recipes.get(key)
+        return None if data is None else json.loads(data)
+
+    def put_recipe(self, key, recipe):
+        data = json.dumps(recipe)
+        with self.lock:
+            self.recipes[key] = data
+
+
+class SQLiteSessionStore(SessionStore):
+    """Store in an SQLite file, shared by every process that opens the same path.
+
+    A local stand-in for a shared store (e.g. the workers of backend/serve.py);
+    each call uses its own connection, so it is safe across threads and forks.
+    """
+
+    def __init__(self, path: str):
+        """Open (or create) the database.
+
+        Args:
+            path: Database file
+        """
+        self.path = path
+        with self._connect() as db:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions "
+                "(sid TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS recipes "
+                "(key TEXT PRIMARY KEY, data TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _get(self, table, column, key):
+        db = self._connect()
+        try:
+            row = db.execute(
+                f"SELECT data FROM {table} WHERE {column} = ?", (key,)
+            ).fetchone()
+        finally:
+            db.close()
+        return None if row is None else json.loads(row[0])
+
+    def _put(self, table, key, value):
+        db = self._connect()
+        try:
+            with db:
+                db.execute(
+                    f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?)",
+                    (key, json.dumps(value), time.time()),
+                )
+        finally:
+            db.close()
+
+    def get(self, sid):
+        return self._get("sessions", "sid", sid)
+
+    def put(self, sid, record):
+        self._put("sessions", sid, record)
+
+    def delete(self, sid):
+        db = self._connect()
+        try:
+            with db:
+                cursor = db.execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+        finally:
+            db.close()
+        return cursor.rowcount > 0
+
+    def get_recipe(self, key):
+        return self._get("recipes", "key", key)
+
+    def put_recipe(self, key, recipe):
+        self._put("recipes", key, recipe)
+
+
+def session_store_from_env() -> SessionStore:
+    """The store named by SESSION_STORE: "memory" (default) or "sqlite:<path>".
+
+    Returns:
+        The store
+    """
+    spec = os.getenv("SESSION_STORE", "memory")
+    if spec == "memory":
+        return MemorySessionStore()
+    if spec.startswith("sqlite:"):
+        return SQLiteSessionStore(spec[len("sqlite:") :])
+    raise ValueError(f"Unknown SESSION_STORE: {spec}")
+
+
+class RecipeCache:
+    """Per-process LRU of rebuilt recipes, so the sessions of a recipe share one copy."""
+
+    def __init__(self, size: int = 64):
+        """
+        Args:
+            size: Max recipes kept
+        """
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[str, object]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key: str, build: Callable[[], object]):
+        """The cached value of key, built (outside the lock) on a miss.
+
+        Args:
+            key: Recipe key
+            build: Returns the value, or None if there is nothing to cache
+
+        Returns:
+            The value, or None
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self.entries[key]
+            self.stats["misses"] += 1
+
+        value = build()
+        if value is not None:
+            self.put(key, value)
+        return value
+
+    def put(self, key: str, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
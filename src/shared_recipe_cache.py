@@ -0,0 +1,269 @@
+import fcntl
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+MAGIC = b"RCPCACHE"
+VERSION = 1
+
+# magic, version, slots, data size, write offset
+_HEADER = struct.Struct("<8sIIQQ")
+# key digest, data offset, data length, state, last access (monotonic ns)
+_SLOT = struct.Struct("<16sQIIQ")
+_LAST_ACCESS = struct.Struct("<Q")
+_LAST_ACCESS_OFFSET = 32
+
+EMPTY, USED, DELETED = 0, 1, 2
+
+
+def _digest(key: str) -> bytes:
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+class SharedRecipeCache:
+    """Parsed recipes in a memory-mapped file that every process on the host reads.
+
+    The file holds a header, a hash table of fixed-size slots (key digest ->
+    offset and length of the record) and a data region written as a ring: new
+    records go after the last one and, when the end is reached, over the oldest
+    ones, whose slots are dropped. When the table itself is full the least
+    recently read record is dropped. Records are pickled and unpickled straight
+    from the mapping, so the workers share one copy of the serialized recipes
+    (in the page cache) instead of each parsing and keeping its own. get()
+    still returns a private copy: a worker should only keep the few recipes it
+    is using and read the others again when needed.
+
+    Writers take an exclusive flock on the file, readers a shared one. Each
+    process opens the file itself (again after a fork), since flock locks are
+    held per open file. The file must only be writable by the server's user:
+    its records are unpickled.
+    """
+
+    def __init__(self, path: str, size_mb: int = 64, slots: int = 4096):
+        """Open (or create) the cache file.
+
+        Args:
+            path: Cache file, best on a tmpfs such as /dev/shm
+            size_mb: Size of the data region
+            slots: Max records
+        """
+        self.path = path
+        self.slots = slots
+        self.data_size = size_mb * 1024 * 1024
+        self.data_start = _HEADER.size + slots * _SLOT.size
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+        self.pid = None
+        self.fd = None
+        self.mm = None
+        self._open()
+
+    def _open(self):
+        if self.mm is not None:
+            # inherited from the parent process
+            self.mm.close()
+            os.close(self.fd)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        size = self.data_start + self.data_size
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            mm = mmap.mmap(fd, size) if os.fstat(fd).st_size == size else None
+            if mm is None:
+                os.ftruncate(fd, size)
+                mm = mmap.mmap(fd, size)
+                mm[: self.data_start] = bytes(self.data_start)
+                _HEADER.pack_into(mm, 0, MAGIC, VERSION, self.slots, self.data_size, 0)
+            elif _HEADER.unpack_from(mm, 0)[:4] != (
+                MAGIC,
+                VERSION,
+                self.slots,
+                self.data_size,
+            ):
+                mm.close()
+                raise ValueError(f"{self.path} has a different cache layout")
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        except BaseException:
+            os.close(fd)
+            raise
+        self.fd, self.mm, self.pid = fd, mm, os.getpid()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self.lock:
+            if self.pid != os.getpid():
+                self._open()
+            fcntl.flock(self.fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield self.mm
+            finally:
+                fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _slot(self, n: int) -> int:
+        return _HEADER.size + n * _SLOT.size
+
+    def _find(self, mm, digest: bytes):
+        """(slot holding digest or None, first free slot on its probe sequence or None)"""
+        start = int.from_bytes(digest[:8], "little") % self.slots
+        free = None
+        for i in range(self.slots):
+            n = (start + i) % self.slots
+            slot_digest, _, _, state, _ = _SLOT.unpack_from(mm, self._slot(n))
+            if state == EMPTY:
+                return None, n if free is None else free
+            if state == DELETED:
+                if free is None:
+                    free = n
+            elif slot_digest == digest:
+                return n, n
+        return None, free
+
+    def get(self, key: str):
+        """The record stored under key, or None.
+
+        Args:
+            key: Recipe key, "<mode>:<url>"
+
+        Returns:
+            The unpickled record, or None
+        """
+        digest = _digest(key)
+        with self._locked(False) as mm:
+            n, _ = self._find(mm, digest)
+            if n is None:
+                self.stats["misses"] += 1
+                return None
+            _, offset, length, _, _ = _SLOT.unpack_from(mm, self._slot(n))
+            # a plain store: concurrent readers only race on which time wins
+            _LAST_ACCESS.pack_into(
+                mm, self._slot(n) + _LAST_ACCESS_OFFSET, time.monotonic_ns()
+            )
+            start = self.data_start + offset
+            with memoryview(mm) as view, view[start : start + length] as data:
+                record = pickle.loads(data)
+        self.stats["hits"] += 1
+        return record
+
+    def put(self, key: str, record) -> bool:
+        """Store record under key, replacing any previous one.
+
+        Args:
+            key: Recipe key, "<mode>:<url>"
+            record: Picklable record
+
+        Returns:
+            False if the record is larger than the data region
+        """
+        data = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.data_size:
+            return False
+        digest = _digest(key)
+        with self._locked(True) as mm:
+            *_, head = _HEADER.unpack_from(mm, 0)
+            n, _ = self._find(mm, digest)
+            if n is not None:
+                self._drop(mm, n)
+            if head + len(data) > self.data_size:
+                # wrap around; the table's probe sequences are rebuilt without
+                # the deleted slots left behind since the last wrap
+                head = 0
+                self._compact(mm)
+            self.stats["evictions"] += self._evict_range(mm, head, head + len(data))
+            _, n = self._find(mm, digest)
+            if n is None:
+                self._drop(mm, self._least_recently_used(mm))
+                self.stats["evictions"] += 1
+                _, n = self._find(mm, digest)
+
+            start = self.data_start + head
+            mm[start : start + len(data)] = data
+            _SLOT.pack_into(
+                mm,
+                self._slot(n),
+                digest,
+                head,
+                len(data),
+                USED,
+                time.monotonic_ns(),
+            )
+            _HEADER.pack_into(
+                mm, 0, MAGIC, VERSION, self.slots, self.data_size, head + len(data)
+            )
+        self.stats["stores"] += 1
+        return True
+
+    def _drop(self, mm, n: int):
+        _SLOT.pack_into(mm, self._slot(n), bytes(16), 0, 0, DELETED, 0)
+
+    def _used(self, mm):
+        for n in range(self.slots):
+            slot = _SLOT.unpack_from(mm, self._slot(n))
+            if slot[3] == USED:
+                yield n, slot
+
+    def _evict_range(self, mm, start: int, end: int) -> int:
+        """Drop the records overlapping [start, end) of the data region."""
+        evicted = 0
+        for n, (_, offset, length, _, _) in list(self._used(mm)):
+            if offset < end and start < offset + length:
+                self._drop(mm, n)
+                evicted += 1
+        return evicted
+
+    def _least_recently_used(self, mm) -> int:
+        return min(self._used(mm), key=lambda item: item[1][4])[0]
+
+    def _compact(self, mm):
+        used = [slot for _, slot in self._used(mm)]
+        mm[_HEADER.size : self.data_start] = bytes(self.data_start - _HEADER.size)
+        for slot in used:
+            _, n = self._find(mm, slot[0])
+            _SLOT.pack_into(mm, self._slot(n), *slot)
+
+    def snapshot(self) -> Dict:
+        """Records and bytes held, plus this process's hit / miss / store / eviction counts."""
+        with self._locked(False) as mm:
+            used = [slot for _, slot in self._used(mm)]
+        return {
+            "entries": len(used),
+            "bytes": sum(slot[2] for slot in used),
+            "data_size": self.data_size,
+            **self.stats,
+        }
+
+    def close(self):
+        with self.lock:
+            if self.mm is not None and self.pid == os.getpid():
+                self.mm.close()
+                os.close(self.fd)
+            self.mm = self.fd = self.pid = None
+
+
+def shared_recipe_cache_from_env() -> Optional[SharedRecipeCache]:
+    """The cache at SHARED_RECIPE_CACHE (a file path), or None if unset.
+
+    SHARED_RECIPE_CACHE_MB and SHARED_RECIPE_CACHE_SLOTS size it.
+
+    Returns:
+        The cache, or None
+    """
+    path = os.getenv("SHARED_RECIPE_CACHE")
+    if not path:
+        return None
+    return SharedRecipeCache(
+        path,
+        size_mb=int(os.getenv("SHARED_RECIPE_CACHE_MB", "64")),
+        slots=int(os.getenv("SHARED_RECIPE_CACHE_SLOTS", "4096")),
+    )
+
+
+def default_cache_path() -> str:
+    """A per-server cache file on /dev/shm if the host has it, else in the temp dir."""
+    directory = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    return os.path.join(directory, f"recipe-parser-{os.getpid()}.cache")
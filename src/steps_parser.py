@@ -1,11 +1,11 @@
-import json
 import re
-import spacy
-from pathlib import Path
 from typing import List, Dict, Any, Optional
+from src.deadline import Deadline
+from src import tracing
+from src.metrics import span, timed
+from src.resources import get_nlp, load_helper_json
 from src.tools_parser import ToolsParser
 from src.methods_parser import MethodsParser
-import time
 
 
 class StepsParser:
@@ -16,27 +16,41 @@ class StepsParser:
         directions: Dict[str, List[str]],
         parsed_ingredients: List[Dict[str, Any]],
         mode="classical",
+        escalation_threshold: Optional[float] = None,
+        deadline: Optional[Deadline] = None,
     ):
         """Initialize parser with directions and parsed ingredients.
 
         Args:
             directions: Dict with 'directions' key containing list of direction strings
             parsed_ingredients: List of ingredient dicts from IngredientsParser.parse()
+            escalation_threshold: Confidence below which hybrid mode asks the LLM for
+                a step's tools / methods (default: LLM_ESCALATION_THRESHOLD)
+            deadline: Time budget; once it can't cover another LLM call the
+                remaining steps are annotated classically
         """
         self.mode = mode
+        self.deadline = deadline or Deadline()
 
         self.directions = directions["directions"]
         self.parsed_ingredients = parsed_ingredients
-        self.nlp = spacy.load("en_core_web_sm")
-
-        self.tools_parser = ToolsParser(directions, self.mode)
-        self.methods_parser = MethodsParser(directions, self.mode)
+        self.nlp = get_nlp()
+
+        self.tools_parser = ToolsParser(
+            directions,
+            self.mode,
+            escalation_threshold=escalation_threshold,
+            deadline=self.deadline,
+        )
+        self.methods_parser = MethodsParser(
+            directions,
+            self.mode,
+            escalation_threshold=escalation_threshold,
+            deadline=self.deadline,
+        )
 
         # load method keywords for classifying step types
-        self.path = Path(__file__).resolve().parent / "helper_files"
-        method_keywords_path = self.path / "method_keywords.json"
-        with open(method_keywords_path, "r") as f:
-            methods_data = json.load(f)
+        methods_data = load_helper_json("method_keywords.json")
         self.method_keywords = methods_data.get("method_keywords", [])
 
         # lowercase ingredient names for matching, keep original for output
@@ -47,10 +61,31 @@ class StepsParser:
             ing["ingredient_name"].lower(): ing["ingredient_name"]
             for ing in parsed_ingredients
         }
+        # word-boundary patterns compiled once per parse: with hundreds of
+        # ingredients, re.search(pattern_string) outgrows the re module's
+        # cache and compiles them again for every step
+        self.ingredient_patterns = {}
+        # the words a multi-word name is matched by when it isn't found whole
+        self.significant_words = {}
+        for ingredient_name_lower in self.ingredient_names:
+            words = ingredient_name_lower.split()
+            if len(words) > 1:
+                # filter out common words like "and", "or", "the"
+                words = self.significant_words[ingredient_name_lower] = [
+                    w
+                    for w in words
+                    if len(w) > 3 and w not in ["and", "or", "the", "for"]
+                ]
+            for word in words:
+                if word not in self.ingredient_patterns:
+                    self.ingredient_patterns[word] = re.compile(
+                        r"\b" + re.escape(word) + r"\b"
+                    )
 
         # track context like oven temp so later steps can use it
         self.context = {"oven_temperature": None}
 
+    @timed("steps.split")
     def split_directions_into_atomic_steps(self) -> List[str]:
         """Split directions into atomic steps.
 
@@ -69,6 +104,19 @@ class StepsParser:
                 sent_doc = self.nlp(sent)
                 split_points = []
 
+                # whether a verb comes before / after each token, in one pass each
+                # rather than rescanning the sentence for every "and" / "then"
+                verb_before, verb_after = [], []
+                seen = False
+                for tok in sent_doc:
+                    verb_before.append(seen)
+                    seen = seen or tok.pos_ == "VERB"
+                seen = False
+                for tok in reversed(sent_doc):
+                    verb_after.append(seen)
+                    seen = seen or tok.pos_ == "VERB"
+                verb_after.reverse()
+
                 # look for "and" or "then" connecting verbs
                 for i, tok in enumerate(sent_doc):
                     if (
@@ -76,12 +124,7 @@ class StepsParser:
                         and i > 0
                         and i < len(sent_doc) - 1
                     ):
-                        left_has_verb = any(t.pos_ == "VERB" for t in sent_doc[:i])
-                        right_has_verb = any(
-                            t.pos_ == "VERB" for t in sent_doc[i + 1 :]
-                        )
-
-                        if left_has_verb and right_has_verb:
+                        if verb_before[i] and verb_after[i]:
                             split_points.append(i)
 
                 # split at the points we found
@@ -111,6 +154,7 @@ class StepsParser:
 
         return all_steps
 
+    @timed("steps.ingredients")
     def extract_ingredients_from_step(self, step: str) -> List[str]:
         """Find ingredients mentioned in the step.
 
@@ -130,25 +174,16 @@ class StepsParser:
 
             if len(words) == 1:
                 # single word - use word boundary so "salt" doesn't match "salted"
-                pattern = r"\b" + re.escape(ingredient_name_lower) + r"\b"
-                if re.search(pattern, step_lower):
+                if self._mentions(ingredient_name_lower, step_lower):
                     mentioned_ingredients.append(original_name)
             else:
                 # try exact match first
                 if ingredient_name_lower in step_lower:
                     mentioned_ingredients.append(original_name)
                 else:
-                    # filter out common words like "and", "or", "the"
-                    significant_words = [
-                        w
-                        for w in words
-                        if len(w) > 3 and w not in ["and", "or", "the", "for"]
-                    ]
-
                     # check if any significant word matches
-                    for word in significant_words:
-                        word_pattern = r"\b" + re.escape(word) + r"\b"
-                        if re.search(word_pattern, step_lower):
+                    for word in self.significant_words[ingredient_name_lower]:
+                        if self._mentions(word, step_lower):
                             mentioned_ingredients.append(original_name)
                             break
 
@@ -162,6 +197,13 @@ class StepsParser:
 
         return unique_ingredients
 
+    def _mentions(self, word: str, step_lower: str) -> bool:
+        # the substring test rules out most words without running the regex
+        return word in step_lower and bool(
+            self.ingredient_patterns[word].search(step_lower)
+        )
+
+    @timed("steps.tools")
     def extract_tools(self, step: str) -> List[str]:
         """Extract tools mentioned in the step.
 
@@ -175,11 +217,14 @@ class StepsParser:
             return self.tools_parser.extract_tools(step)
         else:
             try:
-                return self.tools_parser.extract_tools_llm(step)
-            except Exception:
-                time.sleep(5)  # to avoid rate limiting #
+                return self.tools_parser.extract_tools_hybrid(step)
+            except Exception as e:
+                tracing.event("fallback", part="step_tools", error=type(e).__name__)
+                # to avoid rate limiting #
+                self.tools_parser.provider.throttle(self.deadline.clip(5))
                 return self.tools_parser.extract_tools(step)
 
+    @timed("steps.methods")
     def extract_methods(self, step: str) -> List[str]:
         """Extract cooking methods from the step.
 
@@ -193,11 +238,14 @@ class StepsParser:
             return self.methods_parser.extract_methods(step)
         else:
             try:
-                return self.methods_parser.extract_methods_llm(step)
-            except Exception:
-                time.sleep(5)  # to avoid rate limiting #
+                return self.methods_parser.extract_methods_hybrid(step)
+            except Exception as e:
+                tracing.event("fallback", part="step_methods", error=type(e).__name__)
+                # to avoid rate limiting #
+                self.methods_parser.provider.throttle(self.deadline.clip(5))
                 return self.methods_parser.extract_methods(step)
 
+    @timed("steps.time")
     def extract_time(self, step: str) -> Optional[Dict[str, str]]:
         """Extract time/duration from step text.
 
@@ -245,6 +293,7 @@ class StepsParser:
 
         return None
 
+    @timed("steps.temperature")
     def extract_temperature(self, step: str) -> Optional[Dict[str, str]]:
         """Extract temperature from step text.
 
@@ -293,6 +342,7 @@ class StepsParser:
 
         return None
 
+    @timed("steps.classify")
     def classify_step_type(self, step: str) -> str:
         """Classify step as actionable, warning, advice, or observation.
 
@@ -342,6 +392,9 @@ class StepsParser:
 
         Returns:
             List of step dictionaries with annotations
+
+        Raises:
+            ParseCancelled: If the deadline's parse job is cancelled
         """
         atomic_steps = self.split_directions_into_atomic_steps()
 
@@ -349,14 +402,19 @@ class StepsParser:
 
         # TODO: propagate context (e.g., carry oven temp to later baking steps)
         for i, step_text in enumerate(atomic_steps, start=1):
-            step_ingredients = self.extract_ingredients_from_step(step_text)
-            step_tools = self.extract_tools(step_text)
-            if self.mode != "classical":
-                time.sleep(10)  # to avoid rate limiting #
-            step_methods = self.extract_methods(step_text)
-            time_info = self.extract_time(step_text)
-            temp_info = self.extract_temperature(step_text)
-            step_type = self.classify_step_type(step_text)
+            # stops here if the parse job was cancelled (replaced session, closed tab)
+            self.deadline.check(steps=len(atomic_steps) - i + 1)
+            with span("steps.step") as step_span:
+                step_span.set(step=i, chars=len(step_text))
+                step_ingredients = self.extract_ingredients_from_step(step_text)
+                step_tools = self.extract_tools(step_text)
+                if self.mode != "classical" and self.tools_parser.last_escalated:
+                    # to avoid rate limiting #
+                    self.tools_parser.provider.throttle(self.deadline.clip(10))
+                step_methods = self.extract_methods(step_text)
+                time_info = self.extract_time(step_text)
+                temp_info = self.extract_temperature(step_text)
+                step_type = self.classify_step_type(step_text)
 
             step_dict = {
                 "step_number": i,
@@ -0,0 +1,121 @@
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+
+def singularize(token: str) -> str:
+    """Cheap plural -> singular normalization for lookup keys.
+
+    Args:
+        token: Lowercase token
+
+    Returns:
+        The singular form of the token (best effort)
+    """
+    if len(token) <= 3 or token.endswith("ss"):
+        return token
+    if token.endswith("ies"):
+        return token[:-3] + "y"
+    if token.endswith("ives"):
+        return token[:-3] + "fe"
+    if token.endswith("ves"):
+        return token[:-3] + "f"
+    if token.endswith(("ches", "shes", "xes", "zes", "sses", "oes")):
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+class TokenIndex:
+    """Inverted index from tokens to the entries (dict keys) that contain them.
+
+    Scores match the classical nested-loop lookup: every (query token, entry
+    token) pair that is equal adds one to the entry, and ties go to the entry
+    that comes first in the source dict.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[str],
+        normalize: bool = True,
+        lemmatizer: Optional[Callable[[str], str]] = None,
+    ):
+        """Build the index once from entry names.
+
+        Args:
+            entries: Entry names in their original order (e.g. usages.json keys)
+            normalize: Also index singular/lemma forms for a fallback lookup
+            lemmatizer: Optional token -> lemma function used on top of singularize
+        """
+        self.entries: List[str] = list(entries)
+        self.normalize = normalize
+        self.lemmatizer = lemmatizer
+
+        # token -> [(entry_idx, occurrences of token in entry)]
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.normalized_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+
+        for idx, entry in enumerate(self.entries):
+            counts: Dict[str, int] = defaultdict(int)
+            for tok in entry.split():
+                counts[tok] += 1
+            for tok, count in counts.items():
+                self.postings[tok].append((idx, count))
+
+            if self.normalize:
+                norm_counts: Dict[str, int] = defaultdict(int)
+                for tok in entry.split():
+                    norm_counts[self._normalize(tok)] += 1
+                for tok, count in norm_counts.items():
+                    self.normalized_postings[tok].append((idx, count))
+
+        self.postings = dict(self.postings)
+        self.normalized_postings = dict(self.normalized_postings)
+
+    def _normalize(self, token: str) -> str:
+        if self.lemmatizer is not None:
+            token = self.lemmatizer(token)
+        return singularize(token)
+
+    def _score(
+        self, tokens: List[str], postings: Dict[str, List[Tuple[int, int]]]
+    ) -> Dict[int, int]:
+        scores: Dict[int, int] = defaultdict(int)
+        for tok in tokens:
+            for idx, count in postings.get(tok, ()):
+                scores[idx] += count
+        return scores
+
+    def best_index(self, tokens: List[str]) -> Optional[int]:
+        """Return the position of the highest scoring entry for the query tokens.
+
+        Exact token matches always win; normalized (singular/lemma) matches
+        are only consulted when no entry shares an exact token with the query.
+
+        Args:
+            tokens: Query tokens
+
+        Returns:
+            Index into self.entries, or None if nothing matched
+        """
+        scores = self._score(tokens, self.postings)
+        if not scores and self.normalize:
+            scores = self._score(
+                [self._normalize(tok) for tok in tokens], self.normalized_postings
+            )
+        if not scores:
+            return None
+
+        return min(scores.items(), key=lambda item: (-item[1], item[0]))[0]
+
+    def best_match(self, tokens: List[str]) -> Optional[str]:
+        """Return the highest scoring entry name for the query tokens.
+
+        Args:
+            tokens: Query tokens
+
+        Returns:
+            The best entry name, or None if nothing matched
+        """
+        idx = self.best_index(tokens)
+        return None if idx is None else self.entries[idx]
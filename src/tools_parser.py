@@ -1,28 +1,39 @@
 import json
 import re
-import spacy
 from pathlib import Path
-from dotenv import load_dotenv
-from google import genai
-from google.genai import types
-import os
+from src.deadline import Deadline
+from src.llm_provider import default_escalation_threshold, get_provider
+from src.resources import get_nlp, load_helper_json
 
 
 class ToolsParser:
     def __init__(
-        self, directions, mode="classical", model_name="gemini-2.5-flash-lite"
+        self,
+        directions,
+        mode="classical",
+        model_name="gemini-2.5-flash-lite",
+        escalation_threshold=None,
+        deadline=None,
     ):
         self.mode = mode
         self.model_name = model_name
 
+        # extract_tools_hybrid only asks the LLM when the classical score is below this
+        self.escalation_threshold = (
+            default_escalation_threshold()
+            if escalation_threshold is None
+            else escalation_threshold
+        )
+        self.escalations = {"items": 0, "escalated": 0}
+        self.last_escalated = False
+        # LLM calls the remaining time budget can't cover are left classical
+        self.deadline = deadline or Deadline()
+
         self.directions = directions["directions"]
         self.tools = None
-        self.nlp = spacy.load("en_core_web_sm")
+        self.nlp = get_nlp()
         self.directions_split = self.split_directions_into_steps()
-        self.path = Path(__file__).resolve().parent / "helper_files"
-        tools_keywords_path = self.path / "tools_keywords.json"
-        with open(tools_keywords_path, "r") as f:
-            data = json.load(f)
+        data = load_helper_json("tools_keywords.json")
 
         # small list — can be expanded with common kitchen tools
         self.tool_keywords = data.get("tools_keywords")
@@ -37,14 +48,8 @@ class ToolsParser:
 
         if self.mode != "classical":
             self.path = Path(__file__).resolve().parent.parent
-            load_dotenv(self.path / "apikey.env")
-            self.api_key = os.getenv("GEMINI_API_KEY")
-            if not self.api_key:
-                raise ValueError(
-                    "GEMINI_API_KEY not found. Please set it in your .env file."
-                )
-
-            self.client = genai.Client(api_key=self.api_key)
+            self.provider = get_provider("tools_parser")
+            self.provider.cancelled = self.deadline.cancelled
 
             with open(self.path / "src" / "prompts" / "tools_prompt.txt", "r") as f:
                 self.tools_prompt = f.read()
@@ -83,9 +88,24 @@ class ToolsParser:
             >>> parser.extract_tools("Heat oil in a large skillet and use a wooden spoon to stir")
             ['large skillet', 'wooden spoon']
         """
+        return self.extract_tools_scored(text)[0]
+
+    def extract_tools_scored(self, text: str) -> tuple[list[str], float]:
+        """
+        extract_tools() plus a confidence score for its result, from 0 to 1.
+        The score drops for noun chunks in tool position (object of a tool verb or
+        after a preposition) that match no tool keyword, for tools only found by the
+        single-token fallback, for tool keywords in the text that were not extracted,
+        and for tool verbs without any tool.
+        Args:
+            text (str): The recipe text
+        Returns:
+            tuple[list[str], float]: The extract_tools() result and its confidence.
+        """
 
         doc = self.nlp(text)
         candidates = set()
+        rejected = 0
 
         # first look for noun chunks that might indicate tools
         for chunk in doc.noun_chunks:
@@ -119,16 +139,22 @@ class ToolsParser:
                     doc[root.left_edge.i - 1].lemma_.lower() in self.prep_word
                 ):
                     candidates.add(chunk_text)
+                    if not any(k in chunk_text for k in self.tool_keywords):
+                        rejected += 1  # tool position, but no known tool
                 else:
                     if any(k in chunk_text for k in self.tool_keywords):
                         candidates.add(chunk_text)
 
+        chunk_candidates = set(candidates)
+        keyword_hits = []
+
         # fallback single-token matches to predefined list (keep left modifiers like "large")
         for tok in doc:
             if (
                 tok.lemma_.lower() in self.tool_keywords
                 or tok.text.lower() in self.tool_keywords
             ):
+                keyword_hits.append(tok.text.lower())
                 if tok.pos_ in {"NOUN", "PROPN"} and (
                     tok.dep_ in {"dobj", "pobj", "attr", "ROOT", "conj"}
                     or tok.head.lemma_.lower() in self.tool_verb_list
@@ -146,7 +172,16 @@ class ToolsParser:
         tools = sorted(
             {norm(c) for c in candidates if any(k in c for k in self.tool_keywords)}
         )
-        return tools
+
+        score = 1.0 - 0.15 * min(rejected, 3)
+        fallback_only = candidates - chunk_candidates
+        score -= 0.2 * min(len(fallback_only), 2)
+        if any(not any(hit in tool for tool in tools) for hit in keyword_hits):
+            score -= 0.3
+        if not tools and any(t.lemma_.lower() in self.tool_verb_list for t in doc):
+            score -= 0.3
+
+        return tools, round(max(score, 0.0), 2)
 
     def _message_formatting(self, context: str) -> str:
         return "=== Context ===\n" f"{context}\n\n" "=== Context ===\n\n" "Output:"
@@ -167,39 +202,11 @@ class ToolsParser:
 
         contents = self._message_formatting(full_prompt)
 
-        response = self.client.models.generate_content(
-            model=self.model_name,
-            contents=contents,
-            config=types.GenerateContentConfig(
-                temperature=0.2,
-                top_p=0.8,
-                top_k=40,
-            ),
-        )
-
-        try:
-            raw = response.text
-        except AttributeError:
-            raw_parts = []
-            for cand in getattr(response, "candidates", []) or []:
-                for part in getattr(cand, "content", {}).parts or []:
-                    if hasattr(part, "text"):
-                        raw_parts.append(part.text)
-            raw = "".join(raw_parts)
-
-        if raw is None:
-            return self.extract_tools(step)
-
-        text = raw.strip()
-
-        if text.startswith("```"):
-            text = re.sub(r"^```(?:json)?", "", text, flags=re.IGNORECASE).strip()
-            if text.endswith("```"):
-                text = text[:-3].strip()
-
         try:
-            parsed = json.loads(text)
-        except json.JSONDecodeError:
+            parsed = self.provider.generate_json(
+                self.model_name, contents, "tools_prompt.txt"
+            )
+        except ValueError:
             return self.extract_tools(step)
 
         if not isinstance(parsed, list):
@@ -214,6 +221,30 @@ class ToolsParser:
 
         return tools
 
+    def extract_tools_hybrid(self, step):
+        """
+        Classical extraction, escalated to extract_tools_llm() only when its
+        confidence is below self.escalation_threshold and self.deadline leaves
+        time for the call.
+        Args:
+            step (str): A single step from the recipe directions.
+        Returns:
+            list[str]: A list of normalized tool names found in the text.
+        """
+        tools, confidence = self.extract_tools_scored(step)
+        self.escalations["items"] += 1
+        self.last_escalated = confidence < self.escalation_threshold
+        if not self.last_escalated:
+            return tools
+        if not self.deadline.can_afford():
+            self.last_escalated = False
+            self.deadline.degrade("step_tools")
+            return tools
+
+        self.escalations["escalated"] += 1
+        with self.deadline.llm_call():
+            return self.extract_tools_llm(step)
+
     def parse(self, flag_llm=False):
         """
         Parse directions and extract tools used in each direction's steps.
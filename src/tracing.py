@@ -0,0 +1,297 @@
+import contextvars
+import glob
+import hashlib
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+# fraction of requests traced
+SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0"))
+# whether a request can ask for a trace itself ("trace": true); off by default
+# since anyone could then fill the disk with traces
+ALLOW_FORCE = os.getenv("TRACE_ALLOW_FORCE", "0") == "1"
+# sampled traces shorter than this are dropped
+SLOW_MS = float(os.getenv("TRACE_SLOW_MS", "0"))
+# where kept traces are written ("" for nowhere), and as "chrome" or "json"
+TRACE_DIR = os.getenv("TRACE_DIR", "traces")
+TRACE_FORMAT = os.getenv("TRACE_FORMAT", "chrome")
+# the oldest files in TRACE_DIR beyond this many are deleted (0 for no limit)
+MAX_FILES = int(os.getenv("TRACE_MAX_FILES", "200"))
+
+# the span the code running in this context is inside of, if it is traced
+_current = contextvars.ContextVar("trace_span", default=None)
+
+_recent = deque(maxlen=int(os.getenv("TRACE_KEEP", "50")))
+_recent_lock = threading.Lock()
+
+
+class TraceSpan:
+    """One timed operation of a trace; `end` equal to `start` marks an event."""
+
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "start",
+        "end",
+        "thread",
+        "attrs",
+    )
+
+    def __init__(self, trace, span_id, parent_id, name, start, attrs):
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.start = start
+        self.end = None
+        self.thread = threading.get_ident()
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+
+class Trace:
+    """The spans of one request, nested by parent_id under a root span."""
+
+    def __init__(self, name: str, attrs: Dict):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.wall_time = time.time()
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.spans: List[TraceSpan] = []
+        self.root = self.add(name, None, attrs=attrs)
+
+    def add(self, name, parent, start=None, attrs=None) -> TraceSpan:
+        span = TraceSpan(
+            self,
+            next(self.ids),
+            None if parent is None else parent.span_id,
+            name,
+            time.perf_counter() if start is None else start,
+            attrs or {},
+        )
+        with self.lock:
+            self.spans.append(span)
+        return span
+
+    def duration_ms(self) -> float:
+        end = self.root.end or time.perf_counter()
+        return (end - self.root.start) * 1e3
+
+    def summary(self) -> Dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.root.name,
+            "start": self.wall_time,
+            "duration_ms": round(self.duration_ms(), 3),
+            "spans": len(self.spans),
+            "attrs": self.root.attrs,
+        }
+
+    def to_dict(self) -> Dict:
+        """The trace as nested spans (times in ms from the start of the trace)."""
+        with self.lock:
+            spans = list(self.spans)
+        nodes = {
+            span.span_id: {
+                "name": span.name,
+                "start_ms": round((span.start - self.root.start) * 1e3, 3),
+                "duration_ms": round(((span.end or span.start) - span.start) * 1e3, 3),
+                "attrs": span.attrs,
+                "children": [],
+            }
+            for span in spans
+        }
+        for span in spans:
+            if span.parent_id is not None:
+                nodes[span.parent_id]["children"].append(nodes[span.span_id])
+        return {**self.summary(), "root": nodes[self.root.span_id]}
+
+    def to_chrome(self) -> Dict:
+        """The trace in the Chrome trace event format (chrome://tracing, Perfetto)."""
+        with self.lock:
+            spans = list(self.spans)
+        pid = os.getpid()
+        events = []
+        for span in spans:
+            event = {
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ts": round((span.start - self.root.start) * 1e6, 1),
+                "pid": pid,
+                "tid": span.thread,
+                "args": span.attrs,
+            }
+            if span.end == span.start:
+                event.update(ph="i", s="t")
+            else:
+                end = span.end or span.start
+                event.update(ph="X", dur=round((end - span.start) * 1e6, 1))
+            events.append(event)
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": self.summary(),
+        }
+
+
+def active() -> bool:
+    """True if the code running in this context is being traced."""
+    return _current.get() is not None
+
+
+def start_span(name: str, **attrs):
+    """Opens a child of the current span; end_span() closes it.
+
+    Returns:
+        A handle for end_span(), or None if this context isn't traced
+    """
+    parent = _current.get()
+    if parent is None:
+        return None
+    span = parent.trace.add(name, parent, attrs=attrs)
+    return span, _current.set(span)
+
+
+def end_span(handle):
+    span, token = handle
+    span.end = time.perf_counter()
+    _current.reset(token)
+
+
+def record(name: str, seconds: float, start: Optional[float] = None, **attrs):
+    """Adds a finished span (measured by the caller) under the current one.
+
+    Args:
+        name: Span name
+        seconds: Duration
+        start: perf_counter() at its start (default: `seconds` ago)
+        **attrs: Span attributes
+    """
+    parent = _current.get()
+    if parent is None:
+        return
+    end = time.perf_counter() if start is None else start + seconds
+    span = parent.trace.add(name, parent, start=end - seconds, attrs=attrs)
+    span.end = end
+
+
+def event(name: str, **attrs):
+    """Marks a moment of the current span, e.g. a fallback to classical parsing."""
+    parent = _current.get()
+    if parent is not None:
+        span = parent.trace.add(name, parent, attrs=attrs)
+        span.end = span.start
+
+
+def annotate(**attrs):
+    """Sets attributes of the current span."""
+    span = _current.get()
+    if span is not None:
+        span.set(**attrs)
+
+
+@contextmanager
+def trace(name: str, force: bool = False, **attrs):
+    """Traces the block if it is sampled (or force is set).
+
+    A trace that took at least TRACE_SLOW_MS is kept in memory (recent(),
+    get_trace()) and written to TRACE_DIR.
+
+    Args:
+        name: Name of the root span, e.g. "POST /api/initialize"
+        force: Trace regardless of TRACE_SAMPLE_RATE
+        **attrs: Root span attributes
+
+    Yields:
+        The Trace, or None if the block isn't traced
+    """
+    if not force and (SAMPLE_RATE <= 0 or random.random() >= SAMPLE_RATE):
+        yield None
+        return
+
+    current = Trace(name, attrs)
+    token = _current.set(current.root)
+    try:
+        yield current
+    finally:
+        current.root.end = time.perf_counter()
+        _current.reset(token)
+        if force or current.duration_ms() >= SLOW_MS:
+            with _recent_lock:
+                _recent.append(current)
+            if TRACE_DIR:
+                export(current)
+                _prune(TRACE_DIR)
+
+
+def export(current: Trace, directory: str = None, fmt: str = None) -> str:
+    """Writes a trace to a file.
+
+    Args:
+        current: The trace
+        directory: Output directory (default TRACE_DIR)
+        fmt: "chrome" or "json" (default TRACE_FORMAT)
+
+    Returns:
+        The file's path
+    """
+    directory = directory or TRACE_DIR
+    fmt = fmt or TRACE_FORMAT
+    os.makedirs(directory, exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(current.wall_time))
+    slug = current.root.name.strip("/ ").replace("/", "_").replace(" ", "_")
+    path = os.path.join(directory, f"{stamp}-{slug}-{current.trace_id}.json")
+    data = current.to_chrome() if fmt == "chrome" else current.to_dict()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, default=str)
+    return path
+
+
+def _prune(directory: str):
+    """Deletes the oldest trace files of the directory beyond MAX_FILES."""
+    if MAX_FILES <= 0:
+        return
+    paths = glob.glob(os.path.join(directory, "*.json"))
+    if len(paths) <= MAX_FILES:
+        return
+    paths.sort(key=lambda path: os.path.getmtime(path))
+    for path in paths[: len(paths) - MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # removed meanwhile, e.g. by another worker
+
+
+def session_tag(session_id: Optional[str]) -> Optional[str]:
+    """
+    A short hash of a session id to tell the traces of a session apart: the id
+    itself is the session's only credential and traces are listed publicly
+    """
+    if not session_id:
+        return None
+    return hashlib.blake2b(str(session_id).encode(), digest_size=6).hexdigest()
+
+
+def recent() -> List[Dict]:
+    """Summaries of the traces kept in memory, newest first."""
+    with _recent_lock:
+        return [t.summary() for t in reversed(_recent)]
+
+
+def get_trace(trace_id: str) -> Optional[Trace]:
+    with _recent_lock:
+        for t in _recent:
+            if t.trace_id == trace_id:
+                return t
+    return None